@@ -25,8 +25,25 @@ def setup_config():
         config.FEISHU_APP_TOKEN = os.getenv('FEISHU_APP_TOKEN', '')
         config.FEISHU_TABLE_ID = os.getenv('FEISHU_TABLE_ID', '')
         config.FEISHU_FEEDBACK_TABLE_ID = os.getenv('FEISHU_FEEDBACK_TABLE_ID', '')
+        config.FEISHU_POOL_SIZE = int(os.getenv('FEISHU_POOL_SIZE', '10'))
+        config.FEISHU_CONNECT_TIMEOUT = float(os.getenv('FEISHU_CONNECT_TIMEOUT', '5'))
+        config.FEISHU_READ_TIMEOUT = float(os.getenv('FEISHU_READ_TIMEOUT', '30'))
+        config.FEISHU_MAX_RETRIES = int(os.getenv('FEISHU_MAX_RETRIES', '3'))
+        config.FEISHU_UPLOAD_INDEX_PATH = os.getenv('FEISHU_UPLOAD_INDEX_PATH', '/tmp/feishu_uploads.db')
+        config.FEISHU_TOKEN_CACHE_PATH = os.getenv('FEISHU_TOKEN_CACHE_PATH', '/tmp/feishu_token.json')
+        config.FEISHU_OUTBOX_ENABLED = os.getenv('FEISHU_OUTBOX_ENABLED', 'False').lower() == 'true'
+        config.FEISHU_OUTBOX_PATH = os.getenv('FEISHU_OUTBOX_PATH', '/tmp/feishu_outbox.db')
         config.DOUBAO_API_KEY = os.getenv('DOUBAO_API_KEY', '')
         config.DOUBAO_API_URL = os.getenv('DOUBAO_API_URL', 'https://ark.cn-beijing.volces.com/api/v3/chat/completions')
+        config.DOUBAO_IMAGE_MAX_EDGE = int(os.getenv('DOUBAO_IMAGE_MAX_EDGE', '1600'))
+        config.DOUBAO_IMAGE_FORMAT = os.getenv('DOUBAO_IMAGE_FORMAT', 'JPEG')
+        config.DOUBAO_IMAGE_QUALITY = int(os.getenv('DOUBAO_IMAGE_QUALITY', '85'))
+        config.OCR_CACHE_PATH = os.getenv('OCR_CACHE_PATH', '/tmp/ocr_results.db')
+        config.IMAGE_HASH_INDEX_PATH = os.getenv('IMAGE_HASH_INDEX_PATH', '')
+        config.IMAGE_DUPLICATE_DISTANCE = int(os.getenv('IMAGE_DUPLICATE_DISTANCE', '6'))
+        config.PAGE_MAX_WORKERS = int(os.getenv('PAGE_MAX_WORKERS', '4'))
+        config.HANDWRITING_ENGINE = os.getenv('HANDWRITING_ENGINE', 'auto')
+        config.STRIP_MAX_PIXELS = int(os.getenv('STRIP_MAX_PIXELS', '8000000'))
         config.DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY', '')
         config.DEEPSEEK_API_URL = os.getenv('DEEPSEEK_API_URL', 'https://api.deepseek.com/v1')
         config.OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
@@ -0,0 +1,145 @@
+"""
+去手写性能与效果基准
+
+生成一张约1200万像素（4000×3000）的模拟试卷照片：光照不均的米白纸面、黑色印刷文字、
+蓝色作答笔迹和红色批改痕迹，在单核上测量各去手写引擎的耗时，并统计：
+- 笔迹残留率：原笔迹像素中处理后仍明显偏暗的比例（越低越好）
+- 印刷保留率：印刷文字像素中处理后仍为深色的比例（越高越好）
+
+用法:
+    python benchmark_handwriting.py [--repeat 5] [--image 实拍图片路径]
+
+传入实拍图片时只统计耗时（没有笔迹的标注）。PRD要求去手写处理时间 < 5秒。
+"""
+
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import cv2
+import numpy as np
+
+from src.handwriting import HandwritingRemover
+
+PRD_BUDGET_SECONDS = 5.0
+
+
+def make_page(width: int = 4000, height: int = 3000, seed: int = 0):
+    """
+    生成模拟试卷
+
+    Returns:
+        (BGR图片, 印刷掩码, 笔迹掩码)
+    """
+    rng = np.random.default_rng(seed)
+
+    # 米白纸面，从左上到右下逐渐变暗（模拟手机拍照的光照不均）
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    shade = 1.0 - 0.25 * (xx / width + yy / height) / 2
+    paper = np.stack([222 * shade, 236 * shade, 242 * shade], axis=-1)
+    paper += rng.normal(0, 3, paper.shape)
+    page = np.clip(paper, 0, 255).astype(np.uint8)
+
+    printed = np.zeros((height, width), np.uint8)
+    for row, y in enumerate(range(180, height - 150, 150)):
+        text = f"{row + 1}. Calculate 3x + {row} = {2 * row + 7}, find the value of x and explain"
+        cv2.putText(printed, text, (160, y), cv2.FONT_HERSHEY_SIMPLEX, 2.2, 255, 5, cv2.LINE_AA)
+
+    handwriting = np.zeros((height, width), np.uint8)
+    red = np.zeros((height, width), np.uint8)
+    for y in range(240, height - 150, 150):
+        # 作答：在印刷行下方写一串连笔
+        x = int(rng.integers(300, 900))
+        points = [(x + i * 40, y + int(rng.integers(-25, 25))) for i in range(int(rng.integers(20, 60)))]
+        cv2.polylines(handwriting, [np.array(points, np.int32)], False, 255, int(rng.integers(3, 7)), cv2.LINE_AA)
+        # 批改：打勾或画圈，部分笔迹压在印刷文字上
+        cx = int(rng.integers(2800, 3700))
+        if rng.random() < 0.5:
+            cv2.polylines(red, [np.array([(cx, y - 60), (cx + 40, y), (cx + 140, y - 140)], np.int32)],
+                          False, 255, 6, cv2.LINE_AA)
+        else:
+            cv2.ellipse(red, (cx - 1800, y - 50), (260, 70), 0, 0, 360, 255, 5, cv2.LINE_AA)
+
+    def paint(mask: np.ndarray, color, alpha_scale: float = 1.0):
+        alpha = (mask.astype(np.float32) / 255 * alpha_scale)[..., None]
+        ink = np.array(color, np.float32)
+        # 笔迹颜色带一点随机深浅，中心更深（圆珠笔）
+        blended = page.astype(np.float32) * (1 - alpha) + ink * alpha
+        page[:] = np.clip(blended, 0, 255).astype(np.uint8)
+
+    paint(printed, (30, 30, 30))
+    paint(handwriting, (150, 45, 20), 0.95)   # 蓝色圆珠笔（BGR）
+    paint(red, (40, 40, 200), 0.95)           # 红色批改笔
+
+    written = cv2.bitwise_or(handwriting, red)
+    # 只统计笔画中心，忽略抗锯齿边缘；印刷统计排除被笔迹覆盖的部分
+    written_core = cv2.inRange(written, 200, 255)
+    printed_core = cv2.inRange(printed, 200, 255) & cv2.bitwise_not(cv2.dilate(written, np.ones((5, 5), np.uint8)))
+    return page, printed_core, written_core
+
+
+def measure(remover: HandwritingRemover, img: np.ndarray, repeat: int):
+    """返回(输出图片, 耗时列表)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = remover.clean_array(img)
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def score(original: np.ndarray, result: np.ndarray, printed: np.ndarray, written: np.ndarray):
+    """返回(笔迹残留率, 印刷保留率)"""
+    gray = cv2.cvtColor(result, cv2.COLOR_BGR2GRAY) if result.ndim == 3 else result
+    paper = cv2.cvtColor(original, cv2.COLOR_BGR2GRAY)
+    paper_level = float(np.median(paper[(printed == 0) & (written == 0)]))
+    dark = gray < paper_level - 40
+    residual = float(dark[written > 0].mean()) if written.any() else 0.0
+    kept = float(dark[printed > 0].mean()) if printed.any() else 0.0
+    return residual, kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description="去手写性能基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每个引擎重复次数")
+    parser.add_argument("--image", help="使用实拍图片（只统计耗时）")
+    parser.add_argument("--threads", type=int, default=1, help="OpenCV线程数（默认单核）")
+    args = parser.parse_args()
+
+    cv2.setNumThreads(args.threads)
+
+    if args.image:
+        img = cv2.imread(args.image)
+        if img is None:
+            print(f"无法读取图片: {args.image}")
+            sys.exit(1)
+        printed = written = None
+    else:
+        img, printed, written = make_page()
+
+    height, width = img.shape[:2]
+    print(f"图片尺寸: {width}×{height}（{width * height / 1e6:.1f}MP），OpenCV线程数: {args.threads}")
+    print("-" * 72)
+    print(f"{'引擎':<12}{'中位耗时(s)':>12}{'最快(s)':>10}{'笔迹残留':>10}{'印刷保留':>10}{'PRD<5s':>10}")
+
+    for engine in HandwritingRemover.available_engines():
+        remover = HandwritingRemover(engine=engine)
+        result, timings = measure(remover, img, args.repeat)
+        median = statistics.median(timings)
+        if printed is not None:
+            residual, kept = score(img, result, printed, written)
+            quality = f"{residual:>10.1%}{kept:>10.1%}"
+        else:
+            quality = f"{'-':>10}{'-':>10}"
+        verdict = "✅" if median < PRD_BUDGET_SECONDS else "❌"
+        print(f"{engine:<12}{median:>12.3f}{min(timings):>10.3f}{quality}{verdict:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,9 +14,28 @@ FEISHU_TABLE_ID = "tblXXXXXXXX"  # 错题本表的table_id（从URL中获取，t
 # 关联表：反馈题
 FEISHU_FEEDBACK_TABLE_ID = "tblYYYYYYYY"  # 反馈题表的table_id（从URL中获取，table=后面的部分）
 
+# 飞书API连接配置（可选，不配置时使用默认值）
+FEISHU_POOL_SIZE = 10  # 连接池大小
+FEISHU_CONNECT_TIMEOUT = 5  # 建立连接超时（秒）
+FEISHU_READ_TIMEOUT = 30  # 读取响应超时（秒）
+FEISHU_MAX_RETRIES = 3  # 5xx/超时/限流时的最大重试次数
+FEISHU_UPLOAD_INDEX_PATH = "cache/feishu_uploads.db"  # 上传去重索引（Vercel上需位于/tmp下）
+FEISHU_TOKEN_CACHE_PATH = "cache/feishu_token.json"  # 访问令牌共享缓存（Vercel上需位于/tmp下）
+FEISHU_OUTBOX_ENABLED = False  # 开启后入库先写本地发件箱并立即返回临时ID，后台批量写入飞书
+FEISHU_OUTBOX_PATH = "cache/feishu_outbox.db"  # 发件箱日志路径（Vercel上需位于/tmp下）
+
 # 豆包API配置（用于图片识别）
 DOUBAO_API_KEY = "your_doubao_api_key"
 DOUBAO_API_URL = "https://ark.cn-beijing.volces.com/api/v3"  # 根据实际情况调整
+DOUBAO_IMAGE_MAX_EDGE = 1600  # 上传给视觉模型前图片长边的上限（像素），0表示上传原图
+DOUBAO_IMAGE_FORMAT = "JPEG"  # 上传前重新编码的格式：JPEG/WEBP
+DOUBAO_IMAGE_QUALITY = 85  # 重新编码的质量（1-95）
+OCR_CACHE_PATH = "cache/ocr_results.db"  # 识别/分析结果缓存，相同图片不重复调用模型（留空则不缓存，Vercel上需位于/tmp下）
+IMAGE_HASH_INDEX_PATH = ""  # 重复检测索引（可选，默认关闭），如"cache/image_hashes.db"：图片完全相同或哈希接近且题目文字一致时直接返回已有记录
+IMAGE_DUPLICATE_DISTANCE = 6  # 哈希接近的最大汉明距离（64位dHash），只作为候选，还需题目文字一致
+PAGE_MAX_WORKERS = 4  # 整页模式下同时处理的题目数（受视觉模型和飞书接口的并发限制）
+HANDWRITING_ENGINE = "auto"  # 去手写引擎：auto/color/morphology/pillow（auto在安装了OpenCV时使用按颜色分离的color引擎，否则使用同样按颜色分离的纯Pillow引擎）
+STRIP_MAX_PIXELS = 8000000  # 超过该像素数的图片分条去手写、预处理，内存占用不随图片增大（0表示始终整图处理）
 
 # DeepSeek API配置（用于AI引导和生成，根据PRD推荐使用）
 DEEPSEEK_API_KEY = "your_deepseek_api_key"
@@ -80,23 +80,21 @@ def example_interactive_guide():
     
     try:
         # 获取错题信息
-        records = app.feishu_client.get_error_records()
-        record = next((r for r in records if r.get("record_id") == record_id), None)
+        record = app.feishu_client.get_error_record(record_id)
         
         if not record:
             print(f"未找到记录: {record_id}")
             return
         
-        fields = record.get("fields", {})
-        question_text = fields.get("题目文本", "")
+        question_text = record.question_text or ""
         
         print(f"\n题目: {question_text}\n")
         
         # 生成引导问题
         guide_questions = app.guide.generate_guide_questions(
             question_text,
-            fields.get("科目", ""),
-            fields.get("不会/做错", "")
+            record.subject or "",
+            record.error_type or ""
         )
         
         # 开始对话
@@ -134,7 +132,7 @@ def example_interactive_guide():
         checklist_result = app.guide.generate_solution_checklist(
             question_text,
             solution_approach,
-            fields.get("科目", "")
+            record.subject or ""
         )
         
         print("\n解题清单:")
@@ -4,9 +4,11 @@
 
 import os
 import sys
+import tempfile
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
 
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).parent))
@@ -22,13 +24,32 @@ except (ImportError, AttributeError):
     import os
     import types
     config = types.ModuleType('config')
+    # 缓存、索引默认放在临时目录（Serverless环境中只有临时目录可写）
+    cache_dir = tempfile.gettempdir()
     config.FEISHU_APP_ID = os.getenv('FEISHU_APP_ID', '')
     config.FEISHU_APP_SECRET = os.getenv('FEISHU_APP_SECRET', '')
     config.FEISHU_APP_TOKEN = os.getenv('FEISHU_APP_TOKEN', '')
     config.FEISHU_TABLE_ID = os.getenv('FEISHU_TABLE_ID', '')
     config.FEISHU_FEEDBACK_TABLE_ID = os.getenv('FEISHU_FEEDBACK_TABLE_ID', '')
+    config.FEISHU_POOL_SIZE = int(os.getenv('FEISHU_POOL_SIZE', '10'))
+    config.FEISHU_CONNECT_TIMEOUT = float(os.getenv('FEISHU_CONNECT_TIMEOUT', '5'))
+    config.FEISHU_READ_TIMEOUT = float(os.getenv('FEISHU_READ_TIMEOUT', '30'))
+    config.FEISHU_MAX_RETRIES = int(os.getenv('FEISHU_MAX_RETRIES', '3'))
+    config.FEISHU_UPLOAD_INDEX_PATH = os.getenv('FEISHU_UPLOAD_INDEX_PATH', os.path.join(cache_dir, 'feishu_uploads.db'))
+    config.FEISHU_TOKEN_CACHE_PATH = os.getenv('FEISHU_TOKEN_CACHE_PATH', os.path.join(cache_dir, 'feishu_token.json'))
+    config.FEISHU_OUTBOX_ENABLED = os.getenv('FEISHU_OUTBOX_ENABLED', 'False').lower() == 'true'
+    config.FEISHU_OUTBOX_PATH = os.getenv('FEISHU_OUTBOX_PATH', os.path.join(cache_dir, 'feishu_outbox.db'))
     config.DOUBAO_API_KEY = os.getenv('DOUBAO_API_KEY', '')
     config.DOUBAO_API_URL = os.getenv('DOUBAO_API_URL', 'https://ark.cn-beijing.volces.com/api/v3/chat/completions')
+    config.DOUBAO_IMAGE_MAX_EDGE = int(os.getenv('DOUBAO_IMAGE_MAX_EDGE', '1600'))
+    config.DOUBAO_IMAGE_FORMAT = os.getenv('DOUBAO_IMAGE_FORMAT', 'JPEG')
+    config.DOUBAO_IMAGE_QUALITY = int(os.getenv('DOUBAO_IMAGE_QUALITY', '85'))
+    config.OCR_CACHE_PATH = os.getenv('OCR_CACHE_PATH', os.path.join(cache_dir, 'ocr_results.db'))
+    config.IMAGE_HASH_INDEX_PATH = os.getenv('IMAGE_HASH_INDEX_PATH', '')
+    config.IMAGE_DUPLICATE_DISTANCE = int(os.getenv('IMAGE_DUPLICATE_DISTANCE', '6'))
+    config.PAGE_MAX_WORKERS = int(os.getenv('PAGE_MAX_WORKERS', '4'))
+    config.HANDWRITING_ENGINE = os.getenv('HANDWRITING_ENGINE', 'auto')
+    config.STRIP_MAX_PIXELS = int(os.getenv('STRIP_MAX_PIXELS', '8000000'))
     config.DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY', '')
     config.DEEPSEEK_API_URL = os.getenv('DEEPSEEK_API_URL', 'https://api.deepseek.com/v1')
     config.OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
@@ -40,12 +61,12 @@ except (ImportError, AttributeError):
     config.MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', str(10 * 1024 * 1024)))
     sys.modules['config'] = config
 
-from src.feishu import FeishuClient
-from src.feishu.models import ErrorRecord
-from src.ocr import DoubaoOCR
+from src.feishu import FeishuClient, FeishuOutbox, is_provisional_id
+from src.feishu.models import ErrorRecord, FeedbackQuestion
+from src.ocr import DoubaoOCR, OCRResultCache, ImageProcessor
 from src.handwriting import HandwritingRemover
 from src.ai import SocraticGuide, QuestionGenerator
-from src.utils import validate_image, create_upload_dir, setup_logger
+from src.utils import validate_image, create_upload_dir, setup_logger, dhash, ImageHashIndex, ImageBuffer
 
 
 class ErrorQuestionApp:
@@ -75,14 +96,46 @@ class ErrorQuestionApp:
             app_secret=config.FEISHU_APP_SECRET,
             app_token=app_token,
             table_id=table_id,
-            feedback_table_id=feedback_table_id
+            feedback_table_id=feedback_table_id,
+            pool_size=getattr(config, 'FEISHU_POOL_SIZE', 10),
+            connect_timeout=getattr(config, 'FEISHU_CONNECT_TIMEOUT', 5.0),
+            read_timeout=getattr(config, 'FEISHU_READ_TIMEOUT', 30.0),
+            max_retries=getattr(config, 'FEISHU_MAX_RETRIES', 3),
+            upload_index_path=getattr(config, 'FEISHU_UPLOAD_INDEX_PATH', None),
+            token_cache_path=getattr(config, 'FEISHU_TOKEN_CACHE_PATH', None)
         )
         
+        # 飞书写入发件箱（可选）：入库不再等待飞书写入，失败自动重试
+        self.outbox = None
+        if getattr(config, 'FEISHU_OUTBOX_ENABLED', False):
+            self.outbox = FeishuOutbox(
+                self.feishu_client,
+                db_path=getattr(config, 'FEISHU_OUTBOX_PATH', None) or os.path.join(tempfile.gettempdir(), 'feishu_outbox.db')
+            )
+            self.outbox.start()
+        
+        # 已入库图片的重复检测索引（可选，默认关闭）：同一道题重复提交时直接返回已有记录
+        image_index_path = getattr(config, 'IMAGE_HASH_INDEX_PATH', None)
+        self.image_index = ImageHashIndex(
+            image_index_path,
+            max_distance=getattr(config, 'IMAGE_DUPLICATE_DISTANCE', 6)
+        ) if image_index_path else None
+        
         # 初始化OCR
-        self.ocr = DoubaoOCR(api_key=config.DOUBAO_API_KEY)
+        ocr_cache_path = getattr(config, 'OCR_CACHE_PATH', None)
+        self.ocr = DoubaoOCR(
+            api_key=config.DOUBAO_API_KEY,
+            cache=OCRResultCache(ocr_cache_path) if ocr_cache_path else None,
+            max_image_edge=getattr(config, 'DOUBAO_IMAGE_MAX_EDGE', 1600),
+            image_format=getattr(config, 'DOUBAO_IMAGE_FORMAT', 'JPEG'),
+            image_quality=getattr(config, 'DOUBAO_IMAGE_QUALITY', 85)
+        )
         
         # 初始化去手写
-        self.handwriting_remover = HandwritingRemover()
+        self.handwriting_remover = HandwritingRemover(
+            engine=getattr(config, 'HANDWRITING_ENGINE', 'auto'),
+            max_strip_pixels=getattr(config, 'STRIP_MAX_PIXELS', 8000000)
+        )
         
         # 初始化AI引导（使用DeepSeek，根据PRD推荐）
         deepseek_key = getattr(config, 'DEEPSEEK_API_KEY', config.DOUBAO_API_KEY)
@@ -104,74 +157,185 @@ class ErrorQuestionApp:
         # 创建上传目录
         self.upload_dir = create_upload_dir()
     
-    def process_error_question(self, image_path: str, error_type: str = "不会") -> str:
+    def process_error_question(self, image_path: str, error_type: str = "不会",
+                               allow_duplicate: bool = False) -> str:
         """
         处理错题的完整流程
         
         Args:
             image_path: 错题图片路径
             error_type: 错误类型（不会做/做错了）
+            allow_duplicate: 是否允许重复入库（为False时与已入库的同一道题直接返回已有记录ID）
             
         Returns:
-            创建的记录ID
+            创建的记录ID（重复时为已有记录的ID）
         """
         self.logger.info(f"开始处理错题: {image_path}")
         print(f"开始处理错题: {image_path}")
         
-        # 1. 验证图片
-        is_valid, error_msg = validate_image(image_path)
+        # 1. 读取并验证图片（之后各环节共用这一份内容和解码结果）
+        with self._load_image(image_path) as image:
+            return self._process_image(image, error_type, allow_duplicate)
+    
+    def process_worksheet(self, image_path: str, error_type: str = "不会",
+                          allow_duplicate: bool = False,
+                          max_workers: Optional[int] = None) -> List[Optional[str]]:
+        """
+        整页模式：把一页试卷切分为逐题区域，每道题分别识别、分析、去手写并入库
+        
+        整页只读取一次，切出的题目图片保留在内存中，不写临时文件；各题的处理流程在线程池中
+        并发执行，同时进行的题目数不超过max_workers。
+        
+        Args:
+            image_path: 整页图片路径
+            error_type: 错误类型（不会做/做错了）
+            allow_duplicate: 是否允许重复入库
+            max_workers: 同时处理的题目数，默认为配置中的PAGE_MAX_WORKERS
+            
+        Returns:
+            每道检测到的题目对应的记录ID（按从上到下的顺序），处理失败的题目为None
+        """
+        self.logger.info(f"开始处理整页错题: {image_path}")
+        print(f"开始处理整页错题: {image_path}")
+        
+        with self._load_image(image_path) as page:
+            regions = ImageProcessor.segment_questions(page)
+            crops = [
+                ImageBuffer(content, name=f"{Path(page.name).stem}_q{i}.jpg")
+                for i, content in enumerate(ImageProcessor.crop_regions(page, regions), 1)
+            ]
+        print(f"检测到{len(crops)}道题目")
+        self.logger.info(f"整页切分完成，共{len(crops)}道题目")
+        
+        # 同一页的题目版式相近，哈希可能彼此接近：整页处理完后再写入索引，
+        # 只与之前入库的图片比较，避免同页题目被误判为重复
+        new_hashes = []
+        max_workers = max_workers or getattr(config, 'PAGE_MAX_WORKERS', 4)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="page-question") as executor:
+            futures = [
+                executor.submit(self._process_image, crop, error_type, allow_duplicate, f"[第{i}题] ", new_hashes)
+                for i, crop in enumerate(crops, 1)
+            ]
+        
+        record_ids = []
+        for i, future in enumerate(futures, 1):
+            try:
+                record_ids.append(future.result())
+            except Exception as e:
+                # 单道题失败不影响其他题目
+                print(f"[第{i}题] 处理失败: {e}")
+                self.logger.warning(f"整页第{i}题处理失败: {e}")
+                record_ids.append(None)
+        
+        for image_hash, content_hash, question_text, record_id in new_hashes:
+            self._remember_image(image_hash, content_hash, question_text, record_id)
+        
+        if not any(record_ids):
+            raise Exception("整页处理失败: 没有题目成功入库")
+        return record_ids
+    
+    def _load_image(self, image_path: str) -> ImageBuffer:
+        """
+        读取并验证图片，并立即解码一次供后续各环节共用
+        
+        Args:
+            image_path: 图片路径
+            
+        Returns:
+            ImageBuffer
+        """
+        try:
+            image = ImageBuffer.from_path(image_path)
+        except FileNotFoundError:
+            is_valid, error_msg = False, "文件不存在"
+        else:
+            is_valid, error_msg = validate_image(image)
+        
         if not is_valid:
             error = f"图片验证失败: {error_msg}"
             self.logger.error(error)
             raise ValueError(error)
         
-        # 2. 识别题目
-        print("正在识别题目...")
+        image.image()
+        return image
+    
+    def _process_image(self, image: ImageBuffer, error_type: str, allow_duplicate: bool,
+                       prefix: str = "", new_hashes: Optional[list] = None) -> str:
+        """
+        单道题的处理流程：重复检测、识别分析、去手写、入库
+        
+        Args:
+            image: 图片（整页模式下为切分出的题目）
+            error_type: 错误类型
+            allow_duplicate: 是否允许重复入库
+            prefix: 输出信息的前缀（整页模式下标明题号）
+            new_hashes: 传入时新图片的(哈希, 内容哈希, 题目文字, 记录ID)追加到此列表，由调用方稍后写入索引
+            
+        Returns:
+            记录ID
+        """
+        # 重复检测第一步：内容完全相同的图片不再重复识别、上传和建记录
+        image_hash = None
+        check_duplicate = self.image_index is not None and not allow_duplicate
+        if check_duplicate:
+            record_id = self.image_index.find_exact(image.sha256)
+            if record_id:
+                print(f"{prefix}与已入库的错题重复，记录ID: {record_id}")
+                self.logger.info(f"检测到相同图片，复用记录: {record_id}")
+                return record_id
+        if self.image_index is not None:
+            try:
+                image_hash = dhash(image)
+            except Exception as e:
+                self.logger.warning(f"计算图片哈希失败: {e}")
+        
+        # 2. 识别并分析题目（一次调用视觉模型，返回格式不符时自动退回两次调用）
+        print(f"{prefix}正在识别题目...")
         self.logger.info("开始识别题目")
         try:
-            recognize_result = self.ocr.recognize_question(image_path)
+            recognize_result = self.ocr.recognize_and_analyze(image)
             if not recognize_result["success"]:
                 error = f"识别失败: {recognize_result.get('error')}"
                 self.logger.error(error)
                 raise Exception(error)
             
             question_text = recognize_result["question_text"]
-            print(f"识别结果: {question_text[:50]}...")
-            self.logger.info(f"识别成功，题目长度: {len(question_text)}")
+            print(f"{prefix}识别结果: {question_text[:50]}...")
+            self.logger.info(f"识别成功（{recognize_result.get('mode')}），题目长度: {len(question_text)}")
         except Exception as e:
             self.logger.error(f"识别过程出错: {e}", exc_info=True)
             raise
         
-        # 3. 分析题目
-        print("正在分析题目...")
-        self.logger.info("开始分析题目")
-        try:
-            analysis_result = self.ocr.analyze_question(image_path, question_text)
-            if not analysis_result["success"]:
-                print(f"分析失败: {analysis_result.get('error')}")
-                self.logger.warning(f"题目分析失败: {analysis_result.get('error')}")
-                analysis = {}
-            else:
-                analysis = analysis_result["analysis"]
-                self.logger.info(f"分析成功: 科目={analysis.get('subject')}, 年级={analysis.get('grade')}")
-        except Exception as e:
-            self.logger.warning(f"分析过程出错: {e}")
-            analysis = {}
+        # 重复检测第二步：哈希接近只是候选（版式相同的不同题目哈希也可能很近），
+        # 识别出的题目文字一致才复用已有记录
+        if check_duplicate and image_hash is not None:
+            duplicate = self.image_index.find_duplicate(image_hash, question_text)
+            if duplicate:
+                record_id, distance = duplicate
+                print(f"{prefix}与已入库的错题重复，记录ID: {record_id}")
+                self.logger.info(f"检测到重复题目（汉明距离{distance}，题目文字一致），复用记录: {record_id}")
+                return record_id
+        
+        # 3. 分析结果
+        analysis = recognize_result.get("analysis") or {}
+        if analysis:
+            self.logger.info(f"分析成功: 科目={analysis.get('subject')}, 年级={analysis.get('grade')}")
+        else:
+            print(f"{prefix}分析失败: {recognize_result.get('analysis_error')}")
+            self.logger.warning(f"题目分析失败: {recognize_result.get('analysis_error')}")
         
         # 4. 去手写处理
-        print("正在去除手写...")
+        print(f"{prefix}正在去除手写...")
         self.logger.info("开始去手写处理")
         try:
-            cleaned_image_path = self.handwriting_remover.remove_handwriting(
-                image_path,
-                output_path=os.path.join(self.upload_dir, f"cleaned_{Path(image_path).name}")
-            )
-            print(f"去手写完成: {cleaned_image_path}")
-            self.logger.info(f"去手写完成: {cleaned_image_path}")
+            # 处理结果保留在内存中，随记录直接上传，不再写入上传目录后重新读取
+            cleaned_image = self.handwriting_remover.remove_handwriting_buffer(image)
+            print(f"{prefix}去手写完成")
+            self.logger.info(f"去手写完成: {cleaned_image.name}")
         except Exception as e:
             self.logger.error(f"去手写处理失败: {e}", exc_info=True)
             # 去手写失败不影响主流程，继续执行
-            cleaned_image_path = image_path
+            cleaned_image = image
         
         # 5. 创建错题记录
         # 注意：question_text 不保存到飞书表格，仅用于内部处理
@@ -181,8 +345,8 @@ class ErrorQuestionApp:
         # 这里暂时只使用subject
         
         record = ErrorRecord(
-            original_image=image_path,
-            cleaned_image=cleaned_image_path,
+            original_image=image,
+            cleaned_image=cleaned_image,
             question_text=question_text,  # 内部使用，不保存到飞书
             subject=subject,  # 学科：数学/语文/英语
             knowledge_points=analysis.get("knowledge_points", []),
@@ -194,17 +358,59 @@ class ErrorQuestionApp:
         )
         
         # 6. 保存到飞书
-        print("正在保存到飞书多维表格...")
+        if self.outbox is not None:
+            # 写入本地发件箱后立即返回临时ID，由后台线程批量写入飞书
+            record_id = self.outbox.enqueue_error_record(record)
+            print(f"{prefix}已加入飞书写入队列，临时记录ID: {record_id}")
+            self.logger.info(f"已加入飞书写入队列，临时记录ID: {record_id}")
+            self._remember_image(image_hash, image.sha256, question_text, record_id, new_hashes)
+            return record_id
+        
+        print(f"{prefix}正在保存到飞书多维表格...")
         self.logger.info("开始保存到飞书")
         try:
             record_id = self.feishu_client.create_error_record(record)
-            print(f"保存成功，记录ID: {record_id}")
+            print(f"{prefix}保存成功，记录ID: {record_id}")
             self.logger.info(f"保存成功，记录ID: {record_id}")
-            return record_id
         except Exception as e:
             error = f"保存到飞书失败: {e}"
             self.logger.error(error, exc_info=True)
             raise Exception(error)
+        
+        self._remember_image(image_hash, image.sha256, question_text, record_id, new_hashes)
+        return record_id
+    
+    def _remember_image(self, image_hash: Optional[int], content_hash: str, question_text: str,
+                        record_id: str, new_hashes: Optional[list] = None):
+        """把新入库图片的哈希和题目文字写入索引（索引写入失败不影响入库结果）"""
+        if self.image_index is None or image_hash is None:
+            return
+        if new_hashes is not None:
+            new_hashes.append((image_hash, content_hash, question_text, record_id))
+            return
+        try:
+            self.image_index.add(image_hash, record_id, content_hash, question_text)
+        except Exception as e:
+            self.logger.warning(f"写入图片哈希索引失败: {e}")
+    
+    def _resolve_record_id(self, record_id: str, timeout: float = 30.0) -> str:
+        """
+        把发件箱返回的临时ID解析为飞书记录ID（必要时等待写入完成）
+        
+        Args:
+            record_id: 飞书记录ID或临时ID
+            timeout: 最长等待时间（秒）
+            
+        Returns:
+            飞书记录ID
+        """
+        if self.outbox is None or not is_provisional_id(record_id):
+            return record_id
+        
+        resolved = self.outbox.wait(record_id, timeout=timeout)
+        if not resolved:
+            raise ValueError(f"记录尚未同步到飞书: {record_id}")
+        return resolved
     
     def start_guide_learning(self, record_id: str, question_text: Optional[str] = None) -> dict:
         """
@@ -218,18 +424,16 @@ class ErrorQuestionApp:
             引导结果
         """
         # 获取错题记录
-        records = self.feishu_client.get_error_records()
-        record = next((r for r in records if r.get("record_id") == record_id), None)
+        record_id = self._resolve_record_id(record_id)
+        record = self.feishu_client.get_error_record(record_id)
         
         if not record:
             raise ValueError(f"未找到记录: {record_id}")
         
-        fields = record.get("fields", {})
-        
         # 获取题目文本：优先使用传入的参数，否则尝试从引导问题字段获取，最后重新识别
         if not question_text:
             # 尝试从引导问题字段的开头获取（如果之前保存过）
-            guide_questions = fields.get("引导问题", "")
+            guide_questions = record.guide_questions or ""
             if guide_questions and "题目：" in guide_questions:
                 # 简单提取，实际可能需要更复杂的解析
                 question_text = ""
@@ -239,18 +443,25 @@ class ErrorQuestionApp:
                 # 暂时提示用户需要提供题目文本
                 raise ValueError("需要提供题目文本，或从错题原图重新识别")
         
-        subject = fields.get("学科", "")  # 更新为"学科"
-        error_type = fields.get("不会/做错", "")
+        subject = record.subject or ""
+        error_type = record.error_type or ""
         
         # 生成引导问题
         print("正在生成引导问题...")
-        guide_questions = self.guide.generate_guide_questions(
-            question_text, subject, error_type
-        )
+        guide_questions = []
+        # 流式生成，每个问题一生成完就显示
+        try:
+            for q in self.guide.generate_guide_questions(question_text, subject, error_type, stream=True):
+                guide_questions.append(q)
+                print(f"{len(guide_questions)}. {q}")
+        except Exception as e:
+            self.logger.error(str(e))
+            if not guide_questions:
+                raise
+            # 已生成的问题仍然可用
+            print(f"[生成中断: {e}]")
         
         print(f"生成了{len(guide_questions)}个引导问题")
-        for i, q in enumerate(guide_questions, 1):
-            print(f"{i}. {q}")
         
         return {
             "questions": guide_questions,
@@ -271,44 +482,49 @@ class ErrorQuestionApp:
             反馈题列表
         """
         # 获取错题记录
-        records = self.feishu_client.get_error_records()
-        record = next((r for r in records if r.get("record_id") == record_id), None)
+        record_id = self._resolve_record_id(record_id)
+        record = self.feishu_client.get_error_record(record_id)
         
         if not record:
             raise ValueError(f"未找到记录: {record_id}")
         
-        fields = record.get("fields", {})
-        
         # 获取题目文本：优先使用传入的参数，否则需要重新识别
         if not question_text:
             # 需要从错题原图重新识别，或提示用户提供
             raise ValueError("需要提供题目文本，或从错题原图重新识别")
         
-        subject = fields.get("学科", "")  # 更新为"学科"
-        knowledge_points = fields.get("知识点", [])
-        error_type = fields.get("不会/做错", "")
+        subject = record.subject or ""
+        knowledge_points = record.knowledge_points or []
+        error_type = record.error_type or ""
         
         # 生成反馈题
         print(f"正在生成{count}道反馈题...")
-        questions = self.generator.generate_feedback_questions(
-            question_text, subject, knowledge_points, error_type, count
+        questions = []
+        # 保存反馈题到飞书表格（流式逐题显示，最后一次批量写入）
+        feedback_records = []
+        stream = self.generator.generate_feedback_questions(
+            question_text, subject, knowledge_points, error_type, count, stream=True
         )
-        
-        print(f"生成了{len(questions)}道反馈题")
-        
-        # 保存反馈题到飞书表格
-        saved_question_ids = []
-        for i, q in enumerate(questions, 1):
+        while True:
+            try:
+                q = next(stream)
+            except StopIteration:
+                break
+            except Exception as e:
+                self.logger.error(str(e))
+                if not questions:
+                    raise
+                # 中途失败时保留并保存已生成的题目
+                print(f"\n[生成中断: {e}]")
+                break
+            questions.append(q)
+            i = len(questions)
             print(f"\n题目{i} ({q.get('difficulty', '未知难度')}):")
             print(f"  {q.get('question', '')}")
             print(f"  答案: {q.get('answer', '')}")
             
-            # 创建反馈题记录并保存到飞书
             try:
-                from src.feishu.models import FeedbackQuestion
-                from datetime import datetime
-                
-                feedback_record = FeedbackQuestion(
+                feedback_records.append(FeedbackQuestion(
                     master_question_id=record_id,
                     question_content=q.get('question', ''),
                     difficulty=q.get('difficulty', '基础'),
@@ -316,17 +532,26 @@ class ErrorQuestionApp:
                     student_answer=None,
                     is_correct=None,
                     created_at=datetime.now()
-                )
-                
-                feedback_id = self.feishu_client.create_feedback_question(feedback_record)
-                saved_question_ids.append(feedback_id)
-                print(f"  [已保存到飞书，记录ID: {feedback_id}]")
+                ))
             except Exception as e:
                 print(f"  [保存失败: {e}]")
                 self.logger.warning(f"保存反馈题失败: {e}")
         
-        if saved_question_ids:
-            print(f"\n✅ 成功保存 {len(saved_question_ids)} 道反馈题到飞书表格")
+        print(f"\n生成了{len(questions)}道反馈题")
+        
+        if feedback_records:
+            try:
+                result = self.feishu_client.create_feedback_questions(feedback_records)
+                for item in result["failed"]:
+                    print(f"  [题目{item['index'] + 1}保存失败: {item['error']}]")
+                    self.logger.warning(f"保存反馈题失败: {item['error']}")
+                
+                saved_count = sum(1 for rid in result["record_ids"] if rid)
+                if saved_count:
+                    print(f"\n✅ 成功保存 {saved_count} 道反馈题到飞书表格")
+            except Exception as e:
+                print(f"  [保存失败: {e}]")
+                self.logger.warning(f"保存反馈题失败: {e}")
         
         return questions
 
@@ -339,12 +564,22 @@ def main():
     
     app = ErrorQuestionApp()
     
-    # 示例：处理错题
-    if len(sys.argv) > 1:
-        image_path = sys.argv[1]
-        error_type = sys.argv[2] if len(sys.argv) > 2 else "不会"
+    # 示例：处理错题（--page：整张试卷拍照，逐题入库）
+    page_mode = "--page" in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != "--page"]
+    if args:
+        image_path = args[0]
+        error_type = args[1] if len(args) > 1 else "不会"
         
         try:
+            if page_mode:
+                record_ids = app.process_worksheet(image_path, error_type)
+                saved = [rid for rid in record_ids if rid]
+                print(f"\n✅ 整页处理完成！共{len(record_ids)}道题，成功{len(saved)}道")
+                for i, rid in enumerate(record_ids, 1):
+                    print(f"  第{i}题: {rid or '失败'}")
+                return
+            
             record_id = app.process_error_question(image_path, error_type)
             print(f"\n✅ 错题处理完成！记录ID: {record_id}")
             
@@ -364,6 +599,7 @@ def main():
     else:
         print("\n使用方法:")
         print("  python main.py <图片路径> [错误类型]")
+        print("  python main.py --page <整页图片路径> [错误类型]")
         print("\n错误类型:")
         print("  - 不会")
         print("  - 做错")
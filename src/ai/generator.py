@@ -3,9 +3,11 @@
 """
 
 import requests
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union, Iterator
 import json
 
+from ..utils.streaming import stream_chat_completion, iter_json_array_items
+
 
 class QuestionGenerator:
     """反馈题生成器"""
@@ -35,7 +37,7 @@ class QuestionGenerator:
     
     def generate_feedback_questions(self, master_question: str, subject: str, 
                                     knowledge_points: List[str], error_type: str,
-                                    count: int = 5) -> List[Dict]:
+                                    count: int = 5, stream: bool = False) -> Union[List[Dict], Iterator[Dict]]:
         """
         基于母题生成反馈题
         
@@ -45,9 +47,10 @@ class QuestionGenerator:
             knowledge_points: 知识点列表
             error_type: 错误类型（不会/做错）
             count: 生成题目数量
+            stream: 是否流式返回（每道题的JSON一闭合就产出）
             
         Returns:
-            反馈题列表，每个包含题目、答案、难度等信息
+            反馈题列表，每个包含题目、答案、难度等信息；stream=True时返回反馈题迭代器（生成失败时迭代中抛出异常）
         """
         url = f"{self.api_url}/chat/completions"
         
@@ -98,6 +101,9 @@ class QuestionGenerator:
             "response_format": {"type": "json_object"}
         }
         
+        if stream:
+            return self._stream_feedback_questions(url, data)
+        
         try:
             response = requests.post(url, json=data, headers=self.headers, timeout=60)
             response.raise_for_status()
@@ -114,6 +120,16 @@ class QuestionGenerator:
             print(f"生成反馈题失败: {e}")
             return []
     
+    def _stream_feedback_questions(self, url: str, data: Dict) -> Iterator[Dict]:
+        """流式生成反馈题，边接收边解析questions数组；中途出错时抛出异常（已产出的题目仍然有效）"""
+        try:
+            chunks = stream_chat_completion(url, data, self.headers, timeout=60)
+            for question in iter_json_array_items(chunks, key="questions"):
+                if isinstance(question, dict):
+                    yield question
+        except Exception as e:
+            raise Exception(f"生成反馈题失败: {e}") from e
+    
     def generate_similar_question(self, master_question: str, subject: str) -> Dict:
         """
         生成一道相似题（快速生成）
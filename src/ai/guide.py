@@ -3,9 +3,43 @@
 """
 
 import requests
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union, Iterator
 from datetime import datetime
 
+from ..utils.streaming import stream_chat_completion, iter_complete_lines
+
+
+def _parse_guide_line(line: str) -> Optional[str]:
+    """
+    从模型返回的一行中取出引导问题
+
+    Args:
+        line: 一行文本
+
+    Returns:
+        去掉编号后的问题，不是问题行时返回None
+    """
+    line = line.strip()
+    if not line or not line.startswith(('1', '2', '3', '4', '5', 'Q', '问')):
+        return None
+    # 清理问题编号
+    return line.split('.', 1)[-1].strip() if '.' in line else line
+
+
+def _classify_reply(content: str) -> Dict:
+    """判断回复是继续提问还是总结"""
+    if "?" in content or "？" in content or "接下来" in content or "那么" in content:
+        return {
+            "type": "question",
+            "content": content,
+            "is_finished": False
+        }
+    return {
+        "type": "summary",
+        "content": content,
+        "is_finished": True
+    }
+
 
 class SocraticGuide:
     """苏格拉底式引导类"""
@@ -34,7 +68,7 @@ class SocraticGuide:
         }
     
     def generate_guide_questions(self, question_text: str, subject: str, 
-                                error_type: str) -> List[str]:
+                                error_type: str, stream: bool = False) -> Union[List[str], Iterator[str]]:
         """
         生成引导问题列表
         
@@ -42,9 +76,10 @@ class SocraticGuide:
             question_text: 题目文本
             subject: 科目
             error_type: 错误类型（不会/做错）
+            stream: 是否流式返回（每生成完一行问题就产出一个）
             
         Returns:
-            引导问题列表
+            引导问题列表；stream=True时返回问题迭代器（生成失败时迭代中抛出异常）
         """
         url = f"{self.api_url}/chat/completions"
         
@@ -76,6 +111,9 @@ class SocraticGuide:
             "temperature": 0.7
         }
         
+        if stream:
+            return self._stream_guide_questions(url, data)
+        
         try:
             response = requests.post(url, json=data, headers=self.headers, timeout=30)
             response.raise_for_status()
@@ -84,10 +122,8 @@ class SocraticGuide:
             if "choices" in result and len(result["choices"]) > 0:
                 content = result["choices"][0]["message"]["content"]
                 # 解析问题列表
-                questions = [q.strip() for q in content.split('\n') if q.strip() and q.strip().startswith(('1', '2', '3', '4', '5', 'Q', '问'))]
-                # 清理问题编号
-                questions = [q.split('.', 1)[-1].strip() if '.' in q else q for q in questions]
-                return questions
+                questions = [_parse_guide_line(line) for line in content.split('\n')]
+                return [q for q in questions if q]
             else:
                 return []
                 
@@ -95,8 +131,20 @@ class SocraticGuide:
             print(f"生成引导问题失败: {e}")
             return []
     
+    def _stream_guide_questions(self, url: str, data: Dict) -> Iterator[str]:
+        """流式生成引导问题，每凑齐一行就解析；中途出错时抛出异常（已产出的问题仍然有效）"""
+        try:
+            chunks = stream_chat_completion(url, data, self.headers, timeout=30)
+            for line in iter_complete_lines(chunks):
+                question = _parse_guide_line(line)
+                if question:
+                    yield question
+        except Exception as e:
+            raise Exception(f"生成引导问题失败: {e}") from e
+    
     def continue_dialogue(self, question_text: str, current_question: str, 
-                         student_answer: str, conversation_history: List[Dict]) -> Dict:
+                         student_answer: str, conversation_history: List[Dict],
+                         stream: bool = False) -> Union[Dict, Iterator[Dict]]:
         """
         继续对话，根据学生回答生成下一个问题或总结
         
@@ -105,9 +153,11 @@ class SocraticGuide:
             current_question: 当前问题
             student_answer: 学生回答
             conversation_history: 对话历史
+            stream: 是否流式返回
             
         Returns:
-            包含下一个问题或总结的字典
+            包含下一个问题或总结的字典；stream=True时返回迭代器，先逐段产出
+            {"type": "delta", "content": 文本片段}，最后产出与非流式相同的字典
         """
         url = f"{self.api_url}/chat/completions"
         
@@ -141,6 +191,9 @@ class SocraticGuide:
             "temperature": 0.7
         }
         
+        if stream:
+            return self._stream_dialogue(url, data)
+        
         try:
             response = requests.post(url, json=data, headers=self.headers, timeout=30)
             response.raise_for_status()
@@ -150,18 +203,7 @@ class SocraticGuide:
                 content = result["choices"][0]["message"]["content"]
                 
                 # 判断是继续提问还是总结
-                if "?" in content or "？" in content or "接下来" in content or "那么" in content:
-                    return {
-                        "type": "question",
-                        "content": content,
-                        "is_finished": False
-                    }
-                else:
-                    return {
-                        "type": "summary",
-                        "content": content,
-                        "is_finished": True
-                    }
+                return _classify_reply(content)
             else:
                 return {
                     "type": "error",
@@ -176,6 +218,30 @@ class SocraticGuide:
                 "is_finished": False
             }
     
+    def _stream_dialogue(self, url: str, data: Dict) -> Iterator[Dict]:
+        """流式继续对话，结束后再判断是继续提问还是总结"""
+        parts = []
+        try:
+            for chunk in stream_chat_completion(url, data, self.headers, timeout=30):
+                parts.append(chunk)
+                yield {"type": "delta", "content": chunk}
+        except Exception as e:
+            yield {
+                "type": "error",
+                "content": f"对话失败: {e}",
+                "is_finished": False
+            }
+            return
+        
+        if not parts:
+            yield {
+                "type": "error",
+                "content": "生成回复失败",
+                "is_finished": False
+            }
+            return
+        yield _classify_reply("".join(parts))
+    
     def generate_solution_checklist(self, question_text: str, solution_approach: str, 
                                    subject: str) -> Dict[str, str]:
         """
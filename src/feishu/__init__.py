@@ -4,6 +4,21 @@
 
 from .client import FeishuClient
 from .models import ErrorRecord, FeedbackQuestion
+from .cache import RecordCache
+from .upload_index import UploadIndex
+from .auth import TenantTokenProvider
+from .async_client import AsyncFeishuClient
+from .outbox import FeishuOutbox, is_provisional_id
+from .ratelimit import EndpointRateLimiter, FeishuRateLimitError
+from .schema import TableSchema, FieldValidationError
+from .codec import RecordCodec, ERROR_RECORD_CODEC, FEEDBACK_QUESTION_CODEC
 
-__all__ = ["FeishuClient", "ErrorRecord", "FeedbackQuestion"]
+__all__ = [
+    "FeishuClient", "AsyncFeishuClient", "ErrorRecord", "FeedbackQuestion",
+    "RecordCache", "UploadIndex", "TenantTokenProvider",
+    "FeishuOutbox", "is_provisional_id",
+    "EndpointRateLimiter", "FeishuRateLimitError",
+    "TableSchema", "FieldValidationError",
+    "RecordCodec", "ERROR_RECORD_CODEC", "FEEDBACK_QUESTION_CODEC"
+]
 
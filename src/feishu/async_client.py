@@ -0,0 +1,1065 @@
+"""
+飞书多维表格异步API客户端
+
+与FeishuClient接口一致，基于httpx的连接池，适合在asyncio服务中
+同时处理大量入库请求
+"""
+
+import os
+import zlib
+import uuid
+import random
+import asyncio
+from datetime import datetime
+from pydantic import BaseModel
+from typing import Optional, List, Dict, Any, AsyncIterator, Callable, Awaitable, Tuple, Union, Set
+
+from .models import ErrorRecord, FeedbackQuestion
+from .fields import encode_error_fields, encode_feedback_fields
+from .codec import RecordCodec, ERROR_RECORD_CODEC, FEEDBACK_QUESTION_CODEC
+from .cache import RecordCache
+from .query import build_error_record_search
+from .schema import SchemaCache, TableSchema, FieldValidationError
+from .upload_index import UploadIndex
+from .auth import TenantTokenProvider
+from .ratelimit import (
+    EndpointRateLimiter, FeishuRateLimitError, RATE_LIMIT_CODES, endpoint_family, retry_after_seconds
+)
+from .planning import (
+    plan_attachment_uploads, attachment_fields, upload_prepare_body, parse_upload_session,
+    upload_part_form, resumable_session, missing_parts, apply_batch_result, plan_updates,
+    diff_with_snapshot, apply_to_snapshot, _UploadSessionError
+)
+from .client import (
+    RETRY_STATUS_CODES, BATCH_RECORD_LIMIT,
+    MAX_PAGE_SIZE, RECORD_NOT_FOUND_CODE, CHUNKED_UPLOAD_THRESHOLD
+)
+from ..utils.helpers import file_sha256, content_sha256
+
+# httpx为可选依赖，只有使用异步客户端时才需要安装
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+
+
+# 流式上传时每次从磁盘读取的字节数
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+
+class AsyncFeishuClient:
+    """飞书多维表格异步API客户端"""
+
+    def __init__(self, app_id: str, app_secret: str, app_token: str,
+                 table_id: Optional[str] = None, feedback_table_id: Optional[str] = None,
+                 pool_size: int = 100, connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 max_retries: int = 3, backoff_factor: float = 0.5, backoff_max: float = 8.0,
+                 record_cache_size: int = 256, record_cache_ttl: float = 300.0,
+                 upload_index_path: Optional[str] = None,
+                 token_cache_path: Optional[str] = None,
+                 rate_limits: Optional[Dict[str, float]] = None,
+                 rate_limiter: Optional[EndpointRateLimiter] = None,
+                 schema_ttl: float = 3600.0, validate_schema: bool = True,
+                 chunked_upload_threshold: int = CHUNKED_UPLOAD_THRESHOLD, upload_part_workers: int = 4):
+        """
+        初始化异步飞书客户端
+
+        参数含义与FeishuClient相同。pool_size默认更大，便于同一事件循环上
+        并发大量请求。
+        """
+        if not HAS_HTTPX:
+            raise ImportError("异步客户端需要httpx，请先安装：pip install httpx")
+
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.app_token = app_token
+        self.table_id = table_id or "tblXXXXXXXX"
+        self.feedback_table_id = feedback_table_id
+        self.base_url = "https://open.feishu.cn/open-apis"
+
+        # 连接与重试配置
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+        )
+        self.rate_limiter = rate_limiter or EndpointRateLimiter(rate_limits)
+
+        # 访问令牌：复用同步客户端的缓存逻辑，网络请求由本客户端异步发起
+        self.token_provider = TenantTokenProvider(
+            fetch_token=None,
+            cache_key=app_id,
+            shared_cache_path=token_cache_path
+        )
+        self._token_lock = asyncio.Lock()
+        self._token_refresh_task: Optional[asyncio.Task] = None
+
+        self.record_cache = RecordCache(max_size=record_cache_size, ttl=record_cache_ttl)
+
+        # 表结构缓存，写入前在本地校验字段名和字段类型
+        self.schema_cache = SchemaCache(ttl=schema_ttl)
+        self.validate_schema = validate_schema
+        self._schema_lock = asyncio.Lock()
+
+        self.upload_index = UploadIndex(upload_index_path) if upload_index_path else None
+        self.chunked_upload_threshold = chunked_upload_threshold
+        self.upload_part_workers = upload_part_workers
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """关闭连接池"""
+        await self.http.aclose()
+        if self.upload_index is not None:
+            self.upload_index.close()
+
+    def rate_limit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各接口类别的限流统计（当前速率、排队数、等待时间等）"""
+        return self.rate_limiter.stats()
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """计算第attempt次重试前的等待时间（带随机抖动的指数退避）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * (2 ** attempt)))
+
+    async def _request(self, method: str, url: str,
+                       content_factory: Optional[Callable[[], AsyncIterator[bytes]]] = None,
+                       **kwargs) -> Dict[str, Any]:
+        """
+        发送请求并返回JSON结果（重试策略与FeishuClient._request一致）
+
+        Args:
+            method: HTTP方法
+            url: 请求地址
+            content_factory: 流式请求体的工厂函数，每次重试都会重新生成
+            **kwargs: 透传给httpx的参数
+        """
+        family = endpoint_family(url)
+
+        # max_retries为负数时也至少发送一次
+        for attempt in range(max(self.max_retries, 0) + 1):
+            is_last = attempt >= self.max_retries
+            await self.rate_limiter.acquire_async(family)
+            if content_factory is not None:
+                kwargs["content"] = content_factory()
+
+            try:
+                response = await self.http.request(method, url, **kwargs)
+            except (httpx.TimeoutException, httpx.TransportError):
+                if is_last:
+                    raise
+                await asyncio.sleep(self._backoff_delay(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and not is_last:
+                await asyncio.sleep(self._backoff_delay(attempt))
+                continue
+
+            result = self._parse_response(response) if response.status_code != 429 else self._json_or_empty(response)
+
+            if response.status_code == 429 or result.get("code") in RATE_LIMIT_CODES:
+                retry_after = retry_after_seconds(response.headers)
+                self.rate_limiter.on_rate_limited(family, retry_after)
+                if is_last:
+                    raise FeishuRateLimitError(
+                        f"飞书接口限流: {result.get('msg') or response.status_code}",
+                        code=result.get("code"),
+                        retry_after=retry_after
+                    )
+                # 有重置时间时令牌桶已暂停发放，下一轮获取许可时自然等待
+                if retry_after is None:
+                    await asyncio.sleep(self._backoff_delay(attempt))
+                continue
+
+            self.rate_limiter.on_success(family)
+            return result
+
+        # 正常情况下最后一次尝试一定会返回或抛出异常，这里避免静默返回None
+        raise Exception(f"请求失败: 重试次数已用尽 ({method} {url})")
+
+    @staticmethod
+    def _json_or_empty(response: "httpx.Response") -> Dict[str, Any]:
+        """解析响应JSON，无法解析时返回空字典"""
+        try:
+            result = response.json()
+        except ValueError:
+            return {}
+        return result if isinstance(result, dict) else {}
+
+    @staticmethod
+    def _parse_response(response: "httpx.Response") -> Dict[str, Any]:
+        """解析响应JSON，规则同FeishuClient._parse_response"""
+        if response.status_code >= 400:
+            try:
+                result = response.json()
+            except ValueError:
+                result = None
+            if isinstance(result, dict) and "code" in result:
+                return result
+            response.raise_for_status()
+
+        return response.json()
+
+    async def _get_access_token(self) -> str:
+        """
+        获取访问令牌（单飞刷新，临近过期时在后台任务中提前刷新）
+
+        进程内的有效token直接使用；读写共享缓存文件放到线程中，不阻塞事件循环
+        """
+        token = await self._peek_token()
+        if token:
+            if self.token_provider.should_refresh_ahead():
+                self._start_background_refresh()
+            return token
+
+        async with self._token_lock:
+            # 等锁期间可能已有其他协程刷新成功
+            token = await self._peek_token()
+            if token:
+                return token
+            return await self._refresh_access_token()
+
+    async def _peek_token(self) -> Optional[str]:
+        """当前有效的token：先看进程内，没有时在线程中读取共享缓存"""
+        token = self.token_provider.cached_token()
+        if token or not self.token_provider.shared_cache_path:
+            return token
+        return await asyncio.to_thread(self.token_provider.peek)
+
+    async def _refresh_access_token(self) -> str:
+        """向飞书申请新的tenant_access_token并写入缓存"""
+        url = f"{self.base_url}/auth/v3/tenant_access_token/internal"
+        headers = {"Content-Type": "application/json; charset=utf-8"}
+        data = {
+            "app_id": self.app_id,
+            "app_secret": self.app_secret
+        }
+
+        result = await self._request("POST", url, json=data, headers=headers)
+
+        if result.get("code") != 0:
+            raise Exception(f"获取token失败: {result.get('msg')}")
+
+        token = result["tenant_access_token"]
+        # set_token会写共享缓存文件
+        await asyncio.to_thread(self.token_provider.set_token, token, result.get("expire", 7200))
+        return token
+
+    def _start_background_refresh(self):
+        """启动后台刷新任务（同一时间最多一个）"""
+        if self._token_refresh_task is not None and not self._token_refresh_task.done():
+            return
+
+        async def run():
+            async with self._token_lock:
+                if not self.token_provider.should_refresh_ahead():
+                    return
+                try:
+                    await self._refresh_access_token()
+                except Exception:
+                    # 后台刷新失败不影响当前token，过期后由请求协程同步刷新
+                    pass
+
+        self._token_refresh_task = asyncio.get_running_loop().create_task(run())
+
+    async def _get_headers(self) -> Dict[str, str]:
+        """获取请求头"""
+        token = await self._get_access_token()
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json; charset=utf-8"
+        }
+
+    async def get_table_schema(self, table_id: Optional[str] = None, refresh: bool = False) -> TableSchema:
+        """
+        获取数据表的字段结构（按schema_ttl缓存）
+
+        Args:
+            table_id: 数据表ID，默认为错题本表
+            refresh: 是否忽略缓存重新获取
+
+        Returns:
+            表结构
+        """
+        table_id = table_id or self.table_id
+        if refresh:
+            self.schema_cache.invalidate(table_id)
+        schema = self.schema_cache.peek(table_id)
+        if schema is not None:
+            return schema
+
+        # 同一时间只有一个协程去拉取表结构
+        async with self._schema_lock:
+            schema = self.schema_cache.peek(table_id)
+            if schema is None:
+                items = [item async for item in _iter_pages(
+                    lambda page_token: self._list_fields_page(table_id, page_token)
+                )]
+                schema = self.schema_cache.put(table_id, items)
+            return schema
+
+    async def _list_fields_page(self, table_id: str, page_token: Optional[str] = None) -> Dict[str, Any]:
+        """获取一页字段列表"""
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{table_id}/fields"
+        params = {"page_size": 100}
+        if page_token:
+            params["page_token"] = page_token
+
+        headers = await self._get_headers()
+        result = await self._request("GET", url, params=params, headers=headers)
+
+        if result.get("code") != 0:
+            raise Exception(f"获取字段列表失败: {result.get('msg')}")
+
+        return result.get("data") or {}
+
+    async def _table_schema(self, table_id: str) -> Optional[TableSchema]:
+        """获取用于本地校验和编解码的表结构，规则同FeishuClient._table_schema"""
+        if not self.validate_schema:
+            return None
+        try:
+            return await self.get_table_schema(table_id)
+        except Exception:
+            return None
+
+    async def _check_fields(self, table_id: str, fields: Dict[str, Any]) -> List[str]:
+        """按表结构在本地检查字段，没有可用的表结构时返回空列表"""
+        schema = await self._table_schema(table_id)
+        return schema.check(fields) if schema is not None else []
+
+    async def _record_codec(self, table_id: str, codec: RecordCodec) -> RecordCodec:
+        """按数据表的表结构编译编解码器（没有可用的表结构时使用字段表的默认类型）"""
+        return codec.compile(await self._table_schema(table_id))
+
+    async def _validate_fields(self, table_id: str, fields: Dict[str, Any]):
+        """按表结构在本地校验字段，不通过时抛出FieldValidationError"""
+        errors = await self._check_fields(table_id, fields)
+        if errors:
+            raise FieldValidationError(f"字段校验失败: {'; '.join(errors)}", errors)
+
+    async def _upload_file(self, file_path: str) -> str:
+        """
+        上传文件到飞书
+
+        去重和分片规则与FeishuClient._upload_file相同。文件内容按块在线程中读取并流式
+        发送，不阻塞事件循环，也不把整个文件读入内存。
+
+        Args:
+            file_path: 本地文件路径
+
+        Returns:
+            文件token
+        """
+        content_hash = None
+        if self.upload_index is not None:
+            content_hash = await asyncio.to_thread(file_sha256, file_path)
+            file_token = await asyncio.to_thread(self.upload_index.get, self.app_id, content_hash)
+            if file_token:
+                return file_token
+
+        file_name = os.path.basename(file_path)
+        size = await asyncio.to_thread(os.path.getsize, file_path)
+        if size > self.chunked_upload_threshold:
+            async def read_part(offset: int, length: int) -> bytes:
+                return await asyncio.to_thread(_read_range, file_path, offset, length)
+
+            file_token = await self._upload_file_chunked(read_part, file_name, size, content_hash)
+        else:
+            file_token = await self._upload_small_file(
+                lambda head, tail: _stream_file(file_path, head, tail), file_name, size
+            )
+
+        if content_hash is not None:
+            await asyncio.to_thread(self.upload_index.put, self.app_id, content_hash, file_token, size)
+
+        return file_token
+
+    async def _upload_content(self, content, file_name: str, content_hash: Optional[str] = None) -> str:
+        """
+        上传内存中的文件内容（如整页切分出的题目图片），去重和分片规则与_upload_file相同
+
+        Args:
+            content: 文件内容（bytes或内存映射）
+            file_name: 上传时使用的文件名
+            content_hash: 已知的内容哈希（ImageBuffer已计算过时避免重复计算）
+
+        Returns:
+            文件token
+        """
+        if self.upload_index is None:
+            content_hash = None
+        else:
+            content_hash = content_hash or await asyncio.to_thread(content_sha256, content)
+            file_token = await asyncio.to_thread(self.upload_index.get, self.app_id, content_hash)
+            if file_token:
+                return file_token
+
+        size = len(content)
+        if size > self.chunked_upload_threshold:
+            view = memoryview(content)
+
+            async def read_part(offset: int, length: int) -> bytes:
+                return bytes(view[offset:offset + length])
+
+            file_token = await self._upload_file_chunked(read_part, file_name, size, content_hash)
+        else:
+            body = bytes(content)
+            file_token = await self._upload_small_file(
+                lambda head, tail: _stream_parts(head, body, tail), file_name, size
+            )
+
+        if content_hash is not None:
+            await asyncio.to_thread(self.upload_index.put, self.app_id, content_hash, file_token, size)
+
+        return file_token
+
+    async def _upload_small_file(self, body_factory: Callable[[bytes, bytes], AsyncIterator[bytes]],
+                                 file_name: str, size: int) -> str:
+        """
+        一次请求上传文件，返回文件token
+
+        Args:
+            body_factory: 根据multipart头尾生成流式请求体的函数，每次重试都会重新生成
+            file_name: 文件名
+            size: 文件大小（字节）
+        """
+        url = f"{self.base_url}/im/v1/files"
+        boundary = uuid.uuid4().hex
+        form = {"file_type": "image", "file_name": file_name}
+
+        head, tail = _multipart_envelope(boundary, form, file_name)
+        headers = {
+            "Authorization": f"Bearer {await self._get_access_token()}",
+            "Content-Type": f"multipart/form-data; boundary={boundary}",
+            "Content-Length": str(len(head) + size + len(tail))
+        }
+
+        def content_factory() -> AsyncIterator[bytes]:
+            return body_factory(head, tail)
+
+        result = await self._request("POST", url, content_factory=content_factory, headers=headers)
+
+        if result.get("code") != 0:
+            raise Exception(f"上传文件失败: {result.get('msg')}")
+
+        return result["data"]["file_token"]
+
+    async def _upload_file_chunked(self, read_part: Callable[[int, int], Awaitable[bytes]], file_name: str,
+                                   size: int, content_hash: Optional[str] = None) -> str:
+        """
+        分片上传大文件，断点续传规则同FeishuClient._upload_file_chunked
+
+        Args:
+            read_part: 按(起始偏移, 长度)读取分片内容的函数
+            file_name: 文件名
+            size: 文件大小（字节）
+            content_hash: 文件内容哈希（用于断点续传，可选）
+
+        Returns:
+            文件token
+        """
+        index = self.upload_index if content_hash is not None else None
+        resumable = await asyncio.to_thread(resumable_session, index, self.app_id, content_hash, size)
+        file_token = None
+        if resumable is not None:
+            try:
+                file_token = await self._upload_session(read_part, *resumable)
+            except _UploadSessionError:
+                # 旧会话已失效，从头开始
+                await asyncio.to_thread(index.remove_session, self.app_id, content_hash)
+
+        if file_token is None:
+            session = await self._prepare_upload(file_name, size)
+            if index is not None:
+                await asyncio.to_thread(index.put_session, self.app_id, content_hash, session["upload_id"],
+                                        session["block_size"], session["block_num"], size)
+            file_token = await self._upload_session(read_part, session, set())
+
+        # 续传和重新上传完成后都删除会话
+        if index is not None:
+            await asyncio.to_thread(index.remove_session, self.app_id, content_hash)
+        return file_token
+
+    async def _prepare_upload(self, file_name: str, size: int) -> Dict[str, Any]:
+        """创建分片上传会话"""
+        url = f"{self.base_url}/drive/v1/medias/upload_prepare"
+        data = upload_prepare_body(file_name, self.app_token, size)
+        result = await self._request("POST", url, json=data, headers=await self._get_headers())
+
+        if result.get("code") != 0:
+            raise Exception(f"创建分片上传失败: {result.get('msg')}")
+
+        return parse_upload_session(result["data"], size)
+
+    async def _upload_session(self, read_part: Callable[[int, int], Awaitable[bytes]],
+                              session: Dict[str, Any], acked: Set[int]) -> str:
+        """
+        上传会话中尚未确认的分片（最多upload_part_workers个并发），全部完成后提交
+
+        Returns:
+            文件token
+        """
+        upload_id = session["upload_id"]
+        semaphore = asyncio.Semaphore(self.upload_part_workers)
+
+        async def send(seq: int, offset: int, length: int):
+            # 拿到并发许可后才读取分片，同一时间只有正在上传的分片在内存中
+            async with semaphore:
+                await self._upload_part(upload_id, seq, await read_part(offset, length))
+            # 每确认一个分片立即落盘，进程中断也不会丢失进度
+            if self.upload_index is not None:
+                await asyncio.to_thread(self.upload_index.mark_part, upload_id, seq)
+
+        results = await asyncio.gather(*(send(*part) for part in missing_parts(session, acked)),
+                                       return_exceptions=True)
+        # 等所有分片结束后再抛出第一个错误，已成功的分片都已记录
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        return await self._finish_upload(upload_id, session["block_num"])
+
+    async def _upload_part(self, upload_id: str, seq: int, chunk: bytes):
+        """上传一个分片"""
+        url = f"{self.base_url}/drive/v1/medias/upload_part"
+        headers = {
+            "Authorization": f"Bearer {await self._get_access_token()}"
+        }
+        data = upload_part_form(upload_id, seq, chunk, zlib.adler32(chunk))
+        files = {"file": (f"part{seq}", chunk)}
+        result = await self._request("POST", url, headers=headers, data=data, files=files)
+
+        if result.get("code") != 0:
+            raise _UploadSessionError(f"上传分片失败: {result.get('msg')}")
+
+    async def _finish_upload(self, upload_id: str, block_num: int) -> str:
+        """提交分片上传，返回文件token"""
+        url = f"{self.base_url}/drive/v1/medias/upload_finish"
+        data = {"upload_id": upload_id, "block_num": block_num}
+        result = await self._request("POST", url, json=data, headers=await self._get_headers())
+
+        if result.get("code") != 0:
+            raise _UploadSessionError(f"完成分片上传失败: {result.get('msg')}")
+
+        return result["data"]["file_token"]
+
+    async def _upload_attachments(self, record: ErrorRecord,
+                                  submitted: Optional[Dict[str, asyncio.Future]] = None) -> Dict[str, Any]:
+        """
+        并发上传错题原题和去手写两张附件，返回附件字段
+
+        相同内容只上传一次，规则同FeishuClient._submit_attachment_uploads
+
+        Args:
+            record: 错题记录对象
+            submitted: 已开始的上传任务（去重键到任务的映射），批量创建时在多条记录间共用
+        """
+        # 计算内容哈希、检查文件是否存在放到线程中
+        uploads = await asyncio.to_thread(plan_attachment_uploads, record)
+        if submitted is None:
+            submitted = {}
+
+        for upload in uploads:
+            if upload.key not in submitted:
+                if upload.file_path is not None:
+                    coroutine = self._upload_file(upload.file_path)
+                else:
+                    coroutine = self._upload_content(upload.content, upload.file_name, upload.content_hash)
+                submitted[upload.key] = asyncio.ensure_future(coroutine)
+
+        file_tokens = await asyncio.gather(*(submitted[upload.key] for upload in uploads))
+        return attachment_fields(uploads, file_tokens)
+
+    async def create_error_record(self, record: ErrorRecord) -> str:
+        """
+        创建错题记录
+
+        Args:
+            record: 错题记录对象
+
+        Returns:
+            创建的记录ID
+        """
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/records"
+
+        # 先在本地校验字段，不合法时不上传附件也不发请求
+        fields = encode_error_fields(record, await self._table_schema(self.table_id))
+        await self._validate_fields(self.table_id, fields)
+
+        # 附件上传与获取token并发进行
+        attachments, headers = await asyncio.gather(
+            self._upload_attachments(record),
+            self._get_headers()
+        )
+        fields.update(attachments)
+
+        data = {"fields": fields}
+        params = {"client_token": str(uuid.uuid4())}
+
+        result = await self._request("POST", url, json=data, headers=headers, params=params)
+
+        if result.get("code") != 0:
+            raise Exception(f"创建记录失败: {result.get('msg')}")
+
+        return result["data"]["record"]["record_id"]
+
+    async def create_error_records(self, records: List[ErrorRecord]) -> Dict[str, Any]:
+        """
+        批量创建错题记录，规则同FeishuClient.create_error_records
+
+        Args:
+            records: 错题记录对象列表
+
+        Returns:
+            批量结果，格式同FeishuClient.create_feedback_questions
+        """
+        failed = []
+        pending = []
+        schema = await self._table_schema(self.table_id)
+        for index, record in enumerate(records):
+            fields = encode_error_fields(record, schema)
+            errors = await self._check_fields(self.table_id, fields)
+            if errors:
+                failed.append({"index": index, "error": f"字段校验失败: {'; '.join(errors)}"})
+                continue
+            pending.append((index, fields))
+
+        submitted = {}  # 各记录共用，相同图片只上传一次
+        uploads = await asyncio.gather(
+            *(self._upload_attachments(records[index], submitted) for index, _ in pending),
+            return_exceptions=True
+        )
+
+        fields_list = []
+        indices = []
+        for (index, fields), attachments in zip(pending, uploads):
+            if isinstance(attachments, BaseException):
+                failed.append({"index": index, "error": f"上传附件失败: {attachments}"})
+                continue
+            fields.update(attachments)
+            fields_list.append(fields)
+            indices.append(index)
+
+        result = await self._batch_create_records(self.table_id, fields_list)
+
+        # 把批量结果的下标映射回输入列表
+        record_ids: List[Optional[str]] = [None] * len(records)
+        apply_batch_result(record_ids, failed, result, indices)
+
+        return {
+            "success": not failed,
+            "record_ids": record_ids,
+            "failed": failed
+        }
+
+    async def update_error_record(self, record_id: str, changes: Union[ErrorRecord, Dict[str, Any]]) -> bool:
+        """
+        更新错题记录（只发送有变化的字段），规则同FeishuClient.update_error_record
+
+        Args:
+            record_id: 记录ID
+            changes: 部分填写的错题记录对象，或以飞书字段名为键的字段字典
+
+        Returns:
+            是否发送了更新请求（没有变化时返回False）
+        """
+        fields = diff_with_snapshot(self.record_cache, record_id, await self._encode_update(changes))
+        if not fields:
+            return False
+
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/records/{record_id}"
+        headers = await self._get_headers()
+        data = {"fields": fields}
+
+        result = await self._request("PUT", url, json=data, headers=headers)
+
+        if result.get("code") != 0:
+            raise Exception(f"更新记录失败: {result.get('msg')}")
+
+        apply_to_snapshot(self.record_cache, record_id, fields)
+        return True
+
+    async def update_error_records(self, updates: List[Tuple[str, Union[ErrorRecord, Dict[str, Any]]]]) -> Dict[str, Any]:
+        """
+        批量更新错题记录，规则和返回格式同FeishuClient.update_error_records
+
+        Args:
+            updates: (record_id, 部分错题记录对象或字段字典) 列表
+
+        Returns:
+            批量结果
+        """
+        record_ids: List[Optional[str]] = [None] * len(updates)
+        failed: List[Dict[str, Any]] = []
+        encoded: List[Tuple[int, str, Dict[str, Any]]] = []
+
+        results = await asyncio.gather(*(self._encode_update(changes) for _, changes in updates),
+                                       return_exceptions=True)
+        for index, ((record_id, _), fields) in enumerate(zip(updates, results)):
+            if isinstance(fields, BaseException):
+                failed.append({"index": index, "error": str(fields)})
+            else:
+                encoded.append((index, record_id, fields))
+
+        skipped, pending, pending_indices = plan_updates(self.record_cache, encoded, record_ids)
+        if pending:
+            result = await self._batch_update_records(self.table_id, pending)
+            apply_batch_result(record_ids, failed, result, pending_indices)
+
+        return {
+            "success": not failed,
+            "record_ids": record_ids,
+            "skipped": skipped,
+            "failed": failed
+        }
+
+    async def _encode_update(self, changes: Union[ErrorRecord, Dict[str, Any]]) -> Dict[str, Any]:
+        """把部分错题记录对象或字段字典转换为待写入的字段（附件会先上传）"""
+        if isinstance(changes, dict):
+            fields = dict(changes)
+            await self._validate_fields(self.table_id, fields)
+            return fields
+
+        fields = encode_error_fields(changes, await self._table_schema(self.table_id))
+        await self._validate_fields(self.table_id, fields)
+        fields.update(await self._upload_attachments(changes))
+        return fields
+
+    async def _batch_update_records(self, table_id: str, updates: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """通过batch_update接口批量更新记录，各批次并发发送（结果格式同FeishuClient._batch_update_records）"""
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{table_id}/records/batch_update"
+        record_ids: List[Optional[str]] = [None] * len(updates)
+        failed: List[Dict[str, Any]] = []
+
+        async def send_chunk(start: int):
+            chunk = updates[start:start + BATCH_RECORD_LIMIT]
+            data = {"records": [{"record_id": record_id, "fields": fields} for record_id, fields in chunk]}
+
+            try:
+                headers = await self._get_headers()
+                result = await self._request("POST", url, json=data, headers=headers)
+                if result.get("code") != 0:
+                    raise Exception(f"批量更新记录失败: {result.get('msg')}")
+
+                for offset, (record_id, fields) in enumerate(chunk):
+                    record_ids[start + offset] = record_id
+                    apply_to_snapshot(self.record_cache, record_id, fields)
+            except Exception as e:
+                failed.extend({"index": start + offset, "error": str(e)} for offset in range(len(chunk)))
+
+        await asyncio.gather(*(send_chunk(start) for start in range(0, len(updates), BATCH_RECORD_LIMIT)))
+        failed.sort(key=lambda item: item["index"])
+
+        return {
+            "success": not failed,
+            "record_ids": record_ids,
+            "failed": failed
+        }
+
+    async def create_feedback_question(self, question: FeedbackQuestion) -> str:
+        """
+        创建反馈题记录
+
+        Args:
+            question: 反馈题对象
+
+        Returns:
+            创建的记录ID
+        """
+        if not self.feedback_table_id:
+            raise ValueError("反馈题表格ID未配置，请在config.py中设置FEISHU_FEEDBACK_TABLE_ID")
+
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{self.feedback_table_id}/records"
+
+        fields = encode_feedback_fields(question, await self._table_schema(self.feedback_table_id))
+        await self._validate_fields(self.feedback_table_id, fields)
+
+        headers = await self._get_headers()
+        data = {"fields": fields}
+        params = {"client_token": str(uuid.uuid4())}
+
+        result = await self._request("POST", url, json=data, headers=headers, params=params)
+
+        if result.get("code") != 0:
+            raise Exception(f"创建反馈题记录失败: {result.get('msg')}")
+
+        return result["data"]["record"]["record_id"]
+
+    async def create_feedback_questions(self, questions: List[FeedbackQuestion]) -> Dict[str, Any]:
+        """
+        批量创建反馈题记录
+
+        Args:
+            questions: 反馈题对象列表
+
+        Returns:
+            批量结果，格式同FeishuClient.create_feedback_questions
+        """
+        if not self.feedback_table_id:
+            raise ValueError("反馈题表格ID未配置，请在config.py中设置FEISHU_FEEDBACK_TABLE_ID")
+
+        schema = await self._table_schema(self.feedback_table_id)
+        fields_list = [encode_feedback_fields(q, schema) for q in questions]
+        return await self._batch_create_records(self.feedback_table_id, fields_list)
+
+    async def _batch_create_records(self, table_id: str, fields_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """通过batch_create接口批量创建记录，各批次并发发送（规则同FeishuClient._batch_create_records）"""
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{table_id}/records/batch_create"
+        record_ids: List[Optional[str]] = [None] * len(fields_list)
+        failed: List[Dict[str, Any]] = []
+
+        # 本地校验不通过的行直接记为失败，不随批次发送
+        indices = []
+        for index, fields in enumerate(fields_list):
+            errors = await self._check_fields(table_id, fields)
+            if errors:
+                failed.append({"index": index, "error": f"字段校验失败: {'; '.join(errors)}"})
+            else:
+                indices.append(index)
+
+        async def send_chunk(chunk_indices: List[int]):
+            chunk = [fields_list[index] for index in chunk_indices]
+            data = {"records": [{"fields": fields} for fields in chunk]}
+            params = {"client_token": str(uuid.uuid4())}
+
+            try:
+                headers = await self._get_headers()
+                result = await self._request("POST", url, json=data, headers=headers, params=params)
+                if result.get("code") != 0:
+                    raise Exception(f"批量创建记录失败: {result.get('msg')}")
+
+                records = result.get("data", {}).get("records", [])
+                if len(records) != len(chunk):
+                    raise Exception(f"批量创建记录返回数量不符: 期望{len(chunk)}条，实际{len(records)}条")
+
+                for index, item in zip(chunk_indices, records):
+                    record_ids[index] = item["record_id"]
+            except Exception as e:
+                failed.extend({"index": index, "error": str(e)} for index in chunk_indices)
+
+        await asyncio.gather(*(send_chunk(indices[start:start + BATCH_RECORD_LIMIT])
+                               for start in range(0, len(indices), BATCH_RECORD_LIMIT)))
+        failed.sort(key=lambda item: item["index"])
+
+        return {
+            "success": not failed,
+            "record_ids": record_ids,
+            "failed": failed
+        }
+
+    async def get_error_record(self, record_id: str, use_cache: bool = True) -> Optional[ErrorRecord]:
+        """
+        按记录ID获取单条错题记录
+
+        Args:
+            record_id: 记录ID
+            use_cache: 是否优先使用本地缓存
+
+        Returns:
+            错题记录对象，记录不存在时返回None
+        """
+        record = self.record_cache.get(record_id) if use_cache else None
+        if record is None:
+            record = await self._fetch_error_record(record_id)
+            if record is None:
+                return None
+        codec = await self._record_codec(self.table_id, ERROR_RECORD_CODEC)
+        return codec.decode(record)
+
+    async def _fetch_error_record(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """从飞书获取记录原始数据并写入缓存，记录不存在时返回None"""
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/records/{record_id}"
+        headers = await self._get_headers()
+        result = await self._request("GET", url, headers=headers)
+
+        if result.get("code") == RECORD_NOT_FOUND_CODE:
+            return None
+        if result.get("code") != 0:
+            raise Exception(f"获取记录失败: {result.get('msg')}")
+
+        record = result["data"]["record"]
+        self.record_cache.put(record_id, record)
+        return record
+
+    def iter_error_records(self, page_size: int = 100, prefetch: bool = False) -> AsyncIterator[ErrorRecord]:
+        """
+        逐条遍历错题本表的全部记录
+
+        Args:
+            page_size: 每页数量（最大500）
+            prefetch: 是否在处理当前页时预取下一页
+
+        Returns:
+            错题记录对象的异步迭代器
+        """
+        return self._iter_records(self.table_id, ERROR_RECORD_CODEC, page_size, prefetch)
+
+    def iter_feedback_questions(self, page_size: int = 100, prefetch: bool = False) -> AsyncIterator[FeedbackQuestion]:
+        """
+        逐条遍历反馈题表的全部记录
+
+        Args:
+            page_size: 每页数量（最大500）
+            prefetch: 是否在处理当前页时预取下一页
+
+        Returns:
+            反馈题对象的异步迭代器
+        """
+        if not self.feedback_table_id:
+            raise ValueError("反馈题表格ID未配置，请在config.py中设置FEISHU_FEEDBACK_TABLE_ID")
+        return self._iter_records(self.feedback_table_id, FEEDBACK_QUESTION_CODEC, page_size, prefetch)
+
+    async def search_error_records(self, subject: Optional[str] = None,
+                                   mastery_level: Optional[str] = None,
+                                   is_master_question: Optional[str] = None,
+                                   created_after: Optional[datetime] = None,
+                                   created_before: Optional[datetime] = None,
+                                   reviewed_after: Optional[datetime] = None,
+                                   reviewed_before: Optional[datetime] = None,
+                                   sort: Optional[List[Tuple[str, bool]]] = None,
+                                   field_names: Optional[List[str]] = None,
+                                   include_attachments: bool = False,
+                                   page_size: int = 100,
+                                   prefetch: bool = False) -> AsyncIterator[ErrorRecord]:
+        """
+        按条件查询错题记录（服务端筛选），参数同FeishuClient.search_error_records
+
+        Returns:
+            错题记录对象的异步迭代器（未返回的字段为None）
+        """
+        body = build_error_record_search(
+            subject=subject, mastery_level=mastery_level,
+            is_master_question=is_master_question,
+            created_after=created_after, created_before=created_before,
+            reviewed_after=reviewed_after, reviewed_before=reviewed_before,
+            sort=sort, field_names=field_names, include_attachments=include_attachments,
+        )
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/records/search"
+
+        async def fetch_page(page_token: Optional[str]) -> Dict[str, Any]:
+            params = {"page_size": page_size}
+            if page_token:
+                params["page_token"] = page_token
+
+            headers = await self._get_headers()
+            result = await self._request("POST", url, params=params, json=body, headers=headers)
+
+            if result.get("code") != 0:
+                raise Exception(f"查询记录失败: {result.get('msg')}")
+            return result.get("data") or {}
+
+        codec = await self._record_codec(self.table_id, ERROR_RECORD_CODEC)
+        async for item in _iter_pages(fetch_page, prefetch):
+            yield codec.decode(item)
+
+    async def _iter_records(self, table_id: str, codec: RecordCodec, page_size: int,
+                            prefetch: bool) -> AsyncIterator[BaseModel]:
+        """遍历指定数据表的记录，并逐条解码为模型"""
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{table_id}/records"
+
+        async def fetch_page(page_token: Optional[str]) -> Dict[str, Any]:
+            params = {"page_size": page_size}
+            if page_token:
+                params["page_token"] = page_token
+
+            headers = await self._get_headers()
+            result = await self._request("GET", url, params=params, headers=headers)
+
+            if result.get("code") != 0:
+                raise Exception(f"获取记录失败: {result.get('msg')}")
+            return result.get("data") or {}
+
+        codec = await self._record_codec(table_id, codec)
+        async for item in _iter_pages(fetch_page, prefetch):
+            yield codec.decode(item)
+
+
+async def _iter_pages(fetch_page: Callable[[Optional[str]], Awaitable[Dict[str, Any]]],
+                      prefetch: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """按page_token翻页并逐条产出记录（prefetch时下一页请求与当前页处理并发）"""
+    def next_token(data: Dict[str, Any]) -> Optional[str]:
+        if data.get("has_more") and data.get("page_token"):
+            return data["page_token"]
+        return None
+
+    data = await fetch_page(None)
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            page_token = next_token(data)
+            if page_token and prefetch:
+                pending = asyncio.ensure_future(fetch_page(page_token))
+
+            for item in data.get("items") or []:
+                yield item
+
+            if not page_token:
+                return
+            if pending is not None:
+                data = await pending
+                pending = None
+            else:
+                data = await fetch_page(page_token)
+    finally:
+        # 调用方提前结束遍历时取消尚未完成的预取
+        if pending is not None:
+            pending.cancel()
+
+
+def _multipart_envelope(boundary: str, form: Dict[str, str], file_name: str):
+    """
+    生成multipart/form-data请求体中文件内容之前和之后的部分
+
+    Returns:
+        (文件之前的字节, 文件之后的字节)
+    """
+    head = b""
+    for name, value in form.items():
+        head += (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n"
+        ).encode("utf-8")
+    head += (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{file_name}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode("utf-8")
+    tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return head, tail
+
+
+async def _stream_file(file_path: str, head: bytes, tail: bytes) -> AsyncIterator[bytes]:
+    """按块读取文件并产出multipart请求体"""
+    yield head
+    f = await asyncio.to_thread(open, file_path, "rb")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(f.read, UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+    yield tail
+
+
+def _read_range(file_path: str, offset: int, length: int) -> bytes:
+    """读取文件中的一段（分片上传时在线程中调用）"""
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+async def _stream_parts(*parts: bytes) -> AsyncIterator[bytes]:
+    """依次产出已在内存中的请求体片段"""
+    for part in parts:
+        yield part
@@ -0,0 +1,241 @@
+"""
+飞书访问令牌管理
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+import contextlib
+from typing import Optional, Callable, Tuple, Dict, Any, Iterator
+
+# 文件锁只在类Unix系统上可用（Windows本地开发时退化为仅原子替换）
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+
+class TenantTokenProvider:
+    """
+    tenant_access_token提供者
+
+    - 进程内加锁，同一时间只有一个线程在刷新（single flight）
+    - 可选的共享文件缓存，多个工作进程和Vercel热实例复用同一个有效token
+    - token临近过期时在后台线程提前刷新，请求线程直接使用当前token
+    """
+
+    def __init__(self, fetch_token: Optional[Callable[[], Tuple[str, float]]], cache_key: str,
+                 shared_cache_path: Optional[str] = None,
+                 refresh_margin: float = 300, refresh_ahead: float = 900):
+        """
+        初始化令牌提供者
+
+        Args:
+            fetch_token: 向飞书申请token的函数，返回(token, 有效期秒数)。
+                         异步客户端自行请求token时可传None，并通过set_token写入
+            cache_key: 共享缓存中的键（通常为app_id）
+            shared_cache_path: 共享缓存文件路径（可选，Vercel上应位于/tmp下）
+            refresh_margin: 距真实过期多少秒时视为已过期
+            refresh_ahead: 距视为过期多少秒时开始后台刷新。飞书只在token剩余有效期
+                           不足30分钟时才会签发新token，因此两者之和不宜超过1800秒
+        """
+        self.fetch_token = fetch_token
+        self.cache_key = cache_key
+        self.shared_cache_path = shared_cache_path
+        self.refresh_margin = refresh_margin
+        self.refresh_ahead = refresh_ahead
+
+        self.token: Optional[str] = None
+        self.expires_at: float = 0
+
+        self._refresh_lock = threading.Lock()
+        self._background_refreshing = False
+        self._state_lock = threading.Lock()
+
+    def get_token(self) -> str:
+        """
+        获取有效的token
+
+        Returns:
+            tenant_access_token
+        """
+        with self._state_lock:
+            stale_token = self.token
+
+        token = self.peek()
+        if token:
+            if self.should_refresh_ahead():
+                self._start_background_refresh()
+            return token
+
+        return self._refresh(expected=stale_token)
+
+    def peek(self) -> Optional[str]:
+        """
+        返回当前仍然有效的token（本进程或共享缓存中的），不发起网络请求
+
+        Returns:
+            有效token，没有时返回None
+        """
+        token = self.cached_token()
+        if token:
+            return token
+
+        # 本进程没有有效token时，先看其他进程是否已经刷新过
+        if self._load_shared():
+            return self.token
+        return None
+
+    def cached_token(self) -> Optional[str]:
+        """
+        返回本进程内仍然有效的token（不读共享缓存，不做文件I/O，可在事件循环中直接调用）
+
+        Returns:
+            有效token，没有时返回None
+        """
+        with self._state_lock:
+            token, expires_at = self.token, self.expires_at
+        return token if token and time.time() < expires_at else None
+
+    def should_refresh_ahead(self) -> bool:
+        """当前token是否已进入提前刷新窗口"""
+        with self._state_lock:
+            return bool(self.token) and time.time() >= self.expires_at - self.refresh_ahead
+
+    def set_token(self, token: str, expire: float):
+        """
+        写入新申请到的token（异步客户端自行请求token后调用）
+
+        Args:
+            token: tenant_access_token
+            expire: 有效期秒数
+        """
+        with self._state_lock:
+            self.token = token
+            self.expires_at = time.time() + expire - self.refresh_margin
+        self._save_shared()
+
+    def invalidate(self):
+        """丢弃当前token（例如接口返回token无效时）"""
+        with self._state_lock:
+            self.token = None
+            self.expires_at = 0
+
+    def _refresh(self, expected: Optional[str] = None, force: bool = False) -> str:
+        """
+        刷新token（单飞）
+
+        Args:
+            expected: 调用方看到的旧token。拿到锁后如果token已被其他线程换掉，直接复用
+            force: 是否忽略当前token强制刷新
+        """
+        with self._refresh_lock:
+            if not force and self.token and self.token != expected and time.time() < self.expires_at:
+                return self.token
+
+            token, expire = self.fetch_token()
+            self.set_token(token, expire)
+            return token
+
+    def _start_background_refresh(self):
+        """启动后台刷新线程（同一时间最多一个）"""
+        with self._state_lock:
+            if self._background_refreshing:
+                return
+            self._background_refreshing = True
+
+        def run():
+            try:
+                self._refresh(force=True)
+            except Exception:
+                # 后台刷新失败不影响当前token，过期后由请求线程同步刷新
+                pass
+            finally:
+                with self._state_lock:
+                    self._background_refreshing = False
+
+        threading.Thread(target=run, name="feishu-token-refresh", daemon=True).start()
+
+    def _read_shared(self) -> Dict[str, Any]:
+        """读取共享缓存文件"""
+        try:
+            with open(self.shared_cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _load_shared(self) -> bool:
+        """
+        从共享缓存加载token
+
+        Returns:
+            是否加载到有效token
+        """
+        if not self.shared_cache_path:
+            return False
+
+        entry = self._read_shared().get(self.cache_key)
+        if not isinstance(entry, dict):
+            return False
+
+        token, expires_at = entry.get("token"), entry.get("expires_at", 0)
+        if not token or time.time() >= expires_at:
+            return False
+
+        with self._state_lock:
+            self.token = token
+            self.expires_at = expires_at
+        return True
+
+    @contextlib.contextmanager
+    def _shared_lock(self) -> Iterator[None]:
+        """
+        跨进程锁住共享缓存（锁文件与缓存文件放在同一目录）
+
+        缓存文件会被原子替换，不能直接锁缓存文件本身，否则替换后其他进程锁的是旧文件
+        """
+        if not HAS_FCNTL:
+            yield
+            return
+
+        with open(f"{self.shared_cache_path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _save_shared(self):
+        """
+        写入共享缓存
+
+        读取、合并、写回在文件锁内完成，多个进程同时刷新不同应用的token时不会互相覆盖；
+        写入时先写临时文件再原子替换，避免其他进程读到半个文件
+        """
+        if not self.shared_cache_path:
+            return
+
+        try:
+            directory = os.path.dirname(os.path.abspath(self.shared_cache_path))
+            os.makedirs(directory, exist_ok=True)
+
+            with self._shared_lock():
+                data = self._read_shared()
+                data[self.cache_key] = {"token": self.token, "expires_at": self.expires_at}
+
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".feishu_token_")
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump(data, f)
+                    os.chmod(tmp_path, 0o600)
+                    os.replace(tmp_path, self.shared_cache_path)
+                except Exception:
+                    os.unlink(tmp_path)
+                    raise
+        except OSError:
+            # 共享缓存只是优化，写入失败时仍可使用进程内token
+            pass
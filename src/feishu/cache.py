@@ -0,0 +1,82 @@
+"""
+飞书记录本地缓存
+"""
+
+import copy
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+
+class RecordCache:
+    """按record_id缓存记录的LRU缓存，条目超过有效期后自动失效（线程安全）"""
+
+    def __init__(self, max_size: int = 256, ttl: float = 300.0):
+        """
+        初始化缓存
+
+        Args:
+            max_size: 最多缓存的记录数，为0时不缓存
+            ttl: 记录有效期（秒）
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取缓存的记录
+
+        Args:
+            record_id: 记录ID
+
+        Returns:
+            记录副本，未命中或已过期时返回None
+        """
+        with self._lock:
+            entry = self._items.get(record_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._items[record_id]
+                self.misses += 1
+                return None
+
+            self._items.move_to_end(record_id)
+            self.hits += 1
+            # 返回副本，避免调用方修改影响缓存内容
+            return copy.deepcopy(entry[1])
+
+    def put(self, record_id: str, record: Dict[str, Any]):
+        """
+        写入记录
+
+        Args:
+            record_id: 记录ID
+            record: 记录字典
+        """
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._items[record_id] = (time.monotonic() + self.ttl, copy.deepcopy(record))
+            self._items.move_to_end(record_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, record_id: str):
+        """移除指定记录"""
+        with self._lock:
+            self._items.pop(record_id, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
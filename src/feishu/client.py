@@ -3,19 +3,70 @@
 """
 
 import os
+import mmap
 import time
+import zlib
+import uuid
+import random
+import itertools
 import requests
-from typing import Optional, List, Dict, Any
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Optional, List, Dict, Any, Iterator, Callable, Tuple, Union, Set
 from datetime import datetime
+from pydantic import BaseModel
 
 from .models import ErrorRecord, FeedbackQuestion
+from .fields import encode_error_fields, encode_feedback_fields
+from .codec import RecordCodec, ERROR_RECORD_CODEC, FEEDBACK_QUESTION_CODEC
+from .cache import RecordCache
+from .query import build_error_record_search
+from .schema import SchemaCache, TableSchema, FieldValidationError
+from .upload_index import UploadIndex
+from .auth import TenantTokenProvider
+from .ratelimit import (
+    EndpointRateLimiter, FeishuRateLimitError, RATE_LIMIT_CODES, endpoint_family, retry_after_seconds
+)
+from .planning import (
+    plan_attachment_uploads, upload_prepare_body, parse_upload_session, upload_part_form,
+    resumable_session, missing_parts, apply_batch_result, plan_updates, diff_with_snapshot, apply_to_snapshot,
+    _UploadSessionError
+)
+from ..utils.helpers import file_sha256, content_sha256
+
+
+# 需要重试的HTTP状态码（服务端错误；429限流由限流器单独处理）
+RETRY_STATUS_CODES = {500, 502, 503, 504}
+
+# 多维表格批量接口单次最多处理的记录数
+BATCH_RECORD_LIMIT = 500
+
+# 多维表格列表接口单页最大记录数
+MAX_PAGE_SIZE = 500
+
+# 记录不存在的错误码
+RECORD_NOT_FOUND_CODE = 1254043
+
+# 超过该大小（字节）的附件走分片上传（飞书一次性上传接口的上限为20MB）
+CHUNKED_UPLOAD_THRESHOLD = 20 * 1024 * 1024
 
 
 class FeishuClient:
     """飞书多维表格API客户端"""
     
     def __init__(self, app_id: str, app_secret: str, app_token: str, 
-                 table_id: Optional[str] = None, feedback_table_id: Optional[str] = None):
+                 table_id: Optional[str] = None, feedback_table_id: Optional[str] = None,
+                 pool_size: int = 10, connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 max_retries: int = 3, backoff_factor: float = 0.5, backoff_max: float = 8.0,
+                 record_cache_size: int = 256, record_cache_ttl: float = 300.0,
+                 upload_index_path: Optional[str] = None,
+                 executor: Optional[Executor] = None, upload_workers: int = 4,
+                 token_cache_path: Optional[str] = None,
+                 rate_limits: Optional[Dict[str, float]] = None,
+                 rate_limiter: Optional[EndpointRateLimiter] = None,
+                 schema_ttl: float = 3600.0, validate_schema: bool = True,
+                 chunked_upload_threshold: int = CHUNKED_UPLOAD_THRESHOLD, upload_part_workers: int = 4):
         """
         初始化飞书客户端
         
@@ -25,6 +76,25 @@ class FeishuClient:
             app_token: 多维表格的app_token/base_id（两个表共享，从URL中获取，base/后面的部分）
             table_id: 错题本表的table_id/table_token（从URL中获取，table=后面的部分）
             feedback_table_id: 反馈题表的table_id/table_token（可选，如果配置了反馈题表）
+            pool_size: 连接池大小（保持长连接，避免每次请求重新握手）
+            connect_timeout: 建立连接超时（秒）
+            read_timeout: 读取响应超时（秒）
+            max_retries: 遇到5xx、超时或限流时的最大重试次数
+            backoff_factor: 指数退避的基础等待时间（秒）
+            backoff_max: 单次退避的最长等待时间（秒）
+            record_cache_size: 本地记录缓存的最大条数，为0时不缓存
+            record_cache_ttl: 本地记录缓存的有效期（秒）
+            upload_index_path: 上传去重索引的SQLite路径（可选，不配置时每次都重新上传）
+            executor: 共享的上传线程池（可选，多个客户端或批量提交时复用；
+                      不要在该线程池的任务内部调用本客户端的写接口，以免互相等待）
+            upload_workers: 未传入executor时，自建线程池的最大线程数
+            token_cache_path: 访问令牌共享缓存文件路径（可选，多进程/Vercel热实例复用token）
+            rate_limits: 各接口类别的速率上限（次/秒），类别为auth/files/records/batch/default
+            rate_limiter: 共享的限流器（可选，同一应用的多个客户端应共用一个，优先于rate_limits）
+            schema_ttl: 表结构缓存的有效期（秒）
+            validate_schema: 是否使用表结构：写入前在本地校验字段，并按实际字段类型编解码
+            chunked_upload_threshold: 超过该大小（字节）的附件使用分片上传
+            upload_part_workers: 分片上传时并发上传的分片数
         """
         self.app_id = app_id
         self.app_secret = app_secret
@@ -32,16 +102,180 @@ class FeishuClient:
         self.table_id = table_id or "tblXXXXXXXX"  # 错题本表的table_id
         self.feedback_table_id = feedback_table_id  # 反馈题表的table_id
         self.base_url = "https://open.feishu.cn/open-apis"
-        self.access_token: Optional[str] = None
-        self.token_expires_at: float = 0
         
+        # 连接与重试配置
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.session = self._create_session(pool_size)
+        self.rate_limiter = rate_limiter or EndpointRateLimiter(rate_limits)
+        
+        # 访问令牌：单飞刷新、可跨进程共享、临近过期时后台提前刷新
+        self.token_provider = TenantTokenProvider(
+            fetch_token=self._fetch_access_token,
+            cache_key=app_id,
+            shared_cache_path=token_cache_path
+        )
+        
+        # 按record_id缓存错题记录，本客户端的写操作会使对应条目失效
+        self.record_cache = RecordCache(max_size=record_cache_size, ttl=record_cache_ttl)
+        
+        # 表结构缓存，写入前在本地校验字段名和字段类型
+        self.schema_cache = SchemaCache(ttl=schema_ttl)
+        self.validate_schema = validate_schema
+        
+        # 内容哈希 → file_token 索引，相同图片只上传一次
+        self.upload_index = UploadIndex(upload_index_path) if upload_index_path else None
+        
+        # 附件上传线程池
+        self.chunked_upload_threshold = chunked_upload_threshold
+        self.upload_part_workers = upload_part_workers
+        self.upload_workers = upload_workers
+        self._executor = executor
+        self._owns_executor = False
+        self._executor_lock = threading.Lock()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self._owns_executor = False
+        if self.upload_index is not None:
+            self.upload_index.close()
+    
+    @staticmethod
+    def _create_session(pool_size: int) -> requests.Session:
+        """创建带连接池的会话，所有请求复用同一组长连接"""
+        session = requests.Session()
+        # 重试由_request统一处理，这里关闭urllib3自带的重试
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    
+    def rate_limit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各接口类别的限流统计（当前速率、排队数、等待时间等）"""
+        return self.rate_limiter.stats()
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        """计算第attempt次重试前的等待时间（带随机抖动的指数退避）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * (2 ** attempt)))
+    
+    def _request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+        """
+        发送请求并返回JSON结果
+        
+        每次发送前先从对应接口类别的令牌桶获取许可。遇到连接错误、超时、5xx时
+        按指数退避重试；遇到限流时令牌桶自适应降速后重试，重试耗尽抛出
+        FeishuRateLimitError；其他错误直接抛出。写请求需要携带client_token以保证重试幂等。
+        
+        Args:
+            method: HTTP方法
+            url: 请求地址
+            **kwargs: 透传给requests的参数
+            
+        Returns:
+            响应JSON
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        family = endpoint_family(url)
+        
+        # max_retries为负数时也至少发送一次
+        for attempt in range(max(self.max_retries, 0) + 1):
+            is_last = attempt >= self.max_retries
+            self.rate_limiter.acquire(family)
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.Timeout, requests.ConnectionError):
+                if is_last:
+                    raise
+                time.sleep(self._backoff_delay(attempt))
+                continue
+            
+            if response.status_code in RETRY_STATUS_CODES and not is_last:
+                time.sleep(self._backoff_delay(attempt))
+                continue
+            
+            result = self._parse_response(response) if response.status_code != 429 else self._json_or_empty(response)
+            
+            if response.status_code == 429 or result.get("code") in RATE_LIMIT_CODES:
+                retry_after = retry_after_seconds(response.headers)
+                self.rate_limiter.on_rate_limited(family, retry_after)
+                if is_last:
+                    raise FeishuRateLimitError(
+                        f"飞书接口限流: {result.get('msg') or response.status_code}",
+                        code=result.get("code"),
+                        retry_after=retry_after
+                    )
+                # 有重置时间时令牌桶已暂停发放，下一轮获取许可时自然等待
+                if retry_after is None:
+                    time.sleep(self._backoff_delay(attempt))
+                continue
+            
+            self.rate_limiter.on_success(family)
+            return result
+        
+        # 正常情况下最后一次尝试一定会返回或抛出异常，这里避免静默返回None
+        raise Exception(f"请求失败: 重试次数已用尽 ({method} {url})")
+        
+    @staticmethod
+    def _json_or_empty(response: requests.Response) -> Dict[str, Any]:
+        """解析响应JSON，无法解析时返回空字典"""
+        try:
+            result = response.json()
+        except ValueError:
+            return {}
+        return result if isinstance(result, dict) else {}
+    
+    @staticmethod
+    def _parse_response(response: requests.Response) -> Dict[str, Any]:
+        """
+        解析响应JSON
+        
+        飞书的业务错误（如记录不存在）可能以4xx状态码返回并附带code/msg，
+        这类响应交给调用方按code处理，其余非2xx响应直接抛出HTTPError。
+        """
+        if response.status_code >= 400:
+            try:
+                result = response.json()
+            except ValueError:
+                result = None
+            if isinstance(result, dict) and "code" in result:
+                return result
+            response.raise_for_status()
+        
+        return response.json()
+    
+    @property
+    def access_token(self) -> Optional[str]:
+        """当前缓存的访问令牌"""
+        return self.token_provider.token
+    
+    @property
+    def token_expires_at(self) -> float:
+        """当前令牌的过期时间（已预留提前刷新的余量）"""
+        return self.token_provider.expires_at
+    
     def _get_access_token(self) -> str:
         """获取访问令牌"""
-        # 如果token未过期，直接返回
-        if self.access_token and time.time() < self.token_expires_at:
-            return self.access_token
+        return self.token_provider.get_token()
+    
+    def _fetch_access_token(self) -> Tuple[str, float]:
+        """
+        向飞书申请新的tenant_access_token
         
-        # 获取新token
+        Returns:
+            (token, 有效期秒数)
+        """
         url = f"{self.base_url}/auth/v3/tenant_access_token/internal"
         headers = {"Content-Type": "application/json; charset=utf-8"}
         data = {
@@ -49,18 +283,13 @@ class FeishuClient:
             "app_secret": self.app_secret
         }
         
-        response = requests.post(url, json=data, headers=headers)
-        response.raise_for_status()
-        result = response.json()
+        result = self._request("POST", url, json=data, headers=headers)
         
         if result.get("code") != 0:
             raise Exception(f"获取token失败: {result.get('msg')}")
         
-        self.access_token = result["tenant_access_token"]
-        # token有效期通常是2小时，提前5分钟刷新
-        self.token_expires_at = time.time() + result.get("expire", 7200) - 300
-        
-        return self.access_token
+        # token有效期通常是2小时
+        return result["tenant_access_token"], result.get("expire", 7200)
     
     def _get_headers(self) -> Dict[str, str]:
         """获取请求头"""
@@ -70,37 +299,319 @@ class FeishuClient:
             "Content-Type": "application/json; charset=utf-8"
         }
     
+    def get_table_schema(self, table_id: Optional[str] = None, refresh: bool = False) -> TableSchema:
+        """
+        获取数据表的字段结构（按schema_ttl缓存）
+        
+        Args:
+            table_id: 数据表ID，默认为错题本表
+            refresh: 是否忽略缓存重新获取
+            
+        Returns:
+            表结构
+        """
+        table_id = table_id or self.table_id
+        if refresh:
+            self.schema_cache.invalidate(table_id)
+        return self.schema_cache.get(table_id, lambda: list(self._iter_pages(
+            lambda page_token: self._list_fields_page(table_id, page_token)
+        )))
+    
+    def _list_fields_page(self, table_id: str, page_token: Optional[str] = None) -> Dict[str, Any]:
+        """获取一页字段列表"""
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{table_id}/fields"
+        params = {"page_size": 100}
+        if page_token:
+            params["page_token"] = page_token
+        
+        headers = self._get_headers()
+        result = self._request("GET", url, params=params, headers=headers)
+        
+        if result.get("code") != 0:
+            raise Exception(f"获取字段列表失败: {result.get('msg')}")
+        
+        return result.get("data") or {}
+    
+    def _table_schema(self, table_id: str) -> Optional[TableSchema]:
+        """
+        获取用于本地校验和编解码的表结构
+        
+        Returns:
+            表结构；未开启校验或获取失败时返回None（交给服务端校验，按字段表的默认类型编解码）
+        """
+        if not self.validate_schema:
+            return None
+        try:
+            return self.get_table_schema(table_id)
+        except Exception:
+            return None
+    
+    def _check_fields(self, table_id: str, fields: Dict[str, Any]) -> List[str]:
+        """
+        按表结构在本地检查字段
+        
+        Returns:
+            问题列表；没有可用的表结构时返回空列表
+        """
+        schema = self._table_schema(table_id)
+        return schema.check(fields) if schema is not None else []
+    
+    def _validate_fields(self, table_id: str, fields: Dict[str, Any]):
+        """按表结构在本地校验字段，不通过时抛出FieldValidationError"""
+        errors = self._check_fields(table_id, fields)
+        if errors:
+            raise FieldValidationError(f"字段校验失败: {'; '.join(errors)}", errors)
+    
     def _upload_file(self, file_path: str) -> str:
         """
         上传文件到飞书
         
+        配置了上传索引时，先按内容哈希查找，已上传过的相同内容直接复用file_token。
+        超过chunked_upload_threshold的文件走分片上传。
+        
         Args:
             file_path: 本地文件路径
             
         Returns:
             文件token，用于插入到表格中
         """
+        content_hash = None
+        if self.upload_index is not None:
+            content_hash = file_sha256(file_path)
+            file_token = self.upload_index.get(self.app_id, content_hash)
+            if file_token:
+                return file_token
+        
+        file_name = os.path.basename(file_path)
+        size = os.path.getsize(file_path)
+        if size > self.chunked_upload_threshold:
+            with open(file_path, "rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                file_token = self._upload_file_chunked(mapped, file_name, size, content_hash)
+        else:
+            # 读入内存，保证重试时可以重新发送完整内容
+            with open(file_path, 'rb') as f:
+                file_token = self._upload_small_file(f.read(), file_name)
+        
+        if content_hash is not None:
+            self.upload_index.put(self.app_id, content_hash, file_token, size)
+        return file_token
+    
+    def _upload_content(self, content, file_name: str, content_hash: Optional[str] = None) -> str:
+        """
+        上传内存中的文件内容（如整页切分出的题目图片），去重和分片规则与_upload_file相同
+        
+        Args:
+            content: 文件内容（bytes或内存映射）
+            file_name: 上传时使用的文件名
+            content_hash: 已知的内容哈希（ImageBuffer已计算过时避免重复计算）
+            
+        Returns:
+            文件token
+        """
+        if self.upload_index is None:
+            content_hash = None
+        else:
+            content_hash = content_hash or content_sha256(content)
+            file_token = self.upload_index.get(self.app_id, content_hash)
+            if file_token:
+                return file_token
+        
+        if len(content) > self.chunked_upload_threshold:
+            file_token = self._upload_file_chunked(memoryview(content), file_name, len(content), content_hash)
+        else:
+            file_token = self._upload_small_file(bytes(content), file_name)
+        
+        if content_hash is not None:
+            self.upload_index.put(self.app_id, content_hash, file_token, len(content))
+        return file_token
+    
+    def _upload_small_file(self, content: bytes, file_name: str) -> str:
+        """一次请求上传文件，返回文件token"""
         url = f"{self.base_url}/im/v1/files"
         headers = {
             "Authorization": f"Bearer {self._get_access_token()}"
         }
         
-        with open(file_path, 'rb') as f:
-            files = {'file': f}
-            data = {'file_type': 'image', 'file_name': os.path.basename(file_path)}
-            response = requests.post(url, headers=headers, files=files, data=data)
-            response.raise_for_status()
-            result = response.json()
+        files = {'file': (file_name, content)}
+        data = {'file_type': 'image', 'file_name': file_name}
+        result = self._request("POST", url, headers=headers, files=files, data=data)
+        
+        if result.get("code") != 0:
+            raise Exception(f"上传文件失败: {result.get('msg')}")
+        
+        return result["data"]["file_token"]
+    
+    def _upload_file_chunked(self, buffer, file_name: str, size: int, content_hash: Optional[str] = None) -> str:
+        """
+        分片上传大文件（upload_prepare → upload_part → upload_finish）
+        
+        分片直接从内存映射的文件（或内存中的内容）中切出，在独立的小线程池中并发上传。
+        配置了上传索引时，上传会话和已确认的分片会写入索引，中断后再次上传同一内容时
+        只补传缺失的分片；如果旧会话已失效，则重新开始。
+        
+        Args:
+            buffer: 文件内容（mmap或memoryview）
+            file_name: 文件名
+            size: 文件大小（字节）
+            content_hash: 文件内容哈希（用于断点续传，可选）
+            
+        Returns:
+            文件token
+        """
+        index = self.upload_index if content_hash is not None else None
+        resumable = resumable_session(index, self.app_id, content_hash, size)
+        file_token = None
+        if resumable is not None:
+            try:
+                file_token = self._upload_session(buffer, *resumable)
+            except _UploadSessionError:
+                # 旧会话已失效，从头开始
+                index.remove_session(self.app_id, content_hash)
+        
+        if file_token is None:
+            session = self._prepare_upload(file_name, size)
+            if index is not None:
+                index.put_session(self.app_id, content_hash, session["upload_id"],
+                                  session["block_size"], session["block_num"], size)
+            file_token = self._upload_session(buffer, session, set())
+        
+        # 续传和重新上传完成后都删除会话，避免会话和分片记录在索引中堆积
+        if index is not None:
+            index.remove_session(self.app_id, content_hash)
+        return file_token
+    
+    def _prepare_upload(self, file_name: str, size: int) -> Dict[str, Any]:
+        """
+        创建分片上传会话
+        
+        Returns:
+            {"upload_id", "block_size", "block_num", "size"}
+        """
+        url = f"{self.base_url}/drive/v1/medias/upload_prepare"
+        data = upload_prepare_body(file_name, self.app_token, size)
+        result = self._request("POST", url, json=data, headers=self._get_headers())
+        
+        if result.get("code") != 0:
+            raise Exception(f"创建分片上传失败: {result.get('msg')}")
+        
+        return parse_upload_session(result["data"], size)
+    
+    def _upload_session(self, buffer, session: Dict[str, Any], acked: Set[int]) -> str:
+        """
+        上传会话中尚未确认的分片，全部完成后提交
+        
+        Args:
+            buffer: 文件内容（mmap或memoryview）
+            session: 上传会话
+            acked: 已确认的分片序号
+            
+        Returns:
+            文件token
+        """
+        upload_id = session["upload_id"]
+        missing = missing_parts(session, acked)
+        
+        if missing:
+            def send(seq: int, offset: int, length: int):
+                # 在工作线程中切片，同一时间只有正在上传的分片被复制到内存
+                self._upload_part(upload_id, seq, bytes(buffer[offset:offset + length]))
+                # 每确认一个分片立即落盘，进程中断也不会丢失进度
+                if self.upload_index is not None:
+                    self.upload_index.mark_part(upload_id, seq)
             
-            if result.get("code") != 0:
-                raise Exception(f"上传文件失败: {result.get('msg')}")
+            with ThreadPoolExecutor(max_workers=self.upload_part_workers) as executor:
+                futures = [executor.submit(send, *part) for part in missing]
             
-            return result["data"]["file_token"]
+            # 等所有分片结束后再抛出第一个错误，已成功的分片都已记录
+            for future in futures:
+                future.result()
+        
+        return self._finish_upload(upload_id, session["block_num"])
+    
+    def _upload_part(self, upload_id: str, seq: int, chunk: bytes):
+        """上传一个分片"""
+        url = f"{self.base_url}/drive/v1/medias/upload_part"
+        headers = {
+            "Authorization": f"Bearer {self._get_access_token()}"
+        }
+        data = upload_part_form(upload_id, seq, chunk, zlib.adler32(chunk))
+        files = {"file": (f"part{seq}", chunk)}
+        result = self._request("POST", url, headers=headers, data=data, files=files)
+        
+        if result.get("code") != 0:
+            raise _UploadSessionError(f"上传分片失败: {result.get('msg')}")
+    
+    def _finish_upload(self, upload_id: str, block_num: int) -> str:
+        """提交分片上传，返回文件token"""
+        url = f"{self.base_url}/drive/v1/medias/upload_finish"
+        data = {"upload_id": upload_id, "block_num": block_num}
+        result = self._request("POST", url, json=data, headers=self._get_headers())
+        
+        if result.get("code") != 0:
+            raise _UploadSessionError(f"完成分片上传失败: {result.get('msg')}")
+        
+        return result["data"]["file_token"]
+    
+    def _get_executor(self) -> Executor:
+        """获取上传用的线程池（未传入共享线程池时按需创建）"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.upload_workers,
+                        thread_name_prefix="feishu-upload"
+                    )
+                    self._owns_executor = True
+        return self._executor
+    
+    def _submit_attachment_uploads(self, record: ErrorRecord,
+                                   submitted: Optional[Dict[str, Future]] = None) -> Dict[str, Future]:
+        """
+        提交附件上传任务（错题原题和去手写）
+        
+        相同内容（或同一文件）只提交一次：去手写失败时去手写图就是原图，两个字段
+        共用同一个上传任务，不会在上传索引写入前并发上传两遍。
+        
+        Args:
+            record: 错题记录对象
+            submitted: 已提交的上传任务（内容哈希或文件路径到任务的映射），
+                       批量创建时在多条记录间共用
+        
+        Returns:
+            字段名到上传任务的映射，任务结果为file_token
+        """
+        executor = self._get_executor()
+        if submitted is None:
+            submitted = {}
+        uploads = {}
+        
+        for upload in plan_attachment_uploads(record):
+            if upload.key not in submitted:
+                if upload.file_path is not None:
+                    submitted[upload.key] = executor.submit(self._upload_file, upload.file_path)
+                else:
+                    submitted[upload.key] = executor.submit(
+                        self._upload_content, upload.content, upload.file_name, upload.content_hash
+                    )
+            for field_name in upload.field_names:
+                uploads[field_name] = submitted[upload.key]
+        
+        return uploads
+    
+    @staticmethod
+    def _collect_attachments(fields: Dict[str, Any], uploads: Dict[str, Future]):
+        """等待上传完成，并把file_token写入字段数据"""
+        for field_name, future in uploads.items():
+            fields[field_name] = [{"file_token": future.result()}]
     
     def create_error_record(self, record: ErrorRecord) -> str:
         """
         创建错题记录
         
+        两张附件在线程池中并发上传，同时在当前线程获取token、构建其余字段，
+        两个file_token都就绪后立即发送创建请求。
+        
         Args:
             record: 错题记录对象
             
@@ -109,146 +620,402 @@ class FeishuClient:
         """
         url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/records"
         
-        # 构建字段数据
-        fields = {}
-        
-        # 上传附件（错题原题和去手写）
-        if record.original_image:
-            if os.path.exists(record.original_image):
-                file_token = self._upload_file(record.original_image)
-                fields["错题原题"] = [{"file_token": file_token}]
-        
-        if record.cleaned_image:
-            if os.path.exists(record.cleaned_image):
-                file_token = self._upload_file(record.cleaned_image)
-                fields["去手写"] = [{"file_token": file_token}]
-        
-        # 注意：根据PRD，不再保存"题目文本"字段到飞书表格
-        # question_text 仅用于内部处理和AI分析
-        
-        # 学科（替代了原来的科目和年级）
-        if record.subject:
-            fields["学科"] = record.subject
-        
-        # 知识点
-        if record.knowledge_points:
-            fields["知识点"] = record.knowledge_points
-        
-        # 不会/做错（单选）
-        if record.error_type:
-            fields["不会/做错"] = record.error_type
-        
-        # 不会/做错的原因（文本）
-        if record.error_reason:
-            fields["不会/做错的原因"] = record.error_reason
-        if record.guide_questions:
-            fields["引导问题"] = record.guide_questions
-        if record.thinking_process:
-            fields["思考过程"] = record.thinking_process
-        if record.solution_approach:
-            fields["解题思路"] = record.solution_approach
-        if record.solution_checklist:
-            fields["解题清单"] = record.solution_checklist
-        if record.memory_formula:
-            fields["记忆口诀"] = record.memory_formula
-        
-        # 是否母题（单选：是/否）- 从bool改为单选
-        if record.is_master_question:
-            # 如果已经是字符串（是/否），直接使用
-            if isinstance(record.is_master_question, str):
-                fields["是否母题"] = record.is_master_question
-            # 如果是bool类型，转换为字符串
-            elif isinstance(record.is_master_question, bool):
-                fields["是否母题"] = "是" if record.is_master_question else "否"
-        
-        # 掌握程度
-        if record.mastery_level:
-            fields["掌握程度"] = record.mastery_level
-        
-        # 日期时间
-        if record.created_at:
-            fields["创建时间"] = int(record.created_at.timestamp() * 1000)
-        if record.last_review_time:
-            fields["最后复习时间"] = int(record.last_review_time.timestamp() * 1000)
-        
-        # 复习次数（PRD中有，根据实际情况决定是否保存）
-        if record.review_count is not None:
-            fields["复习次数"] = record.review_count
-        
-        # 复习次数（PRD中有但可能不需要，根据实际情况决定）
-        if hasattr(record, 'review_count') and record.review_count is not None:
-            fields["复习次数"] = record.review_count
+        # 先在本地校验字段，不合法时不上传附件也不发请求
+        fields = encode_error_fields(record, self._table_schema(self.table_id))
+        self._validate_fields(self.table_id, fields)
         
-        # 发送请求
+        uploads = self._submit_attachment_uploads(record)
+        
+        # 上传进行中，先获取token
         headers = self._get_headers()
+        self._collect_attachments(fields, uploads)
+        
+        # 发送请求
         data = {"fields": fields}
+        # client_token保证超时重试时不会重复创建记录
+        params = {"client_token": str(uuid.uuid4())}
         
-        response = requests.post(url, json=data, headers=headers)
-        response.raise_for_status()
-        result = response.json()
+        result = self._request("POST", url, json=data, headers=headers, params=params)
         
         if result.get("code") != 0:
             raise Exception(f"创建记录失败: {result.get('msg')}")
         
         return result["data"]["record"]["record_id"]
     
-    def update_error_record(self, record_id: str, record: ErrorRecord) -> bool:
+    def create_error_records(self, records: List[ErrorRecord]) -> Dict[str, Any]:
         """
-        更新错题记录
+        批量创建错题记录
+        
+        所有记录的附件在同一个线程池中并发上传，全部完成后通过batch_create写入。
+        附件上传失败的记录不会写入，并在结果中标记为失败。
         
         Args:
-            record_id: 记录ID
-            record: 更新的错题记录对象
+            records: 错题记录对象列表
+            
+        Returns:
+            批量结果，格式同create_feedback_questions
+        """
+        failed = []
+        fields_list = []
+        indices = []
+        for index, fields in enumerate(self.prepare_error_records(records)):
+            if isinstance(fields, Exception):
+                failed.append({"index": index, "error": str(fields)})
+                continue
+            fields_list.append(fields)
+            indices.append(index)
+        
+        result = self._batch_create_records(self.table_id, fields_list)
+        
+        # 把批量结果的下标映射回输入列表
+        record_ids: List[Optional[str]] = [None] * len(records)
+        apply_batch_result(record_ids, failed, result, indices)
+        
+        return {
+            "success": not failed,
+            "record_ids": record_ids,
+            "failed": failed
+        }
+    
+    def prepare_error_records(self, records: List[ErrorRecord]) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        把错题记录转换为可以直接写入的字段数据（供发件箱等自行发送批量请求的调用方使用）
+        
+        按表结构编码并在本地校验，所有记录的附件在线程池中并发上传（相同图片只上传一次），
+        完成后把file_token填入附件字段。
+        
+        Args:
+            records: 错题记录对象列表
             
         Returns:
-            是否成功
+            与输入一一对应的列表：成功为字段字典；失败为异常对象，
+            字段校验失败为FieldValidationError（重试也不会成功），其余为附件上传失败
         """
-        url = f"{self.base_url}/bitable/v1/apps/{self.table_id}/tables/{self.table_token}/records/{record_id}"
+        prepared: List[Union[Dict[str, Any], Exception]] = []
+        pending = []
+        submitted = {}  # 各记录共用，相同图片只上传一次
+        schema = self._table_schema(self.table_id)
+        for index, record in enumerate(records):
+            fields = encode_error_fields(record, schema)
+            errors = schema.check(fields) if schema is not None else []
+            if errors:
+                prepared.append(FieldValidationError(f"字段校验失败: {'; '.join(errors)}", errors))
+                continue
+            prepared.append(fields)
+            pending.append((index, fields, self._submit_attachment_uploads(record, submitted)))
+        
+        for index, fields, uploads in pending:
+            try:
+                self._collect_attachments(fields, uploads)
+            except Exception as e:
+                prepared[index] = Exception(f"上传附件失败: {e}")
         
-        # 构建字段数据（只包含需要更新的字段）
-        fields = {}
+        return prepared
+    
+    def update_error_record(self, record_id: str, changes: Union[ErrorRecord, Dict[str, Any]]) -> bool:
+        """
+        更新错题记录（只发送有变化的字段）
         
-        # 类似create_error_record的逻辑，但只包含需要更新的字段
-        # ...（省略具体实现，与create类似）
+        本地缓存中有该记录时，先与缓存快照比较，去掉没有变化的字段；
+        所有字段都没变化时不发请求。缓存中没有时发送全部传入的字段。
         
+        Args:
+            record_id: 记录ID
+            changes: 部分填写的错题记录对象（未填写的字段不更新），
+                     或以飞书字段名为键的字段字典
+            
+        Returns:
+            是否发送了更新请求（没有变化时返回False）
+        """
+        fields = diff_with_snapshot(self.record_cache, record_id, self._encode_update(changes))
+        if not fields:
+            return False
+        
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/records/{record_id}"
         headers = self._get_headers()
         data = {"fields": fields}
         
-        response = requests.put(url, json=data, headers=headers)
-        response.raise_for_status()
-        result = response.json()
+        result = self._request("PUT", url, json=data, headers=headers)
         
         if result.get("code") != 0:
             raise Exception(f"更新记录失败: {result.get('msg')}")
         
+        apply_to_snapshot(self.record_cache, record_id, fields)
         return True
     
-    def get_error_records(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+    def update_error_records(self, updates: List[Tuple[str, Union[ErrorRecord, Dict[str, Any]]]]) -> Dict[str, Any]:
         """
-        获取错题记录列表
+        批量更新错题记录（如每晚批量调整掌握程度和复习次数）
+        
+        同一record_id出现多次时先合并（同一字段以靠后的为准），结果对应回每一条输入；
+        每条记录都与缓存快照比较，只发送有变化的字段，没有变化的记录不发送；
+        其余记录通过batch_update接口分块写入。
         
         Args:
-            limit: 每页数量
-            offset: 偏移量
+            updates: (record_id, 部分错题记录对象或字段字典) 列表
             
         Returns:
-            记录列表
+            {
+                "success": 是否全部成功,
+                "record_ids": 与输入顺序对应的记录ID（失败为None）,
+                "skipped": 没有变化、未发送的输入序号列表,
+                "failed": [{"index": 输入序号, "error": 错误信息}, ...]
+            }
         """
-        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/records"
-        params = {
-            "page_size": limit,
-            "page_token": str(offset) if offset > 0 else None
+        record_ids: List[Optional[str]] = [None] * len(updates)
+        failed: List[Dict[str, Any]] = []
+        encoded: List[Tuple[int, str, Dict[str, Any]]] = []
+        
+        for index, (record_id, changes) in enumerate(updates):
+            try:
+                encoded.append((index, record_id, self._encode_update(changes)))
+            except Exception as e:
+                failed.append({"index": index, "error": str(e)})
+        
+        skipped, pending, pending_indices = plan_updates(self.record_cache, encoded, record_ids)
+        if pending:
+            result = self._batch_update_records(self.table_id, pending)
+            apply_batch_result(record_ids, failed, result, pending_indices)
+        
+        return {
+            "success": not failed,
+            "record_ids": record_ids,
+            "skipped": skipped,
+            "failed": failed
         }
+    
+    def _encode_update(self, changes: Union[ErrorRecord, Dict[str, Any]]) -> Dict[str, Any]:
+        """把部分错题记录对象或字段字典转换为待写入的字段（附件会先上传）"""
+        if isinstance(changes, dict):
+            fields = dict(changes)
+            self._validate_fields(self.table_id, fields)
+            return fields
+        
+        fields = encode_error_fields(changes, self._table_schema(self.table_id))
+        self._validate_fields(self.table_id, fields)
+        uploads = self._submit_attachment_uploads(changes)
+        self._collect_attachments(fields, uploads)
+        return fields
+    
+    def get_error_record(self, record_id: str, use_cache: bool = True) -> Optional[ErrorRecord]:
+        """
+        按记录ID获取单条错题记录
+        
+        Args:
+            record_id: 记录ID
+            use_cache: 是否优先使用本地缓存
+            
+        Returns:
+            错题记录对象（附件字段为下载地址或file_token），记录不存在时返回None
+        """
+        record = self.record_cache.get(record_id) if use_cache else None
+        if record is None:
+            record = self._fetch_error_record(record_id)
+            if record is None:
+                return None
+        return self._record_codec(self.table_id, ERROR_RECORD_CODEC).decode(record)
+    
+    def _fetch_error_record(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """从飞书获取记录原始数据并写入缓存，记录不存在时返回None"""
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/records/{record_id}"
+        headers = self._get_headers()
+        result = self._request("GET", url, headers=headers)
+        
+        if result.get("code") == RECORD_NOT_FOUND_CODE:
+            return None
+        if result.get("code") != 0:
+            raise Exception(f"获取记录失败: {result.get('msg')}")
+        
+        record = result["data"]["record"]
+        self.record_cache.put(record_id, record)
+        return record
+    
+    def get_error_records(self, limit: int = 100, offset: int = 0) -> List[ErrorRecord]:
+        """
+        获取错题记录列表
+        
+        Args:
+            limit: 返回的最大记录数
+            offset: 跳过的记录数
+            
+        Returns:
+            错题记录对象列表
+        """
+        page_size = min(offset + limit, MAX_PAGE_SIZE)
+        records = self.iter_error_records(page_size=page_size)
+        return list(itertools.islice(records, offset, offset + limit))
+    
+    def iter_error_records(self, page_size: int = 100, prefetch: bool = False) -> Iterator[ErrorRecord]:
+        """
+        逐条遍历错题本表的全部记录
+        
+        按has_more/page_token惰性翻页，内存中最多只保留一到两页数据。
+        
+        Args:
+            page_size: 每页数量（最大500）
+            prefetch: 是否在处理当前页时后台预取下一页
+            
+        Returns:
+            错题记录对象迭代器
+        """
+        return self._iter_records(self.table_id, ERROR_RECORD_CODEC, page_size, prefetch)
+    
+    def iter_feedback_questions(self, page_size: int = 100, prefetch: bool = False) -> Iterator[FeedbackQuestion]:
+        """
+        逐条遍历反馈题表的全部记录
+        
+        Args:
+            page_size: 每页数量（最大500）
+            prefetch: 是否在处理当前页时后台预取下一页
+            
+        Returns:
+            反馈题对象迭代器
+        """
+        if not self.feedback_table_id:
+            raise ValueError("反馈题表格ID未配置，请在config.py中设置FEISHU_FEEDBACK_TABLE_ID")
+        return self._iter_records(self.feedback_table_id, FEEDBACK_QUESTION_CODEC, page_size, prefetch)
+
+    def search_error_records(self, subject: Optional[str] = None,
+                             mastery_level: Optional[str] = None,
+                             is_master_question: Optional[str] = None,
+                             created_after: Optional[datetime] = None,
+                             created_before: Optional[datetime] = None,
+                             reviewed_after: Optional[datetime] = None,
+                             reviewed_before: Optional[datetime] = None,
+                             sort: Optional[List[Tuple[str, bool]]] = None,
+                             field_names: Optional[List[str]] = None,
+                             include_attachments: bool = False,
+                             page_size: int = 100,
+                             prefetch: bool = False) -> Iterator[ErrorRecord]:
+        """
+        按条件查询错题记录（服务端筛选）
+
+        筛选、排序和字段裁剪都在飞书服务端完成，只有命中的记录和需要的字段会返回。
+        默认不返回附件字段，需要图片时传include_attachments=True。
+
+        Args:
+            subject: 学科
+            mastery_level: 掌握程度
+            is_master_question: 是否母题："是"/"否"
+            created_after: 创建时间晚于（按日比较）
+            created_before: 创建时间早于（按日比较）
+            reviewed_after: 最后复习时间晚于（按日比较）
+            reviewed_before: 最后复习时间早于（按日比较）
+            sort: 排序 [(字段名, 是否降序), ...]，如[("最后复习时间", False)]
+            field_names: 需要返回的字段，默认返回除附件外的全部字段
+            include_attachments: 未指定field_names时是否同时返回附件字段
+            page_size: 每页数量（最大500）
+            prefetch: 是否在处理当前页时后台预取下一页
+
+        Returns:
+            错题记录对象迭代器（未返回的字段为None）
+        """
+        body = build_error_record_search(
+            subject=subject, mastery_level=mastery_level,
+            is_master_question=is_master_question,
+            created_after=created_after, created_before=created_before,
+            reviewed_after=reviewed_after, reviewed_before=reviewed_before,
+            sort=sort, field_names=field_names, include_attachments=include_attachments,
+        )
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+        def fetch_page(page_token: Optional[str]) -> Dict[str, Any]:
+            return self._search_records_page(self.table_id, body, page_size, page_token)
+
+        codec = self._record_codec(self.table_id, ERROR_RECORD_CODEC)
+        return map(codec.decode, self._iter_pages(fetch_page, prefetch))
+
+    def _search_records_page(self, table_id: str, body: Dict[str, Any], page_size: int,
+                             page_token: Optional[str] = None) -> Dict[str, Any]:
+        """
+        按条件获取一页记录
+
+        Returns:
+            飞书返回的data字段，包含items、has_more、page_token
+        """
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{table_id}/records/search"
+        params = {"page_size": page_size}
+        if page_token:
+            params["page_token"] = page_token
+
+        headers = self._get_headers()
+        result = self._request("POST", url, params=params, json=body, headers=headers)
+
+        if result.get("code") != 0:
+            raise Exception(f"查询记录失败: {result.get('msg')}")
+
+        return result.get("data") or {}
+
+    def _record_codec(self, table_id: str, codec: RecordCodec) -> RecordCodec:
+        """按数据表的表结构编译编解码器（没有可用的表结构时使用字段表的默认类型）"""
+        return codec.compile(self._table_schema(table_id))
+    
+    def _iter_records(self, table_id: str, codec: RecordCodec, page_size: int, prefetch: bool) -> Iterator[BaseModel]:
+        """遍历指定数据表的记录，并逐条解码为模型"""
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        
+        def fetch_page(page_token: Optional[str]) -> Dict[str, Any]:
+            return self._list_records_page(table_id, page_size, page_token)
+        
+        codec = self._record_codec(table_id, codec)
+        return map(codec.decode, self._iter_pages(fetch_page, prefetch))
+    
+    def _list_records_page(self, table_id: str, page_size: int,
+                           page_token: Optional[str] = None) -> Dict[str, Any]:
+        """
+        获取一页记录
+        
+        Returns:
+            飞书返回的data字段，包含items、has_more、page_token
+        """
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{table_id}/records"
+        params = {"page_size": page_size}
+        if page_token:
+            params["page_token"] = page_token
         
         headers = self._get_headers()
-        response = requests.get(url, params=params, headers=headers)
-        response.raise_for_status()
-        result = response.json()
+        result = self._request("GET", url, params=params, headers=headers)
         
         if result.get("code") != 0:
             raise Exception(f"获取记录失败: {result.get('msg')}")
         
-        return result.get("data", {}).get("items", [])
+        return result.get("data") or {}
+    
+    @staticmethod
+    def _iter_pages(fetch_page: Callable[[Optional[str]], Dict[str, Any]],
+                    prefetch: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        按page_token翻页并逐条产出记录
+        
+        Args:
+            fetch_page: 根据page_token获取一页数据的函数（首页传None）
+            prefetch: 是否在产出当前页时后台请求下一页
+        """
+        def next_token(data: Dict[str, Any]) -> Optional[str]:
+            if data.get("has_more") and data.get("page_token"):
+                return data["page_token"]
+            return None
+        
+        if not prefetch:
+            data = fetch_page(None)
+            while True:
+                yield from data.get("items") or []
+                page_token = next_token(data)
+                if not page_token:
+                    return
+                data = fetch_page(page_token)
+        
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = executor.submit(fetch_page, None)
+            while future is not None:
+                data = future.result()
+                page_token = next_token(data)
+                future = executor.submit(fetch_page, page_token) if page_token else None
+                yield from data.get("items") or []
+        finally:
+            # 调用方提前结束遍历时，放弃尚未开始的预取
+            executor.shutdown(wait=False, cancel_futures=True)
     
     def create_feedback_question(self, question: FeedbackQuestion) -> str:
         """
@@ -265,40 +1032,162 @@ class FeishuClient:
         
         url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{self.feedback_table_id}/records"
         
-        # 构建字段数据
-        fields = {}
-        
-        # 关联字段：母题ID（关联字段需要传入记录ID数组）
-        if question.master_question_id:
-            # 关联字段格式：["record_id1", "record_id2"]
-            fields["母题ID"] = [question.master_question_id]
-        
-        # 文本字段
-        if question.question_content:
-            fields["题目内容"] = question.question_content
-        if question.difficulty:
-            fields["难度"] = question.difficulty
-        if question.standard_answer:
-            fields["答案"] = question.standard_answer
-        if question.student_answer:
-            fields["学生答案"] = question.student_answer
-        if question.is_correct:
-            fields["是否正确"] = question.is_correct
-        
-        # 日期时间
-        if question.created_at:
-            fields["创建时间"] = int(question.created_at.timestamp() * 1000)
+        fields = encode_feedback_fields(question, self._table_schema(self.feedback_table_id))
+        self._validate_fields(self.feedback_table_id, fields)
         
         # 发送请求
         headers = self._get_headers()
         data = {"fields": fields}
+        params = {"client_token": str(uuid.uuid4())}
         
-        response = requests.post(url, json=data, headers=headers)
-        response.raise_for_status()
-        result = response.json()
+        result = self._request("POST", url, json=data, headers=headers, params=params)
         
         if result.get("code") != 0:
             raise Exception(f"创建反馈题记录失败: {result.get('msg')}")
         
         return result["data"]["record"]["record_id"]
-
+    
+    def create_feedback_questions(self, questions: List[FeedbackQuestion]) -> Dict[str, Any]:
+        """
+        批量创建反馈题记录
+        
+        Args:
+            questions: 反馈题对象列表
+            
+        Returns:
+            批量结果，包含：
+            - success: 是否全部成功
+            - record_ids: 与输入一一对应的记录ID，失败的位置为None
+            - failed: 失败项列表 [{"index": 输入下标, "error": 错误信息}, ...]
+        """
+        if not self.feedback_table_id:
+            raise ValueError("反馈题表格ID未配置，请在config.py中设置FEISHU_FEEDBACK_TABLE_ID")
+        
+        schema = self._table_schema(self.feedback_table_id)
+        fields_list = [encode_feedback_fields(q, schema) for q in questions]
+        return self._batch_create_records(self.feedback_table_id, fields_list)
+    
+    def batch_create_records(self, table_id: str, fields_list: List[Dict[str, Any]],
+                             client_token: Optional[str] = None) -> Dict[str, Any]:
+        """
+        在指定数据表中批量创建记录（字段为已经编码好的飞书字段数据）
+        
+        调用方需要跨进程重试同一批写入时（如发件箱），应保存client_token并在重试时
+        原样传入，飞书按client_token幂等处理，已经成功的批次不会重复创建。
+        
+        Args:
+            table_id: 数据表ID
+            fields_list: 每条记录的字段字典
+            client_token: 幂等键（可选），指定时fields_list不能超过单次上限
+            
+        Returns:
+            批量结果，格式同create_feedback_questions
+        """
+        if client_token is not None and len(fields_list) > BATCH_RECORD_LIMIT:
+            raise ValueError(f"指定client_token时单次最多创建{BATCH_RECORD_LIMIT}条记录")
+        return self._batch_create_records(table_id, fields_list, client_token)
+    
+    def batch_update_records(self, table_id: str, updates: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        在指定数据表中批量更新记录（字段为已经编码好的飞书字段数据）
+        
+        Args:
+            table_id: 数据表ID
+            updates: (record_id, 需要更新的字段字典) 列表
+            
+        Returns:
+            批量结果，record_ids中成功的位置为对应的记录ID，失败的位置为None
+        """
+        return self._batch_update_records(table_id, updates)
+    
+    def _batch_create_records(self, table_id: str, fields_list: List[Dict[str, Any]],
+                              client_token: Optional[str] = None) -> Dict[str, Any]:
+        """
+        通过batch_create接口批量创建记录
+        
+        超过单次上限的列表会被拆分成多个批次。同一批次在飞书侧是原子的，
+        某一批次失败时该批次内的所有行都记为失败，其余批次不受影响。
+        
+        Args:
+            table_id: 数据表ID
+            fields_list: 每条记录的字段字典
+            client_token: 幂等键（只有一个批次时使用），默认每个批次生成新的
+            
+        Returns:
+            批量结果，格式同create_feedback_questions
+        """
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{table_id}/records/batch_create"
+        record_ids: List[Optional[str]] = [None] * len(fields_list)
+        failed: List[Dict[str, Any]] = []
+        
+        # 本地校验不通过的行直接记为失败，不随批次发送
+        indices = []
+        for index, fields in enumerate(fields_list):
+            errors = self._check_fields(table_id, fields)
+            if errors:
+                failed.append({"index": index, "error": f"字段校验失败: {'; '.join(errors)}"})
+            else:
+                indices.append(index)
+        
+        for start in range(0, len(indices), BATCH_RECORD_LIMIT):
+            chunk_indices = indices[start:start + BATCH_RECORD_LIMIT]
+            chunk = [fields_list[index] for index in chunk_indices]
+            data = {"records": [{"fields": fields} for fields in chunk]}
+            params = {"client_token": client_token or str(uuid.uuid4())}
+            
+            try:
+                result = self._request("POST", url, json=data, headers=self._get_headers(), params=params)
+                if result.get("code") != 0:
+                    raise Exception(f"批量创建记录失败: {result.get('msg')}")
+                
+                records = result.get("data", {}).get("records", [])
+                if len(records) != len(chunk):
+                    raise Exception(f"批量创建记录返回数量不符: 期望{len(chunk)}条，实际{len(records)}条")
+                
+                for index, item in zip(chunk_indices, records):
+                    record_ids[index] = item["record_id"]
+            except Exception as e:
+                failed.extend({"index": index, "error": str(e)} for index in chunk_indices)
+        
+        failed.sort(key=lambda item: item["index"])
+        return {
+            "success": not failed,
+            "record_ids": record_ids,
+            "failed": failed
+        }
+    
+    def _batch_update_records(self, table_id: str, updates: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        通过batch_update接口批量更新记录
+        
+        Args:
+            table_id: 数据表ID
+            updates: (record_id, 需要更新的字段字典) 列表
+            
+        Returns:
+            批量结果，record_ids中成功的位置为对应的记录ID，失败的位置为None
+        """
+        url = f"{self.base_url}/bitable/v1/apps/{self.app_token}/tables/{table_id}/records/batch_update"
+        record_ids: List[Optional[str]] = [None] * len(updates)
+        failed: List[Dict[str, Any]] = []
+        
+        for start in range(0, len(updates), BATCH_RECORD_LIMIT):
+            chunk = updates[start:start + BATCH_RECORD_LIMIT]
+            data = {"records": [{"record_id": record_id, "fields": fields} for record_id, fields in chunk]}
+            
+            try:
+                result = self._request("POST", url, json=data, headers=self._get_headers())
+                if result.get("code") != 0:
+                    raise Exception(f"批量更新记录失败: {result.get('msg')}")
+                
+                for offset, (record_id, fields) in enumerate(chunk):
+                    record_ids[start + offset] = record_id
+                    apply_to_snapshot(self.record_cache, record_id, fields)
+            except Exception as e:
+                failed.extend({"index": start + offset, "error": str(e)} for offset in range(len(chunk)))
+        
+        return {
+            "success": not failed,
+            "record_ids": record_ids,
+            "failed": failed
+        }
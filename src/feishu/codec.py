@@ -0,0 +1,292 @@
+"""
+飞书多维表格记录编解码
+
+用一张字段表描述模型属性与飞书字段的对应关系，按表结构中的字段类型编译成编码器和解码器：
+模型 → 写入用的字段字典，飞书返回的记录 → 模型
+"""
+
+import weakref
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Callable, Iterable, NamedTuple, Type
+
+from pydantic import BaseModel
+
+from .models import ErrorRecord, FeedbackQuestion
+from .schema import (
+    TableSchema, READ_ONLY_FIELD_TYPES, FIELD_TYPE_TEXT, FIELD_TYPE_NUMBER, FIELD_TYPE_SINGLE_SELECT, FIELD_TYPE_MULTI_SELECT,
+    FIELD_TYPE_DATETIME, FIELD_TYPE_PHONE, FIELD_TYPE_ATTACHMENT, FIELD_TYPE_SINGLE_LINK, FIELD_TYPE_DUPLEX_LINK
+)
+
+
+# 字段种类
+TEXT = "text"
+NUMBER = "number"
+SINGLE_SELECT = "single_select"
+MULTI_SELECT = "multi_select"
+DATETIME = "datetime"
+LINK = "link"
+ATTACHMENT = "attachment"
+
+
+# 飞书字段类型 → 字段种类（创建/修改时间为只读字段，只参与解码）
+FIELD_TYPE_KINDS = {
+    FIELD_TYPE_TEXT: TEXT,
+    FIELD_TYPE_NUMBER: NUMBER,
+    FIELD_TYPE_SINGLE_SELECT: SINGLE_SELECT,
+    FIELD_TYPE_MULTI_SELECT: MULTI_SELECT,
+    FIELD_TYPE_DATETIME: DATETIME,
+    FIELD_TYPE_PHONE: TEXT,
+    FIELD_TYPE_ATTACHMENT: ATTACHMENT,
+    FIELD_TYPE_SINGLE_LINK: LINK,
+    FIELD_TYPE_DUPLEX_LINK: LINK,
+    1001: DATETIME,
+    1002: DATETIME,
+}
+
+
+class FieldSpec(NamedTuple):
+    """模型属性与飞书字段的对应关系（kind为获取不到表结构时使用的默认种类）"""
+    attr: str
+    field_name: str
+    kind: str
+
+
+def normalize_field_value(value: Any) -> Any:
+    """
+    把飞书返回的字段值和写入时的字段值统一成可比较的形式
+
+    - 附件 [{"file_token": ..., "name": ...}] → file_token列表
+    - 富文本分段 [{"type": "text", "text": ...}] → 拼接后的字符串
+    - 关联字段 {"link_record_ids": [...]} → 记录ID列表
+    """
+    if isinstance(value, dict) and "link_record_ids" in value:
+        return list(value["link_record_ids"])
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        if all("file_token" in item for item in value):
+            return [item["file_token"] for item in value]
+        if all("text" in item for item in value):
+            return "".join(item["text"] for item in value)
+        if all("record_ids" in item for item in value):
+            return [record_id for item in value for record_id in item["record_ids"]]
+    return value
+
+
+def _encode_text(value: Any) -> Optional[str]:
+    return value or None
+
+
+def _encode_number(value: Any) -> Any:
+    return value
+
+
+def _encode_single_select(value: Any) -> Optional[str]:
+    # 兼容旧数据中用bool表示的"是否母题"
+    if isinstance(value, bool):
+        return "是" if value else "否"
+    return value or None
+
+
+def _encode_multi_select(value: Any) -> Optional[List[str]]:
+    return list(value) if value else None
+
+
+def _encode_datetime(value: Any) -> Optional[int]:
+    return int(value.timestamp() * 1000) if value else None
+
+
+def _encode_link(value: Any) -> Optional[List[str]]:
+    # 关联字段需要传入记录ID数组
+    if not value:
+        return None
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _decode_text(value: Any) -> Optional[str]:
+    value = normalize_field_value(value)
+    if isinstance(value, list):
+        return "".join(str(item) for item in value)
+    return value
+
+
+def _decode_number(value: Any) -> Any:
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _decode_single_select(value: Any) -> Optional[str]:
+    return _decode_text(value)
+
+
+def _decode_multi_select(value: Any) -> Optional[List[str]]:
+    if isinstance(value, str):
+        return [value]
+    return list(value) if value else None
+
+
+def _decode_datetime(value: Any) -> Optional[datetime]:
+    return datetime.fromtimestamp(value / 1000) if value else None
+
+
+def _decode_link(value: Any) -> Optional[str]:
+    ids = normalize_field_value(value)
+    return ids[0] if isinstance(ids, list) and ids else None
+
+
+def _decode_attachment(value: Any) -> Optional[str]:
+    if not isinstance(value, list) or not value:
+        return None
+    # 有下载地址时优先返回地址，否则返回file_token
+    return value[0].get("url") or value[0].get("file_token")
+
+
+ENCODERS: Dict[str, Callable[[Any], Any]] = {
+    TEXT: _encode_text,
+    NUMBER: _encode_number,
+    SINGLE_SELECT: _encode_single_select,
+    MULTI_SELECT: _encode_multi_select,
+    DATETIME: _encode_datetime,
+    LINK: _encode_link,
+}
+
+DECODERS: Dict[str, Callable[[Any], Any]] = {
+    TEXT: _decode_text,
+    NUMBER: _decode_number,
+    SINGLE_SELECT: _decode_single_select,
+    MULTI_SELECT: _decode_multi_select,
+    DATETIME: _decode_datetime,
+    LINK: _decode_link,
+    ATTACHMENT: _decode_attachment,
+}
+
+
+class RecordCodec:
+    """按字段表编译的模型编解码器"""
+
+    def __init__(self, model: Type[BaseModel], specs: List[FieldSpec], read_only: Iterable[str] = ()):
+        """
+        Args:
+            model: 模型类
+            specs: 字段表
+            read_only: 只读字段名（如系统创建时间），只参与解码
+        """
+        self.model = model
+        self.specs = specs
+        # 表结构 → 按其编译的编解码器；表结构缓存过期被替换后自动释放
+        self._compiled = weakref.WeakKeyDictionary()
+        # 附件需要先上传拿到file_token，由客户端单独处理，不参与编码；只读字段由飞书填写
+        read_only = set(read_only)
+        self._encoders = [
+            (spec.attr, spec.field_name, ENCODERS[spec.kind])
+            for spec in specs if spec.kind != ATTACHMENT and spec.field_name not in read_only
+        ]
+        self._decoders = [(spec.attr, spec.field_name, DECODERS[spec.kind]) for spec in specs]
+        self.field_names = [spec.field_name for spec in specs]
+        self.attachment_fields = {spec.attr: spec.field_name for spec in specs if spec.kind == ATTACHMENT}
+
+    def compile(self, schema: Optional[TableSchema]) -> "RecordCodec":
+        """
+        按表结构中的实际字段类型编译编解码器
+
+        表结构中不存在或类型未知的字段沿用字段表中的默认种类；只读字段（创建时间、
+        公式等）不编码。同一个表结构只编译一次。
+
+        Args:
+            schema: 表结构，为None时返回按默认种类编译的编解码器本身
+
+        Returns:
+            编解码器
+        """
+        if schema is None:
+            return self
+        codec = self._compiled.get(schema)
+        if codec is None:
+            specs = [
+                spec._replace(kind=FIELD_TYPE_KINDS.get(schema.field_type(spec.field_name), spec.kind))
+                for spec in self.specs
+            ]
+            read_only = [
+                spec.field_name for spec in self.specs
+                if schema.field_type(spec.field_name) in READ_ONLY_FIELD_TYPES
+            ]
+            if specs == self.specs and not read_only:
+                codec = self
+            else:
+                codec = RecordCodec(self.model, specs, read_only)
+            self._compiled[schema] = codec
+        return codec
+
+    def encode(self, obj: BaseModel) -> Dict[str, Any]:
+        """
+        把模型编码为飞书字段数据（不含附件，空值不写入）
+
+        Args:
+            obj: 模型对象
+
+        Returns:
+            飞书字段字典
+        """
+        fields = {}
+        for attr, field_name, encode in self._encoders:
+            value = getattr(obj, attr)
+            if value is None:
+                continue
+            value = encode(value)
+            if value is not None:
+                fields[field_name] = value
+        return fields
+
+    def decode(self, item: Dict[str, Any]) -> BaseModel:
+        """
+        把飞书返回的记录解码为模型
+
+        Args:
+            item: 记录字典（包含record_id和fields）
+
+        Returns:
+            模型对象，缺失的字段为None
+        """
+        fields = item.get("fields") or {}
+        values = {}
+        for attr, field_name, decode in self._decoders:
+            value = fields.get(field_name)
+            values[attr] = decode(value) if value is not None else None
+        values["record_id"] = item.get("record_id")
+        # 解码结果的类型已经确定，跳过pydantic校验以加快批量解码
+        return self.model.model_construct(**values)
+
+    def decode_many(self, items: List[Dict[str, Any]]) -> List[BaseModel]:
+        """批量解码记录"""
+        decode = self.decode
+        return [decode(item) for item in items]
+
+
+ERROR_RECORD_CODEC = RecordCodec(ErrorRecord, [
+    FieldSpec("original_image", "错题原题", ATTACHMENT),
+    FieldSpec("cleaned_image", "去手写", ATTACHMENT),
+    # 注意：根据PRD，不再保存"题目文本"字段到飞书表格，question_text 仅用于内部处理和AI分析
+    FieldSpec("subject", "学科", SINGLE_SELECT),
+    FieldSpec("knowledge_points", "知识点", MULTI_SELECT),
+    FieldSpec("error_type", "不会/做错", SINGLE_SELECT),
+    FieldSpec("error_reason", "不会/做错的原因", TEXT),
+    FieldSpec("guide_questions", "引导问题", TEXT),
+    FieldSpec("thinking_process", "思考过程", TEXT),
+    FieldSpec("solution_approach", "解题思路", TEXT),
+    FieldSpec("solution_checklist", "解题清单", TEXT),
+    FieldSpec("memory_formula", "记忆口诀", TEXT),
+    FieldSpec("is_master_question", "是否母题", SINGLE_SELECT),
+    FieldSpec("mastery_level", "掌握程度", SINGLE_SELECT),
+    FieldSpec("created_at", "创建时间", DATETIME),
+    FieldSpec("last_review_time", "最后复习时间", DATETIME),
+    FieldSpec("review_count", "复习次数", NUMBER),
+])
+
+FEEDBACK_QUESTION_CODEC = RecordCodec(FeedbackQuestion, [
+    FieldSpec("master_question_id", "母题ID", LINK),
+    FieldSpec("question_content", "题目内容", TEXT),
+    FieldSpec("difficulty", "难度", SINGLE_SELECT),
+    FieldSpec("standard_answer", "答案", TEXT),
+    FieldSpec("student_answer", "学生答案", TEXT),
+    FieldSpec("is_correct", "是否正确", SINGLE_SELECT),
+    FieldSpec("created_at", "创建时间", DATETIME),
+])
@@ -0,0 +1,57 @@
+"""
+飞书多维表格字段编码
+
+同步客户端和异步客户端共用，保证两者写入的字段格式一致。
+字段对应关系定义在codec.py的字段表中
+"""
+
+from typing import Optional, Dict, Any
+
+from .models import ErrorRecord, FeedbackQuestion
+from .codec import ERROR_RECORD_CODEC, FEEDBACK_QUESTION_CODEC, normalize_field_value
+from .schema import TableSchema
+
+
+def encode_error_fields(record: ErrorRecord, schema: Optional[TableSchema] = None) -> Dict[str, Any]:
+    """
+    把错题记录编码为飞书字段数据（不含附件）
+
+    Args:
+        record: 错题记录对象
+        schema: 错题本表的表结构（可选，按实际字段类型编码）
+
+    Returns:
+        飞书字段字典
+    """
+    return ERROR_RECORD_CODEC.compile(schema).encode(record)
+
+
+def encode_feedback_fields(question: FeedbackQuestion, schema: Optional[TableSchema] = None) -> Dict[str, Any]:
+    """
+    把反馈题编码为飞书字段数据
+
+    Args:
+        question: 反馈题对象
+        schema: 反馈题表的表结构（可选，按实际字段类型编码）
+
+    Returns:
+        飞书字段字典
+    """
+    return FEEDBACK_QUESTION_CODEC.compile(schema).encode(question)
+
+
+def changed_fields(fields: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    找出与当前记录不同的字段
+
+    Args:
+        fields: 准备写入的字段
+        current: 当前记录的字段（飞书返回的格式）
+
+    Returns:
+        需要写入的字段（值与当前记录相同的字段被去掉）
+    """
+    return {
+        name: value for name, value in fields.items()
+        if name not in current or normalize_field_value(value) != normalize_field_value(current[name])
+    }
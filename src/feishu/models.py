@@ -3,16 +3,21 @@
 """
 
 from datetime import datetime
-from typing import Optional, List
-from pydantic import BaseModel, Field
+from typing import Optional, List, Union
+from pydantic import BaseModel, ConfigDict, Field
+
+from ..utils.image_buffer import ImageBuffer
 
 
 class ErrorRecord(BaseModel):
     """错题记录模型"""
     
+    # 附件可以直接是内存中的图片（ImageBuffer）
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
     # 基础信息
-    original_image: Optional[str] = Field(None, description="错题原图URL或路径")
-    cleaned_image: Optional[str] = Field(None, description="去手写后的图片URL或路径")
+    original_image: Optional[Union[str, bytes, ImageBuffer]] = Field(None, description="错题原图URL或路径（也可以是图片内容）")
+    cleaned_image: Optional[Union[str, bytes, ImageBuffer]] = Field(None, description="去手写后的图片URL或路径（也可以是图片内容）")
     question_text: Optional[str] = Field(None, description="题目文本")
     
     # 分类信息
@@ -0,0 +1,518 @@
+"""
+飞书写入发件箱
+
+待写入的记录先落到本地SQLite日志中，由后台线程合并成批量请求写入飞书，
+失败时按指数退避重试，进程重启后继续写入。
+批量创建的client_token随条目保存，进程在写入成功后、标记完成前退出时，
+重试会原样重发同一批请求，飞书按client_token幂等处理，不会重复创建
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import random
+import sqlite3
+import logging
+import threading
+from typing import Optional, List, Dict, Any, Tuple, Union
+
+from .models import ErrorRecord
+from .schema import FieldValidationError
+from .client import FeishuClient, BATCH_RECORD_LIMIT
+from ..utils.helpers import content_sha256
+from ..utils.image_buffer import ImageBuffer, image_extension
+
+
+logger = logging.getLogger(__name__)
+
+# 临时记录ID前缀
+PROVISIONAL_PREFIX = "local_"
+
+# 两次清理已完成条目之间的间隔（秒）
+PURGE_INTERVAL = 3600
+
+
+def is_provisional_id(record_id: str) -> bool:
+    """判断是否为发件箱生成的临时记录ID"""
+    return bool(record_id) and record_id.startswith(PROVISIONAL_PREFIX)
+
+
+class FeishuOutbox:
+    """
+    飞书写入发件箱
+
+    - enqueue_* 只写本地日志并立即返回临时ID（local_开头）
+    - 后台线程把到期的创建合并为batch_create，把对同一记录的多次更新合并为一次batch_update
+    - 写入成功后临时ID解析为飞书record_id，可通过resolve/wait查询
+    """
+
+    def __init__(self, client: FeishuClient, db_path: str, flush_interval: float = 1.0,
+                 max_attempts: int = 8, backoff_base: float = 2.0, backoff_max: float = 300.0,
+                 lease_seconds: float = 120.0, retention_seconds: float = 86400.0):
+        """
+        初始化发件箱
+
+        Args:
+            client: 飞书客户端
+            db_path: 日志数据库路径（Vercel上应位于/tmp下）
+            flush_interval: 后台线程两次写入之间的最长间隔（秒）
+            max_attempts: 单条写入的最大尝试次数，超过后标记为失败不再重试
+            backoff_base: 重试退避的基础时间（秒）
+            backoff_max: 重试退避的最长时间（秒）
+            lease_seconds: 条目被取出写入后的租约时间，超时未完成（如进程崩溃）则重新变为待写入
+            retention_seconds: 已完成条目的保留时间（秒），期间仍可通过resolve查询记录ID，之后被清理
+        """
+        self.client = client
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        self._next_purge_at = 0.0
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        # 附件副本目录：保证原图被调用方删除后仍能完成上传
+        self.spool_dir = os.path.join(directory, "outbox_files")
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    provisional_id TEXT UNIQUE,
+                    kind TEXT NOT NULL,
+                    table_id TEXT NOT NULL,
+                    target TEXT,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    claimed_until REAL NOT NULL DEFAULT 0,
+                    record_id TEXT,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    client_token TEXT,
+                    fields TEXT,
+                    done_at REAL
+                )
+                """
+            )
+            # 旧版本创建的日志缺少后加的列
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+            for name, decl in (("client_token", "TEXT"), ("fields", "TEXT"), ("done_at", "REAL")):
+                if name not in columns:
+                    self._conn.execute(f"ALTER TABLE outbox ADD COLUMN {name} {decl}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_batch ON outbox (client_token)")
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flushed = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- 写入队列 ----
+
+    def enqueue_error_record(self, record: ErrorRecord) -> str:
+        """
+        把错题记录加入写入队列
+
+        Args:
+            record: 错题记录对象（附件为本地文件路径、图片内容或ImageBuffer）
+
+        Returns:
+            临时记录ID
+        """
+        provisional_id = f"{PROVISIONAL_PREFIX}{uuid.uuid4().hex}"
+        # 去手写失败时去手写图就是原图，只复制一份，上传时两个字段共用一次上传
+        spooled: Dict[str, Optional[str]] = {}
+        record = record.model_copy(update={
+            "original_image": self._spool(provisional_id, "original", record.original_image, spooled),
+            "cleaned_image": self._spool(provisional_id, "cleaned", record.cleaned_image, spooled)
+        })
+
+        self._insert(provisional_id, "create", self.client.table_id, None, record.model_dump_json())
+        return provisional_id
+
+    def enqueue_update(self, record_id: str, fields: Dict[str, Any]) -> str:
+        """
+        把字段更新加入写入队列
+
+        Args:
+            record_id: 飞书记录ID，或尚未写入的临时ID（会在创建完成后再更新）
+            fields: 需要更新的飞书字段字典
+
+        Returns:
+            本次更新的队列ID
+        """
+        entry_id = f"{PROVISIONAL_PREFIX}{uuid.uuid4().hex}"
+        self._insert(entry_id, "update", self.client.table_id, record_id, json.dumps(fields, ensure_ascii=False))
+        return entry_id
+
+    def _insert(self, provisional_id: str, kind: str, table_id: str, target: Optional[str], payload: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO outbox (provisional_id, kind, table_id, target, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (provisional_id, kind, table_id, target, payload, time.time())
+            )
+        self._wake.set()
+
+    def _spool(self, provisional_id: str, name: str, path: Optional[Union[str, bytes, ImageBuffer]],
+               spooled: Dict[str, Optional[str]]) -> Optional[str]:
+        """
+        复制附件到发件箱目录，返回副本路径（内存中的图片直接写入发件箱目录）
+
+        Args:
+            spooled: 同一条记录中已复制的附件（内容哈希或真实路径 → 副本路径），相同内容只复制一次
+        """
+        if isinstance(path, ImageBuffer):
+            key = path.sha256
+        elif isinstance(path, bytes):
+            key = content_sha256(path)
+        elif path and os.path.exists(path):
+            key = os.path.realpath(path)
+        else:
+            return path
+        if key in spooled:
+            return spooled[key]
+
+        if isinstance(path, ImageBuffer):
+            spool_path = os.path.join(self.spool_dir, f"{provisional_id}_{name}_{path.name}")
+            with open(spool_path, "wb") as f:
+                f.write(path.data)
+        elif isinstance(path, bytes):
+            spool_path = os.path.join(self.spool_dir, f"{provisional_id}_{name}{image_extension(path)}")
+            with open(spool_path, "wb") as f:
+                f.write(path)
+        else:
+            spool_path = os.path.join(self.spool_dir, f"{provisional_id}_{name}_{os.path.basename(path)}")
+            shutil.copyfile(path, spool_path)
+        spooled[key] = spool_path
+        return spool_path
+
+    # ---- 查询 ----
+
+    def resolve(self, provisional_id: str) -> Optional[str]:
+        """
+        查询临时ID对应的飞书记录ID
+
+        Args:
+            provisional_id: 临时记录ID
+
+        Returns:
+            飞书record_id，尚未写入时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record_id FROM outbox WHERE provisional_id = ?", (provisional_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def wait(self, provisional_id: str, timeout: float = 30.0) -> Optional[str]:
+        """
+        等待临时ID写入完成
+
+        Args:
+            provisional_id: 临时记录ID
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            飞书record_id，超时或写入最终失败时返回None
+        """
+        deadline = time.monotonic() + timeout
+        self._wake.set()
+        while True:
+            record_id = self.resolve(provisional_id)
+            if record_id or self.status(provisional_id) == "failed":
+                return record_id
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            with self._flushed:
+                self._flushed.wait(min(remaining, self.flush_interval))
+
+    def status(self, provisional_id: str) -> Optional[str]:
+        """查询条目状态：pending/done/failed，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM outbox WHERE provisional_id = ?", (provisional_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def pending_count(self) -> int:
+        """待写入的条目数"""
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()
+        return row[0]
+
+    # ---- 后台写入 ----
+
+    def start(self):
+        """启动后台写入线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="feishu-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, flush: bool = True, timeout: float = 10.0):
+        """
+        停止后台写入线程
+
+        Args:
+            flush: 停止前是否再写入一次
+            timeout: 等待线程退出的最长时间（秒）
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if flush:
+            self.flush()
+
+    def close(self):
+        """停止后台线程并关闭数据库"""
+        self.stop(flush=False)
+        with self._lock:
+            self._conn.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                processed = self.flush()
+            except Exception as e:
+                logger.warning(f"发件箱写入失败: {e}")
+                processed = 0
+
+            # 本轮取满了说明还有积压，立即继续；否则等待新条目或到达间隔
+            if processed < BATCH_RECORD_LIMIT:
+                self._wake.wait(self.flush_interval)
+
+    def flush(self) -> int:
+        """
+        写入一批到期的条目
+
+        Returns:
+            本轮处理的条目数
+        """
+        with self._flush_lock:
+            creates = self._claim("create")
+            if creates:
+                self._flush_creates(creates)
+
+            updates = self._claim("update")
+            if updates:
+                self._flush_updates(updates)
+
+            if time.time() >= self._next_purge_at:
+                self.purge()
+                self._next_purge_at = time.time() + min(PURGE_INTERVAL, self.retention_seconds)
+
+        with self._flushed:
+            self._flushed.notify_all()
+        return len(creates) + len(updates)
+
+    def purge(self) -> int:
+        """
+        删除完成时间超过retention_seconds的条目，避免日志无限增长
+
+        仍有待写入的更新以其临时ID为目标的创建条目会保留，保证更新能解析到记录ID
+
+        Returns:
+            删除的条目数
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM outbox WHERE status = 'done' AND done_at < ? AND provisional_id NOT IN "
+                "(SELECT target FROM outbox WHERE status = 'pending' AND target IS NOT NULL)",
+                (time.time() - self.retention_seconds,)
+            )
+        return cursor.rowcount
+
+    def _claim(self, kind: str) -> List[Tuple[int, str, str, Optional[str], str, int, Optional[str], Optional[str]]]:
+        """
+        取出一批到期的条目并加租约，避免多个进程重复写入
+
+        已经发出过的批次整批取出（同一client_token必须原样重发）
+        """
+        now = time.time()
+        columns = "id, provisional_id, table_id, target, payload, attempts, client_token, fields"
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                f"SELECT {columns} FROM outbox "
+                "WHERE status = 'pending' AND kind = ? AND next_attempt_at <= ? AND claimed_until <= ? "
+                "ORDER BY id LIMIT ?",
+                (kind, now, now, BATCH_RECORD_LIMIT)
+            ).fetchall()
+            tokens = {row[6] for row in rows if row[6]}
+            if tokens:
+                ids = {row[0] for row in rows}
+                placeholders = ", ".join("?" * len(tokens))
+                rows += [
+                    row for row in self._conn.execute(
+                        f"SELECT {columns} FROM outbox WHERE status = 'pending' AND claimed_until <= ? "
+                        f"AND client_token IN ({placeholders}) ORDER BY id",
+                        (now, *tokens)
+                    ).fetchall()
+                    if row[0] not in ids
+                ]
+            if rows:
+                self._conn.executemany(
+                    "UPDATE outbox SET claimed_until = ? WHERE id = ?",
+                    [(now + self.lease_seconds, row[0]) for row in rows]
+                )
+        return rows
+
+    def _flush_creates(self, rows: List[Tuple]):
+        """
+        上传附件并按数据表合并为batch_create
+
+        新条目先上传附件、编码字段，连同新生成的client_token一起保存后再发送；
+        已经发出过的批次直接用保存的字段和client_token重发
+        """
+        batches: Dict[Tuple[str, str], List[Tuple[Tuple, Dict[str, Any]]]] = {}
+        fresh = []
+        for row in rows:
+            if row[6]:
+                batches.setdefault((row[2], row[6]), []).append((row, json.loads(row[7])))
+            else:
+                fresh.append(row)
+
+        if fresh:
+            records = [ErrorRecord.model_validate_json(row[4]) for row in fresh]
+            by_table: Dict[str, List[Tuple[Tuple, Dict[str, Any]]]] = {}
+            for row, fields in zip(fresh, self.client.prepare_error_records(records)):
+                if isinstance(fields, FieldValidationError):
+                    # 字段与表结构不符，重试也不会成功
+                    self._mark_failed(row, str(fields))
+                elif isinstance(fields, Exception):
+                    self._mark_retry([row], str(fields))
+                else:
+                    by_table.setdefault(row[2], []).append((row, fields))
+
+            for table_id, items in by_table.items():
+                client_token = str(uuid.uuid4())
+                self._save_batch(items, client_token)
+                batches[(table_id, client_token)] = items
+
+        for (table_id, client_token), items in batches.items():
+            try:
+                result = self.client.batch_create_records(
+                    table_id, [fields for _, fields in items], client_token=client_token
+                )
+            except Exception as e:
+                self._mark_retry([row for row, _ in items], str(e))
+                continue
+
+            errors = {item["index"]: item["error"] for item in result["failed"]}
+            if errors:
+                # 同一批次在飞书侧是原子的，整批保留client_token一起重试
+                self._mark_retry([row for row, _ in items], next(iter(errors.values())))
+                continue
+            for index, (row, _) in enumerate(items):
+                self._mark_done(row, result["record_ids"][index])
+                self._remove_spooled(ErrorRecord.model_validate_json(row[4]))
+
+    def _save_batch(self, items: List[Tuple[Tuple, Dict[str, Any]]], client_token: str):
+        """发送前保存批次的client_token和编码后的字段，重试时原样重发"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE outbox SET client_token = ?, fields = ? WHERE id = ?",
+                [(client_token, json.dumps(fields, ensure_ascii=False), row[0]) for row, fields in items]
+            )
+
+    def _flush_updates(self, rows: List[Tuple]):
+        """解析目标记录ID，合并同一记录的多次更新后batch_update"""
+        merged: Dict[Tuple[str, str], Tuple[List[Tuple], Dict[str, Any]]] = {}
+        for row in rows:
+            target = row[3]
+            if is_provisional_id(target):
+                target = self.resolve(target)
+                if not target:
+                    # 目标记录尚未创建，释放租约等待下一轮
+                    self._release(row)
+                    continue
+
+            key = (row[2], target)
+            entry_rows, fields = merged.setdefault(key, ([], {}))
+            entry_rows.append(row)
+            # 按入队顺序合并，后写入的字段覆盖先写入的
+            fields.update(json.loads(row[4]))
+
+        by_table: Dict[str, List[Tuple[str, List[Tuple], Dict[str, Any]]]] = {}
+        for (table_id, record_id), (entry_rows, fields) in merged.items():
+            by_table.setdefault(table_id, []).append((record_id, entry_rows, fields))
+
+        for table_id, items in by_table.items():
+            result = self.client.batch_update_records(
+                table_id, [(record_id, fields) for record_id, _, fields in items]
+            )
+            errors = {item["index"]: item["error"] for item in result["failed"]}
+            for index, (record_id, entry_rows, _) in enumerate(items):
+                for row in entry_rows:
+                    if index in errors:
+                        self._mark_retry([row], errors[index])
+                    else:
+                        self._mark_done(row, record_id)
+
+    def _mark_done(self, row: Tuple, record_id: str):
+        # 编码后的字段只用于重发，完成后不再保留
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'done', record_id = ?, claimed_until = 0, last_error = NULL, "
+                "fields = NULL, done_at = ? WHERE id = ?",
+                (record_id, time.time(), row[0])
+            )
+
+    def _mark_failed(self, row: Tuple, error: str):
+        logger.error(f"发件箱条目{row[1]}写入失败，已放弃: {error}")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'failed', attempts = ?, next_attempt_at = 0, claimed_until = 0, "
+                "last_error = ? WHERE id = ?",
+                (row[5] + 1, error, row[0])
+            )
+
+    def _mark_retry(self, rows: List[Tuple], error: str):
+        """安排重试（同一批次的条目使用同一个重试时间，保证下次仍然一起发送）"""
+        attempts = max(row[5] for row in rows) + 1
+        # 带抖动的指数退避
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempts)))
+        next_attempt_at = time.time() + delay
+
+        for row in rows:
+            if row[5] + 1 >= self.max_attempts:
+                self._mark_failed(row, error)
+                continue
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, claimed_until = 0, "
+                    "last_error = ? WHERE id = ?",
+                    (row[5] + 1, next_attempt_at, error, row[0])
+                )
+
+    def _release(self, row: Tuple):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE outbox SET claimed_until = 0 WHERE id = ?", (row[0],))
+
+    def _remove_spooled(self, record: ErrorRecord):
+        """写入成功后删除附件副本"""
+        spool_dir = os.path.abspath(self.spool_dir)
+        for path in (record.original_image, record.cleaned_image):
+            if path and os.path.dirname(os.path.abspath(path)) == spool_dir:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,265 @@
+"""
+同步客户端和异步客户端共用的请求构建逻辑
+
+这里只决定"要发什么"：附件怎么去重上传、分片上传分几片、批量结果怎么对应回输入，
+不发起网络请求。FeishuClient和AsyncFeishuClient各自负责发送，保证两者行为一致
+"""
+
+import os
+from typing import Optional, List, Dict, Any, NamedTuple, Set, Tuple, Union
+
+from .models import ErrorRecord
+from .cache import RecordCache
+from .fields import changed_fields
+from .query import ATTACHMENT_FIELD_NAMES
+from .upload_index import UploadIndex
+from ..utils.helpers import content_sha256
+from ..utils.image_buffer import ImageBuffer, image_extension
+
+
+# 错题记录的附件：(飞书字段名, 内存图片的文件名前缀, 模型属性)
+ATTACHMENT_SOURCES = (
+    ("错题原题", "original", "original_image"),
+    ("去手写", "cleaned", "cleaned_image"),
+)
+
+
+class _UploadSessionError(Exception):
+    """分片上传会话被服务端拒绝（如upload_id已失效），需要重新开始"""
+
+
+class AttachmentUpload(NamedTuple):
+    """一个待上传的附件，内容相同的多个字段共用"""
+    key: str                       # 去重键：内容哈希，文件路径输入为真实路径
+    field_names: Tuple[str, ...]   # 使用该附件的字段
+    file_path: Optional[str]       # 本地文件路径（与content二选一）
+    content: Any                   # 内存中的内容（bytes或内存映射）
+    file_name: str                 # 上传时使用的文件名
+    content_hash: Optional[str]    # 已知的内容哈希
+
+
+def plan_attachment_uploads(record: ErrorRecord) -> List[AttachmentUpload]:
+    """
+    列出错题记录需要上传的附件
+
+    相同内容（或同一文件）只出现一次：去手写失败时去手写图就是原图，两个字段
+    共用一次上传，不会在上传索引写入前并发上传两遍。
+
+    Args:
+        record: 错题记录对象
+
+    Returns:
+        待上传的附件列表
+    """
+    uploads: Dict[str, AttachmentUpload] = {}
+    for field_name, stem, attr in ATTACHMENT_SOURCES:
+        image = getattr(record, attr, None)
+        if isinstance(image, ImageBuffer):
+            # 内存中的图片直接上传，不落盘也不重新读取
+            key = image.sha256
+            upload = AttachmentUpload(key, (), None, image.data, image.name, key)
+        elif isinstance(image, bytes):
+            # 内存中的图片（如整页切分出的题目）直接上传，不落盘
+            key = content_sha256(image)
+            upload = AttachmentUpload(key, (), None, image, f"{stem}_{key[:16]}{image_extension(image)}", key)
+        elif image and os.path.exists(image):
+            key = os.path.realpath(image)
+            upload = AttachmentUpload(key, (), image, None, os.path.basename(image), None)
+        else:
+            continue
+        upload = uploads.get(key, upload)
+        uploads[key] = upload._replace(field_names=upload.field_names + (field_name,))
+    return list(uploads.values())
+
+
+def attachment_fields(uploads: List[AttachmentUpload], file_tokens: List[str]) -> Dict[str, Any]:
+    """
+    把上传结果转换为附件字段
+
+    Args:
+        uploads: plan_attachment_uploads的结果
+        file_tokens: 与uploads一一对应的file_token
+
+    Returns:
+        附件字段字典
+    """
+    return {
+        field_name: [{"file_token": file_token}]
+        for upload, file_token in zip(uploads, file_tokens)
+        for field_name in upload.field_names
+    }
+
+
+def upload_prepare_body(file_name: str, parent_node: str, size: int) -> Dict[str, Any]:
+    """分片上传upload_prepare的请求体"""
+    return {
+        "file_name": file_name,
+        "parent_type": "bitable_image",
+        "parent_node": parent_node,
+        "size": size
+    }
+
+
+def parse_upload_session(data: Dict[str, Any], size: int) -> Dict[str, Any]:
+    """
+    从upload_prepare的返回中取出上传会话
+
+    Returns:
+        {"upload_id", "block_size", "block_num", "size"}
+    """
+    return {
+        "upload_id": data["upload_id"],
+        "block_size": data["block_size"],
+        "block_num": data["block_num"],
+        "size": size
+    }
+
+
+def upload_part_form(upload_id: str, seq: int, chunk: bytes, checksum: int) -> Dict[str, str]:
+    """分片上传upload_part的表单字段（分片内容作为file单独发送）"""
+    return {
+        "upload_id": upload_id,
+        "seq": str(seq),
+        "size": str(len(chunk)),
+        "checksum": str(checksum)
+    }
+
+
+def resumable_session(index: Optional[UploadIndex], scope: str, content_hash: Optional[str],
+                      size: int) -> Optional[Tuple[Dict[str, Any], Set[int]]]:
+    """
+    查找可以继续的分片上传会话（会读写上传索引，异步客户端应在线程中调用）
+
+    Args:
+        index: 上传索引（未配置时为None）
+        scope: 作用域（app_id）
+        content_hash: 文件内容哈希（未知时不续传）
+        size: 文件大小（字节），与旧会话不一致时丢弃旧会话
+
+    Returns:
+        (上传会话, 已确认的分片序号)，没有可继续的会话时返回None
+    """
+    if index is None or content_hash is None:
+        return None
+    session = index.get_session(scope, content_hash)
+    if session is None:
+        return None
+    if session["size"] != size:
+        index.remove_session(scope, content_hash)
+        return None
+    return session, index.acked_parts(session["upload_id"])
+
+
+def missing_parts(session: Dict[str, Any], acked: Set[int]) -> List[Tuple[int, int, int]]:
+    """
+    列出会话中尚未确认的分片
+
+    Returns:
+        [(分片序号, 起始偏移, 长度), ...]
+    """
+    block_size, size = session["block_size"], session["size"]
+    return [
+        (seq, seq * block_size, min(block_size, size - seq * block_size))
+        for seq in range(session["block_num"]) if seq not in acked
+    ]
+
+
+def apply_batch_result(record_ids: List[Optional[str]], failed: List[Dict[str, Any]],
+                       result: Dict[str, Any], indices: List[Union[int, List[int]]]):
+    """
+    把只包含部分输入的批量结果对应回输入序号
+
+    Args:
+        record_ids: 与输入对应的记录ID列表（原地填写）
+        failed: 失败项列表（原地追加并按序号排序）
+        result: 批量接口的结果（下标为indices中的位置）
+        indices: 批量结果中每一项对应的输入序号（由多条输入合并而来时为序号列表）
+    """
+    def targets(position: int) -> List[int]:
+        target = indices[position]
+        return target if isinstance(target, list) else [target]
+
+    for position, record_id in enumerate(result["record_ids"]):
+        if record_id is not None:
+            for index in targets(position):
+                record_ids[index] = record_id
+    failed.extend({"index": index, "error": item["error"]}
+                  for item in result["failed"] for index in targets(item["index"]))
+    failed.sort(key=lambda item: item["index"])
+
+
+def merge_updates(updates: List[Tuple[int, str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any], List[int]]]:
+    """
+    按record_id合并同一记录的多次更新
+
+    batch_update中同一记录出现多次时，结果取决于服务端的处理顺序。这里先合并，
+    同一字段以输入中靠后的为准，每条记录只发送一次。
+
+    Args:
+        updates: (输入序号, record_id, 字段字典) 列表，按输入顺序排列
+
+    Returns:
+        [(record_id, 合并后的字段, 对应的输入序号列表), ...]，按记录首次出现的顺序排列
+    """
+    groups: Dict[str, Tuple[Dict[str, Any], List[int]]] = {}
+    for index, record_id, fields in updates:
+        merged, indices = groups.setdefault(record_id, ({}, []))
+        merged.update(fields)
+        indices.append(index)
+    return [(record_id, merged, indices) for record_id, (merged, indices) in groups.items()]
+
+
+def plan_updates(cache: RecordCache, encoded: List[Tuple[int, str, Dict[str, Any]]],
+                 record_ids: List[Optional[str]]) -> Tuple[List[int], List[Tuple[str, Dict[str, Any]]], List[List[int]]]:
+    """
+    合并同一记录的多次更新，并与缓存快照比较
+
+    Args:
+        cache: 记录缓存
+        encoded: (输入序号, record_id, 字段字典) 列表
+        record_ids: 与输入对应的记录ID列表，没有变化的输入会原地填写
+
+    Returns:
+        (没有变化的输入序号, 需要发送的(record_id, 字段)列表, 每项对应的输入序号列表)
+    """
+    skipped: List[int] = []
+    pending: List[Tuple[str, Dict[str, Any]]] = []
+    pending_indices: List[List[int]] = []
+
+    for record_id, fields, indices in merge_updates(encoded):
+        fields = diff_with_snapshot(cache, record_id, fields)
+        if fields:
+            pending.append((record_id, fields))
+            pending_indices.append(indices)
+        else:
+            for index in indices:
+                record_ids[index] = record_id
+            skipped.extend(indices)
+
+    skipped.sort()
+    return skipped, pending, pending_indices
+
+
+def diff_with_snapshot(cache: RecordCache, record_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """与缓存快照比较，返回有变化的字段；没有快照时原样返回"""
+    snapshot = cache.get(record_id)
+    if snapshot is None:
+        return fields
+    return changed_fields(fields, snapshot.get("fields") or {})
+
+
+def apply_to_snapshot(cache: RecordCache, record_id: str, fields: Dict[str, Any]):
+    """
+    把写入成功的字段合并进缓存快照
+
+    附件字段写入的是file_token，与读取时的格式不同，涉及附件时直接让快照失效
+    """
+    if any(name in ATTACHMENT_FIELD_NAMES for name in fields):
+        cache.invalidate(record_id)
+        return
+
+    snapshot = cache.get(record_id)
+    if snapshot is None:
+        return
+    snapshot.setdefault("fields", {}).update(fields)
+    cache.put(record_id, snapshot)
@@ -0,0 +1,87 @@
+"""
+多维表格记录查询条件构建
+
+把常用的筛选条件转换为records/search接口的请求体，同步和异步客户端共用
+"""
+
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
+
+from .codec import ERROR_RECORD_CODEC
+
+
+# 错题本表的全部字段
+ERROR_RECORD_FIELD_NAMES = ERROR_RECORD_CODEC.field_names
+
+# 附件字段体积大，列表和复习场景默认不返回
+ATTACHMENT_FIELD_NAMES = list(ERROR_RECORD_CODEC.attachment_fields.values())
+
+
+def _condition(field_name: str, operator: str, value: Optional[List[str]] = None) -> Dict[str, Any]:
+    condition = {"field_name": field_name, "operator": operator}
+    if value is not None:
+        condition["value"] = value
+    return condition
+
+
+def _date_value(value: datetime) -> List[str]:
+    """日期条件的取值格式：["ExactDate", 毫秒时间戳]"""
+    return ["ExactDate", str(int(value.timestamp() * 1000))]
+
+
+def build_error_record_search(subject: Optional[str] = None,
+                              mastery_level: Optional[str] = None,
+                              is_master_question: Optional[str] = None,
+                              created_after: Optional[datetime] = None,
+                              created_before: Optional[datetime] = None,
+                              reviewed_after: Optional[datetime] = None,
+                              reviewed_before: Optional[datetime] = None,
+                              sort: Optional[List[Tuple[str, bool]]] = None,
+                              field_names: Optional[List[str]] = None,
+                              include_attachments: bool = False) -> Dict[str, Any]:
+    """
+    构建错题记录的search请求体
+
+    Args:
+        subject: 学科，如"数学"
+        mastery_level: 掌握程度，如"未掌握"
+        is_master_question: 是否母题："是"/"否"
+        created_after: 创建时间晚于（按日比较，不含当天）
+        created_before: 创建时间早于（按日比较，不含当天）
+        reviewed_after: 最后复习时间晚于（按日比较，不含当天）
+        reviewed_before: 最后复习时间早于（按日比较，不含当天）
+        sort: 排序 [(字段名, 是否降序), ...]
+        field_names: 需要返回的字段，默认返回除附件外的全部字段
+        include_attachments: 未指定field_names时是否同时返回附件字段
+
+    Returns:
+        search接口请求体
+    """
+    conditions = []
+    if subject:
+        conditions.append(_condition("学科", "is", [subject]))
+    if mastery_level:
+        conditions.append(_condition("掌握程度", "is", [mastery_level]))
+    if is_master_question:
+        conditions.append(_condition("是否母题", "is", [is_master_question]))
+    if created_after:
+        conditions.append(_condition("创建时间", "isGreater", _date_value(created_after)))
+    if created_before:
+        conditions.append(_condition("创建时间", "isLess", _date_value(created_before)))
+    if reviewed_after:
+        conditions.append(_condition("最后复习时间", "isGreater", _date_value(reviewed_after)))
+    if reviewed_before:
+        conditions.append(_condition("最后复习时间", "isLess", _date_value(reviewed_before)))
+
+    body: Dict[str, Any] = {"automatic_fields": False}
+    if conditions:
+        body["filter"] = {"conjunction": "and", "conditions": conditions}
+    if sort:
+        body["sort"] = [{"field_name": name, "desc": desc} for name, desc in sort]
+
+    if field_names is None and not include_attachments:
+        field_names = [name for name in ERROR_RECORD_FIELD_NAMES if name not in ATTACHMENT_FIELD_NAMES]
+    if field_names is not None:
+        body["field_names"] = list(field_names)
+
+    return body
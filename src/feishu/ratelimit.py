@@ -0,0 +1,223 @@
+"""
+飞书开放平台请求限流
+
+按接口类别（鉴权、文件上传、记录读写、批量接口）分别维护令牌桶，
+遇到限流响应时自适应降速，之后逐步恢复
+"""
+
+import time
+import asyncio
+import threading
+from typing import Optional, Dict, Any, Mapping
+
+
+# 各接口类别的默认速率（次/秒），可在FeishuClient中按需覆盖
+DEFAULT_RATE_LIMITS = {
+    "auth": 5.0,
+    "files": 5.0,
+    "records": 20.0,
+    "batch": 10.0,
+    "default": 10.0,
+}
+
+
+# 表示限流的业务错误码（HTTP状态码可能是200或400），同步和异步客户端共用：
+# 99991400 开放平台通用的请求频率超限；1254290 多维表格请求过快；
+# 1254291 多维表格同一数据表并发写冲突（同样需要降速后重试）
+RATE_LIMIT_CODES = frozenset({99991400, 1254290, 1254291})
+
+
+class FeishuRateLimitError(Exception):
+    """飞书接口限流，重试后仍未成功"""
+
+    def __init__(self, message: str, code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.code = code
+        self.retry_after = retry_after
+
+
+def endpoint_family(url: str) -> str:
+    """
+    根据请求地址判断接口类别
+
+    Args:
+        url: 请求地址
+
+    Returns:
+        接口类别：auth/files/batch/records/default
+    """
+    path = url.split("?", 1)[0]
+    if "/auth/" in path:
+        return "auth"
+    if "/im/v1/files" in path or "/drive/v1/medias" in path:
+        return "files"
+    if "/bitable/" in path:
+        if path.rsplit("/", 1)[-1].startswith("batch_"):
+            return "batch"
+        return "records"
+    return "default"
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    从响应头读取需要等待的秒数
+
+    飞书网关在限流时返回x-ogw-ratelimit-reset（距离配额重置的秒数），
+    也兼容标准的Retry-After
+    """
+    for name in ("x-ogw-ratelimit-reset", "Retry-After"):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class TokenBucket:
+    """令牌桶（线程安全），支持限流后自适应降速"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, min_rate: float = 0.5):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 目标速率（次/秒）
+            capacity: 桶容量（允许的突发请求数），默认等于速率
+            min_rate: 自适应降速的下限（次/秒）
+        """
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.min_rate = min(min_rate, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        预订一个令牌
+
+        Returns:
+            调用方需要等待的秒数（按预订顺序排队）
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def penalize(self, retry_after: Optional[float] = None):
+        """收到限流响应：速率减半，并在retry_after内暂停发放令牌"""
+        with self._lock:
+            now = time.monotonic()
+            self.rate = max(self.min_rate, self.rate * 0.5)
+            self.tokens = min(self.tokens, 0.0)
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self.blocked_until = max(self.blocked_until, now + pause)
+
+    def reward(self):
+        """请求成功：速率逐步恢复到目标值"""
+        with self._lock:
+            if self.rate < self.base_rate:
+                self.rate = min(self.base_rate, self.rate + self.base_rate * 0.05)
+
+
+class EndpointRateLimiter:
+    """按接口类别限流的调度器，可在多个客户端之间共享"""
+
+    def __init__(self, rate_limits: Optional[Dict[str, float]] = None):
+        """
+        初始化限流器
+
+        Args:
+            rate_limits: 各接口类别的速率（次/秒），未配置的类别使用DEFAULT_RATE_LIMITS
+        """
+        limits = dict(DEFAULT_RATE_LIMITS)
+        limits.update(rate_limits or {})
+        self.buckets = {family: TokenBucket(rate) for family, rate in limits.items()}
+
+        self._lock = threading.Lock()
+        self._stats = {
+            family: {"queue_depth": 0, "requests": 0, "waited": 0, "wait_time": 0.0,
+                     "max_wait": 0.0, "throttled": 0}
+            for family in self.buckets
+        }
+
+    def _bucket(self, family: str) -> TokenBucket:
+        return self.buckets.get(family) or self.buckets["default"]
+
+    def _begin(self, family: str) -> float:
+        family = family if family in self.buckets else "default"
+        wait = self._bucket(family).reserve()
+        with self._lock:
+            stats = self._stats[family]
+            stats["requests"] += 1
+            if wait > 0:
+                stats["queue_depth"] += 1
+                stats["waited"] += 1
+                stats["wait_time"] += wait
+                stats["max_wait"] = max(stats["max_wait"], wait)
+        return wait
+
+    def _end(self, family: str):
+        family = family if family in self.buckets else "default"
+        with self._lock:
+            self._stats[family]["queue_depth"] -= 1
+
+    def acquire(self, family: str) -> float:
+        """
+        获取一次请求许可（阻塞等待）
+
+        Returns:
+            实际等待的秒数
+        """
+        wait = self._begin(family)
+        if wait > 0:
+            try:
+                time.sleep(wait)
+            finally:
+                self._end(family)
+        return wait
+
+    async def acquire_async(self, family: str) -> float:
+        """获取一次请求许可（异步等待，不阻塞事件循环）"""
+        wait = self._begin(family)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._end(family)
+        return wait
+
+    def on_rate_limited(self, family: str, retry_after: Optional[float] = None):
+        """记录一次限流响应并降速"""
+        family = family if family in self.buckets else "default"
+        self._bucket(family).penalize(retry_after)
+        with self._lock:
+            self._stats[family]["throttled"] += 1
+
+    def on_success(self, family: str):
+        """记录一次成功请求"""
+        self._bucket(family).reward()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各接口类别的统计
+
+        Returns:
+            {类别: {rate: 当前速率, queue_depth: 正在排队的请求数, requests: 请求总数,
+                    waited: 需要等待的请求数, wait_time: 累计等待秒数,
+                    max_wait: 最长一次等待秒数, throttled: 收到限流响应次数}}
+        """
+        with self._lock:
+            result = {family: dict(stats) for family, stats in self._stats.items()}
+        for family, bucket in self.buckets.items():
+            result[family]["rate"] = bucket.rate
+        return result
@@ -0,0 +1,199 @@
+"""
+多维表格表结构缓存与本地字段校验
+
+表结构（字段名、字段类型）通过fields接口获取一次后按有效期缓存，
+写入前在本地检查字段是否存在、类型是否匹配，避免把注定失败的请求发出去
+"""
+
+import time
+import threading
+from typing import Optional, List, Dict, Any, Callable, Tuple
+
+
+# 飞书多维表格字段类型
+FIELD_TYPE_TEXT = 1
+FIELD_TYPE_NUMBER = 2
+FIELD_TYPE_SINGLE_SELECT = 3
+FIELD_TYPE_MULTI_SELECT = 4
+FIELD_TYPE_DATETIME = 5
+FIELD_TYPE_CHECKBOX = 7
+FIELD_TYPE_PHONE = 13
+FIELD_TYPE_URL = 15
+FIELD_TYPE_ATTACHMENT = 17
+FIELD_TYPE_SINGLE_LINK = 18
+FIELD_TYPE_DUPLEX_LINK = 21
+
+# 只读字段：查找引用、公式、创建/修改时间、创建/修改人、自动编号
+READ_ONLY_FIELD_TYPES = {19, 20, 1001, 1002, 1003, 1004, 1005}
+
+
+class FieldValidationError(Exception):
+    """字段数据与表结构不符"""
+
+    def __init__(self, message: str, errors: Optional[List[str]] = None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def _is_text(value: Any) -> bool:
+    # 文本字段也接受富文本分段格式 [{"type": "text", "text": ...}]
+    return isinstance(value, str) or (
+        isinstance(value, list) and all(isinstance(item, dict) and "text" in item for item in value)
+    )
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_str_list(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def _is_timestamp(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_attachment_list(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(item, dict) and item.get("file_token") for item in value)
+
+
+# 字段类型 → (值检查函数, 期望格式说明)
+FIELD_VALIDATORS: Dict[int, Tuple[Callable[[Any], bool], str]] = {
+    FIELD_TYPE_TEXT: (_is_text, "字符串"),
+    FIELD_TYPE_NUMBER: (_is_number, "数字"),
+    FIELD_TYPE_SINGLE_SELECT: (lambda value: isinstance(value, str), "字符串（选项名）"),
+    FIELD_TYPE_MULTI_SELECT: (_is_str_list, "字符串列表（选项名）"),
+    FIELD_TYPE_DATETIME: (_is_timestamp, "毫秒时间戳"),
+    FIELD_TYPE_CHECKBOX: (lambda value: isinstance(value, bool), "布尔值"),
+    FIELD_TYPE_PHONE: (lambda value: isinstance(value, str), "字符串"),
+    FIELD_TYPE_URL: (lambda value: isinstance(value, dict), "{\"link\": ..., \"text\": ...}"),
+    FIELD_TYPE_ATTACHMENT: (_is_attachment_list, "[{\"file_token\": ...}]"),
+    FIELD_TYPE_SINGLE_LINK: (_is_str_list, "记录ID列表"),
+    FIELD_TYPE_DUPLEX_LINK: (_is_str_list, "记录ID列表"),
+}
+
+
+class TableSchema:
+    """一张数据表的字段结构"""
+
+    def __init__(self, items: List[Dict[str, Any]]):
+        """
+        Args:
+            items: fields接口返回的字段列表（包含field_name、type等）
+        """
+        self.fields: Dict[str, Dict[str, Any]] = {item["field_name"]: item for item in items}
+        # 预先把每个字段的校验函数取出来，批量校验时不再重复查表
+        self._validators = {
+            name: FIELD_VALIDATORS.get(item.get("type")) for name, item in self.fields.items()
+        }
+
+    def field_type(self, field_name: str) -> Optional[int]:
+        """获取字段类型，字段不存在时返回None"""
+        item = self.fields.get(field_name)
+        return item.get("type") if item else None
+
+    def check(self, fields: Dict[str, Any]) -> List[str]:
+        """
+        检查字段数据
+
+        Args:
+            fields: 准备写入的字段字典
+
+        Returns:
+            问题列表，为空表示通过
+        """
+        errors = []
+        for name, value in fields.items():
+            if name not in self.fields:
+                errors.append(f"字段不存在: {name}")
+                continue
+            if self.fields[name].get("type") in READ_ONLY_FIELD_TYPES:
+                errors.append(f"字段为只读，不能写入: {name}")
+                continue
+            validator = self._validators[name]
+            if validator is not None and value is not None and not validator[0](value):
+                errors.append(f"字段类型不匹配: {name} 需要{validator[1]}，实际为{type(value).__name__}")
+        return errors
+
+    def validate(self, fields: Dict[str, Any]):
+        """
+        校验字段数据，不通过时抛出FieldValidationError
+
+        Args:
+            fields: 准备写入的字段字典
+        """
+        errors = self.check(fields)
+        if errors:
+            raise FieldValidationError(f"字段校验失败: {'; '.join(errors)}", errors)
+
+
+class SchemaCache:
+    """按table_id缓存表结构，超过有效期后重新获取（线程安全）"""
+
+    def __init__(self, ttl: float = 3600.0):
+        """
+        初始化缓存
+
+        Args:
+            ttl: 表结构有效期（秒）
+        """
+        self.ttl = ttl
+        self._items: Dict[str, Tuple[float, TableSchema]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, table_id: str, loader: Callable[[], List[Dict[str, Any]]]) -> TableSchema:
+        """
+        获取表结构，没有缓存或已过期时调用loader获取
+
+        Args:
+            table_id: 数据表ID
+            loader: 获取字段列表的函数
+
+        Returns:
+            表结构
+        """
+        schema = self.peek(table_id)
+        if schema is not None:
+            return schema
+
+        # 同一时间只有一个线程去拉取表结构
+        with self._lock:
+            schema = self.peek(table_id)
+            if schema is not None:
+                return schema
+
+            schema = TableSchema(loader())
+            self._items[table_id] = (time.monotonic() + self.ttl, schema)
+            return schema
+
+    def peek(self, table_id: str) -> Optional[TableSchema]:
+        """获取仍在有效期内的表结构，没有时返回None（不会发起请求）"""
+        entry = self._items.get(table_id)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def put(self, table_id: str, items: List[Dict[str, Any]]) -> TableSchema:
+        """
+        写入表结构（异步客户端自行获取字段列表后调用）
+
+        Args:
+            table_id: 数据表ID
+            items: fields接口返回的字段列表
+
+        Returns:
+            表结构
+        """
+        schema = TableSchema(items)
+        with self._lock:
+            self._items[table_id] = (time.monotonic() + self.ttl, schema)
+        return schema
+
+    def invalidate(self, table_id: Optional[str] = None):
+        """移除指定表（不传时移除全部）的表结构"""
+        with self._lock:
+            if table_id is None:
+                self._items.clear()
+            else:
+                self._items.pop(table_id, None)
@@ -0,0 +1,187 @@
+"""
+附件上传去重索引与分片上传断点
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional, Dict, Any, Set
+
+
+class UploadIndex:
+    """内容哈希到飞书file_token的持久化索引（SQLite）"""
+
+    def __init__(self, db_path: str):
+        """
+        初始化索引
+
+        Args:
+            db_path: SQLite文件路径（Vercel上应位于/tmp下）
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        # 单连接加锁，多线程共享；多进程之间依靠WAL模式并发访问
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS uploads (
+                    scope TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    file_token TEXT NOT NULL,
+                    size INTEGER,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (scope, content_hash)
+                )
+                """
+            )
+            # 分片上传会话和已确认的分片，上传中断后从断点继续
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunked_uploads (
+                    scope TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    upload_id TEXT NOT NULL,
+                    block_size INTEGER NOT NULL,
+                    block_num INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (scope, content_hash)
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunked_parts (
+                    upload_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    PRIMARY KEY (upload_id, seq)
+                )
+                """
+            )
+
+    def get(self, scope: str, content_hash: str) -> Optional[str]:
+        """
+        查询已上传内容的file_token
+
+        Args:
+            scope: 作用域（file_token只在同一应用下有效，通常传app_id）
+            content_hash: 文件内容哈希
+
+        Returns:
+            file_token，未上传过时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_token FROM uploads WHERE scope = ? AND content_hash = ?",
+                (scope, content_hash)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, scope: str, content_hash: str, file_token: str, size: Optional[int] = None):
+        """
+        记录一次成功的上传
+
+        Args:
+            scope: 作用域
+            content_hash: 文件内容哈希
+            file_token: 上传后得到的file_token
+            size: 文件大小（字节）
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (scope, content_hash, file_token, size, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (scope, content_hash, file_token, size, time.time())
+            )
+
+    def remove(self, scope: str, content_hash: str):
+        """删除一条记录（例如file_token已失效）"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM uploads WHERE scope = ? AND content_hash = ?",
+                (scope, content_hash)
+            )
+
+    def get_session(self, scope: str, content_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        查询未完成的分片上传会话
+
+        Args:
+            scope: 作用域
+            content_hash: 文件内容哈希
+
+        Returns:
+            {"upload_id", "block_size", "block_num", "size", "created_at"}，没有时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT upload_id, block_size, block_num, size, created_at FROM chunked_uploads "
+                "WHERE scope = ? AND content_hash = ?",
+                (scope, content_hash)
+            ).fetchone()
+        if not row:
+            return None
+        return dict(zip(("upload_id", "block_size", "block_num", "size", "created_at"), row))
+
+    def put_session(self, scope: str, content_hash: str, upload_id: str,
+                    block_size: int, block_num: int, size: int):
+        """
+        记录新的分片上传会话
+
+        Args:
+            scope: 作用域
+            content_hash: 文件内容哈希
+            upload_id: upload_prepare返回的上传ID
+            block_size: 分片大小（字节）
+            block_num: 分片数量
+            size: 文件大小（字节）
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunked_uploads "
+                "(scope, content_hash, upload_id, block_size, block_num, size, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (scope, content_hash, upload_id, block_size, block_num, size, time.time())
+            )
+
+    def mark_part(self, upload_id: str, seq: int):
+        """记录一个已被服务端确认的分片"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO chunked_parts (upload_id, seq) VALUES (?, ?)",
+                (upload_id, seq)
+            )
+
+    def acked_parts(self, upload_id: str) -> Set[int]:
+        """获取已确认的分片序号"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq FROM chunked_parts WHERE upload_id = ?", (upload_id,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def remove_session(self, scope: str, content_hash: str):
+        """删除分片上传会话及其分片记录（上传完成或会话失效时）"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT upload_id FROM chunked_uploads WHERE scope = ? AND content_hash = ?",
+                (scope, content_hash)
+            ).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM chunked_parts WHERE upload_id = ?", (row[0],))
+            self._conn.execute(
+                "DELETE FROM chunked_uploads WHERE scope = ? AND content_hash = ?",
+                (scope, content_hash)
+            )
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
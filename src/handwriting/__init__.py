@@ -2,7 +2,18 @@
 去手写模块
 """
 
-from .remover import HandwritingRemover
+from .remover import HandwritingRemover, HAS_OPENCV
+from .pillow_ink import PillowInkEngine
 
-__all__ = ["HandwritingRemover"]
+__all__ = ["HandwritingRemover", "PillowInkEngine"]
 
+# 颜色分离引擎依赖OpenCV，未安装时不导出；安装时也在首次访问时才加载
+if HAS_OPENCV:
+    __all__.append("ColorInkEngine")
+
+
+def __getattr__(name):
+    if name == "ColorInkEngine" and HAS_OPENCV:
+        from .color_ink import ColorInkEngine
+        return ColorInkEngine
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
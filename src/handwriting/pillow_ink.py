@@ -0,0 +1,187 @@
+"""
+只依赖Pillow的去手写引擎（Vercel部署时使用）
+
+思路与ColorInkEngine相同：估计纸面背景 → 找出比背景暗的墨迹 → 挑出蓝/红笔迹，
+并按笔画粗细补上同一笔画中颜色较淡的部分 → 用背景填充。所有运算都是Pillow的
+整图操作（point查找表、通道拆分、ImageChops、ImageFilter），在C层执行，没有逐像素
+的Python循环，也不依赖numpy/OpenCV。
+
+与OpenCV实现的差异（为了速度）：
+- 不转换HSV（Pillow的HSV转换比其余步骤加起来还慢），改用通道差判断颜色：
+  蓝色笔迹B明显高于R，红色笔迹R明显高于G和B，黑色印刷三个通道接近
+- Pillow的MaxFilter/MedianFilter是排序滤波，核越大越慢，最大值滤波改为
+  平移裁剪后逐次取较亮值（ImageChops.lighter），平滑改用BoxBlur
+"""
+
+from typing import Sequence, List
+
+from PIL import Image, ImageChops, ImageFilter
+
+
+# 支持识别的笔迹颜色
+INK_COLORS = ("blue", "red")
+
+
+def _threshold_lut(threshold: int) -> List[int]:
+    """大于threshold的取值映射为255，其余为0"""
+    return [255 if value > threshold else 0 for value in range(256)]
+
+
+def _max_filter(img: Image.Image, radius: int) -> Image.Image:
+    """
+    方形最大值滤波（灰度膨胀），窗口边长2*radius+1
+
+    先水平后垂直，每个方向把图片平移1..radius像素后取较亮值。crop超出边界的部分
+    填充为0，不影响最大值
+    """
+    width, height = img.size
+    result = img
+    for offset in range(1, radius + 1):
+        result = ImageChops.lighter(result, img.crop((offset, 0, width + offset, height)))
+        result = ImageChops.lighter(result, img.crop((-offset, 0, width - offset, height)))
+    rows = result
+    for offset in range(1, radius + 1):
+        result = ImageChops.lighter(result, rows.crop((0, offset, width, height + offset)))
+        result = ImageChops.lighter(result, rows.crop((0, -offset, width, height - offset)))
+    return result
+
+
+class PillowInkEngine:
+    """彩色笔迹检测与去除（纯Pillow实现）"""
+
+    def __init__(self, ink_delta: int = 40, min_chroma: int = 40,
+                 ink_colors: Sequence[str] = INK_COLORS,
+                 background_scale: int = 8, background_kernel: int = 7,
+                 grow_radius: int = 3, max_stroke_width: int = 12, normalize: bool = True):
+        """
+        初始化引擎
+
+        Args:
+            ink_delta: 比纸面背景暗多少（灰度）才算墨迹
+            min_chroma: 彩色笔迹的主色通道至少比其他通道高多少
+            ink_colors: 视为笔迹的颜色（blue/red）
+            background_scale: 估计背景时的缩小倍数
+            background_kernel: 缩小图上去除墨迹的最大值滤波核大小（奇数）
+            grow_radius: 从彩色笔迹向外补充同一笔画的范围（像素）
+            max_stroke_width: 补充部分允许的最大笔画宽度（像素），更粗的视为印刷内容
+            normalize: 是否校正光照（纸面统一为白色，保留印刷内容与局部纸面的深浅差）
+        """
+        unknown = set(ink_colors) - set(INK_COLORS)
+        if unknown:
+            raise ValueError(f"不支持的笔迹颜色: {', '.join(sorted(unknown))}")
+
+        self.ink_delta = ink_delta
+        self.min_chroma = min_chroma
+        self.ink_colors = tuple(ink_colors)
+        self.background_scale = background_scale
+        self.background_kernel = background_kernel
+        self.grow_radius = grow_radius
+        self.max_stroke_width = max_stroke_width
+        self.normalize = normalize
+
+        # 查找表只构建一次
+        self._ink_lut = _threshold_lut(ink_delta)
+        self._chroma_lut = _threshold_lut(min_chroma - 1)
+        self._any_lut = _threshold_lut(0)
+        # 在半分辨率上估计笔画宽度：宽度为w的直线穿过边长为2r+1的方框时，框内墨迹占比约为w/(2r+1)
+        self._stroke_radius = max(max_stroke_width // 4, 1)
+        self._thick_lut = _threshold_lut(int(255 * max_stroke_width / 2 / (2 * self._stroke_radius + 1) * 0.75))
+
+    @property
+    def halo(self) -> int:
+        """
+        分条处理时每条需要的上下重叠行数
+
+        背景估计的影响范围（缩小、最大值滤波、平滑、放大）加上笔画补充的范围，
+        按background_scale取整，保证各条的缩小网格与整图一致
+        """
+        reach = self.background_scale * (self.background_kernel // 2 + 4) + self.grow_radius + self.max_stroke_width + 1
+        return -(-reach // self.background_scale) * self.background_scale
+
+    def estimate_background(self, img: Image.Image) -> Image.Image:
+        """
+        估计纸面背景（光照不均时也随位置变化）
+
+        在缩小图上做最大值滤波去掉深色的印刷和笔迹，再平滑后放大回原尺寸
+
+        Args:
+            img: RGB图片
+
+        Returns:
+            与原图同尺寸的背景图
+        """
+        scale = self.background_scale if min(img.size) >= self.background_scale else 1
+        small = img.reduce(scale) if scale > 1 else img
+        small = _max_filter(small, self.background_kernel // 2)
+        small = small.filter(ImageFilter.BoxBlur(2))
+        # 按缩小倍数整倍放大（尺寸不是倍数时最后一格不完整），与分条处理时的网格一致
+        width, height = img.size
+        return small.resize(img.size, Image.BILINEAR, box=(0, 0, width / scale, height / scale))
+
+    def detect(self, img: Image.Image, background: Image.Image = None) -> Image.Image:
+        """
+        检测笔迹
+
+        Args:
+            img: RGB图片
+            background: estimate_background的结果（不传时自动估计）
+
+        Returns:
+            笔迹掩码（L模式，笔迹为255）
+        """
+        if background is None:
+            background = self.estimate_background(img)
+
+        # 墨迹：比局部纸面暗ink_delta以上
+        darkness = ImageChops.subtract(background.convert("L"), img.convert("L"))
+        ink = darkness.point(self._ink_lut)
+
+        # 彩色笔迹：墨迹中主色通道明显高于其他通道的部分
+        red, green, blue = img.split()
+        colored = None
+        for color in self.ink_colors:
+            if color == "blue":
+                chroma = ImageChops.subtract(blue, red)
+            else:
+                chroma = ImageChops.subtract(red, ImageChops.lighter(green, blue))
+            mask = chroma.point(self._chroma_lut)
+            colored = mask if colored is None else ImageChops.lighter(colored, mask)
+        if colored is None:
+            return Image.new("L", img.size, 0)
+        colored = ImageChops.multiply(colored, ink)
+
+        # 笔画宽度：圆珠笔笔画中心常接近黑色，单靠颜色会留下细黑线。
+        # 与彩色笔迹相邻、且笔画不比max_stroke_width粗的墨迹视为同一笔画
+        if self.grow_radius > 0:
+            near = _max_filter(colored, self.grow_radius)
+            half = ink.reduce(2)
+            thick = half.filter(ImageFilter.BoxBlur(self._stroke_radius)).point(self._thick_lut)
+            width, height = ink.size
+            thick = thick.resize(ink.size, Image.NEAREST, box=(0, 0, width / 2, height / 2))
+            thin = ImageChops.subtract(ink, thick)
+            colored = ImageChops.lighter(colored, ImageChops.multiply(near, thin))
+
+        # 覆盖笔画边缘抗锯齿的过渡像素
+        return _max_filter(colored, 1)
+
+    def process(self, img: Image.Image) -> Image.Image:
+        """
+        去除彩色笔迹
+
+        Args:
+            img: 图片（不会被修改）
+
+        Returns:
+            去除笔迹后的RGB图片
+        """
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        background = self.estimate_background(img)
+        mask = self.detect(img, background)
+
+        if self.normalize:
+            # 255 - (背景 - 像素)：纸面变为纯白；笔迹处取白色（掩码为255）
+            flattened = ImageChops.invert(ImageChops.subtract(background, img))
+            return ImageChops.lighter(flattened, Image.merge("RGB", (mask, mask, mask)))
+
+        return Image.composite(background, img, mask)
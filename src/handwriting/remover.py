@@ -2,31 +2,78 @@
 去手写处理
 """
 
-from typing import Optional
+import io
+import functools
+import importlib.util
+from typing import Optional, Union, List, Iterable, Iterator, Tuple
 from pathlib import Path
 
-# 尝试导入opencv，如果失败则使用Pillow作为替代
-try:
-    import cv2
-    import numpy as np
-    HAS_OPENCV = True
-except ImportError:
-    HAS_OPENCV = False
-    from PIL import Image
-    import io
+from PIL import Image, ImageOps
+
+from ..utils.image_buffer import ImageBuffer
+from ..utils.tiling import process_in_strips, STRIP_PIXELS
+from ..utils.batch import run_batch, BatchResult
+from .pillow_ink import PillowInkEngine
+
+# 只检测opencv是否可用，不在导入时加载（cv2和numpy加载较慢，只用Pillow引擎时不需要）
+HAS_OPENCV = (importlib.util.find_spec("cv2") is not None
+              and importlib.util.find_spec("numpy") is not None)
+
+
+# 去手写引擎：
+# - color：按颜色分离蓝/红笔迹并用纸面背景填充（需要OpenCV）
+# - morphology：灰度形态学开运算（早期实现，需要OpenCV）
+# - pillow：与color思路相同的纯Pillow实现（Vercel部署时使用）
+OPENCV_ENGINES = ("color", "morphology")
 
 
 class HandwritingRemover:
     """去手写处理类"""
     
-    def __init__(self):
-        """初始化去手写处理器"""
-        if not HAS_OPENCV:
-            import warnings
-            warnings.warn(
-                "opencv-python未安装，去手写功能将使用基础方法。"
-                "建议安装opencv-python以获得更好的效果，或使用外部图像处理API。"
-            )
+    def __init__(self, engine: str = "auto", max_strip_pixels: Optional[int] = STRIP_PIXELS):
+        """
+        初始化去手写处理器
+        
+        Args:
+            engine: 去手写引擎：auto/color/morphology/pillow（auto在安装了OpenCV时使用color）
+            max_strip_pixels: 超过该像素数的图片分条处理，每条（含重叠区域）不超过该像素数，
+                              内存占用不随图片增大；None或0表示始终整图处理
+        """
+        if engine == "auto":
+            engine = "color" if HAS_OPENCV else "pillow"
+        if engine not in OPENCV_ENGINES and engine != "pillow":
+            raise ValueError(f"不支持的去手写引擎: {engine}")
+        if engine in OPENCV_ENGINES and not HAS_OPENCV:
+            raise ValueError(f"去手写引擎{engine}需要安装opencv-python")
+        
+        self.engine = engine
+        self.max_strip_pixels = max_strip_pixels
+        if engine == "color":
+            from .color_ink import ColorInkEngine
+            self._ink_engine = ColorInkEngine()
+        elif engine == "pillow":
+            self._ink_engine = PillowInkEngine()
+        else:
+            self._ink_engine = None
+    
+    @staticmethod
+    def available_engines() -> List[str]:
+        """当前环境可用的去手写引擎"""
+        return (list(OPENCV_ENGINES) if HAS_OPENCV else []) + ["pillow"]
+    
+    @property
+    def uses_opencv(self) -> bool:
+        """当前引擎是否基于OpenCV"""
+        return self.engine in OPENCV_ENGINES
+    
+    @property
+    def halo(self) -> int:
+        """分条处理时每条的上下重叠行数（morphology只用到3×3开运算）"""
+        return self._ink_engine.halo if self._ink_engine is not None else 8
+    
+    def _tiled(self, width: int, height: int) -> bool:
+        """该尺寸的图片是否分条处理"""
+        return bool(self.max_strip_pixels) and width * height > self.max_strip_pixels
     
     def remove_handwriting(self, image_path: str, output_path: Optional[str] = None) -> str:
         """
@@ -37,21 +84,108 @@ class HandwritingRemover:
         Args:
             image_path: 输入图片路径
             output_path: 输出图片路径（可选）
-            
+        
         Returns:
             处理后的图片路径
         """
-        if HAS_OPENCV:
+        if self.uses_opencv:
             return self._remove_handwriting_opencv(image_path, output_path)
         else:
             # 使用Pillow的基础处理（效果有限）
             return self._remove_handwriting_pillow(image_path, output_path)
     
-    def _remove_handwriting_opencv(self, image_path: str, output_path: Optional[str] = None) -> str:
-        """使用OpenCV进行去手写处理"""
-        img = cv2.imread(image_path)
-        if img is None:
-            raise ValueError(f"无法读取图片: {image_path}")
+    def remove_handwriting_buffer(self, image: Union[str, bytes, ImageBuffer]) -> ImageBuffer:
+        """
+        去除图片的手写内容，结果保留在内存中（不写文件）
+        
+        传入ImageBuffer时复用其已解码的图片，与识别、哈希等环节共用一次解码
+        
+        Args:
+            image: 图片路径、图片内容或ImageBuffer
+        
+        Returns:
+            处理后的图片（保持原图格式，无法识别格式时为PNG）
+        """
+        buffer = ImageBuffer.coerce(image)
+        extension = _output_extension(buffer.extension)
+        if self.uses_opencv:
+            content = _encode_image(self.clean_array(buffer.array()), extension)
+        else:
+            content = _encode_image(self._clean_pillow(buffer.image()), extension)
+        
+        return ImageBuffer(content, name=f"cleaned_{Path(buffer.name).stem}{extension}")
+    
+    def remove_batch(self, images: Iterable[Union[str, bytes, ImageBuffer, "np.ndarray"]],
+                     workers: Optional[int] = None) -> Iterator[BatchResult]:
+        """
+        在进程池中批量去手写，按完成顺序返回结果
+        
+        已解码的图片通过共享内存传给子进程；单张图片出错不影响其他图片
+        
+        Args:
+            images: 图片路径、图片内容、ImageBuffer或BGR数组
+            workers: 进程数，默认为CPU核数（为1时在当前进程逐张处理）
+        
+        Yields:
+            BatchResult：index为图片在images中的序号；成功时result为处理后的图片
+            （ImageBuffer，与remove_handwriting_buffer相同），失败时error为错误信息
+        """
+        task = functools.partial(_remove_batch_item, self.engine, self.max_strip_pixels)
+        for item in run_batch(images, task, workers):
+            if item.ok:
+                content, name = item.result
+                item = item._replace(result=ImageBuffer(content, name=name))
+            yield item
+    
+    def remove_handwriting_bytes(self, content: bytes) -> bytes:
+        """
+        去除内存中图片的手写内容（不读写文件）
+        
+        Args:
+            content: 图片内容
+        
+        Returns:
+            处理后的图片内容
+        """
+        return self.remove_handwriting_buffer(content).data
+    
+    def clean_array(self, img: "np.ndarray", in_place: bool = False) -> "np.ndarray":
+        """
+        按当前引擎处理BGR数组
+        
+        大图分条处理（见max_strip_pixels），结果与整图处理一致
+        
+        Args:
+            img: BGR图片数组（与cv2.imread一致）
+            in_place: 允许把结果直接写回img（分条处理时省去一份整图大小的输出）；默认不修改输入
+        
+        Returns:
+            处理后的BGR图片数组
+        """
+        height, width = img.shape[:2]
+        if not self._tiled(width, height):
+            return self._clean_array(img)
+        
+        result = img if in_place else img.copy()
+        return process_in_strips(result, lambda strip, top: self._clean_array(strip),
+                                 self.halo, self.max_strip_pixels)
+    
+    def _clean_array(self, img: "np.ndarray") -> "np.ndarray":
+        """整图处理BGR数组（不修改输入）"""
+        if self.engine == "color":
+            return self._ink_engine.process(img)
+        if self.engine == "morphology":
+            return self._clean_opencv(img)
+        
+        import numpy as np
+        cleaned = self._clean_pillow(Image.fromarray(img[:, :, ::-1]))
+        return np.ascontiguousarray(np.asarray(cleaned.convert("RGB"))[:, :, ::-1])
+    
+    @staticmethod
+    def _clean_opencv(img: "np.ndarray") -> "np.ndarray":
+        """灰度形态学去手写（BGR进，BGR出）"""
+        import cv2
+        import numpy as np
         
         # 转换为灰度图
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
@@ -64,7 +198,29 @@ class HandwritingRemover:
         opened = cv2.morphologyEx(gray, cv2.MORPH_OPEN, kernel, iterations=1)
         
         # 将处理后的灰度图转换回BGR
-        result = cv2.cvtColor(opened, cv2.COLOR_GRAY2BGR)
+        return cv2.cvtColor(opened, cv2.COLOR_GRAY2BGR)
+    
+    def _clean_pillow(self, img: Image.Image, in_place: bool = False) -> Image.Image:
+        """Pillow去手写的图像处理部分（RGB出；in_place时允许把结果直接写回img）"""
+        if not self._tiled(*img.size):
+            return self._ink_engine.process(img)
+        
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        elif not in_place:
+            img = img.copy()
+        return process_in_strips(img, lambda strip, top: self._ink_engine.process(strip),
+                                 self.halo, self.max_strip_pixels)
+    
+    def _remove_handwriting_opencv(self, image_path: str, output_path: Optional[str] = None) -> str:
+        """使用OpenCV进行去手写处理"""
+        import cv2
+        
+        img = cv2.imread(image_path)
+        if img is None:
+            raise ValueError(f"无法读取图片: {image_path}")
+        
+        result = self.clean_array(img, in_place=True)
         
         # 保存结果
         if output_path is None:
@@ -74,18 +230,10 @@ class HandwritingRemover:
         return output_path
     
     def _remove_handwriting_pillow(self, image_path: str, output_path: Optional[str] = None) -> str:
-        """使用Pillow进行基础处理（Vercel部署时使用）"""
-        # 基础处理：增强对比度，减少手写痕迹
-        img = Image.open(image_path)
-        
-        # 转换为灰度图
-        if img.mode != 'L':
-            img = img.convert('L')
-        
-        # 增强对比度（简单方法）
-        from PIL import ImageEnhance
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(1.5)
+        """使用Pillow进行去手写处理（Vercel部署时使用）"""
+        with Image.open(image_path) as img:
+            ImageOps.exif_transpose(img, in_place=True)
+            img = self._clean_pillow(img, in_place=True)
         
         # 保存结果
         if output_path is None:
@@ -106,7 +254,7 @@ class HandwritingRemover:
         Args:
             image_path: 输入图片路径
             output_path: 输出图片路径（可选）
-            
+        
         Returns:
             处理后的图片路径
         """
@@ -116,3 +264,51 @@ class HandwritingRemover:
         # 临时使用基础方法
         return self.remove_handwriting(image_path, output_path)
 
+
+def _output_extension(extension: str) -> str:
+    """处理结果的扩展名：JPEG保持为.jpg，其余格式输出为.png"""
+    extension = extension.lower()
+    if extension == ".jpeg":
+        return ".jpg"
+    return extension if extension in (".jpg", ".png") else ".png"
+
+
+def _encode_image(img: Union[Image.Image, "np.ndarray"], extension: str) -> bytes:
+    """把处理结果（PIL图片或BGR数组）编码为extension对应的格式"""
+    if not isinstance(img, Image.Image):
+        if HAS_OPENCV:
+            import cv2
+            ok, encoded = cv2.imencode(extension, img)
+            if not ok:
+                raise ValueError("图片编码失败")
+            return encoded.tobytes()
+        img = Image.fromarray(img[:, :, ::-1])
+    
+    output = io.BytesIO()
+    img.save(output, format="JPEG" if extension == ".jpg" else "PNG")
+    return output.getvalue()
+
+
+@functools.lru_cache(maxsize=None)
+def _batch_remover(engine: str, max_strip_pixels: Optional[int]) -> HandwritingRemover:
+    """子进程中复用的去手写处理器"""
+    return HandwritingRemover(engine=engine, max_strip_pixels=max_strip_pixels)
+
+
+def _remove_batch_item(engine: str, max_strip_pixels: Optional[int], image, name: str) -> Tuple[bytes, str]:
+    """
+    批量去手写中的单张处理（在子进程中执行）
+    
+    Returns:
+        (处理后的图片内容, 文件名)
+    """
+    remover = _batch_remover(engine, max_strip_pixels)
+    if isinstance(image, (str, bytes)):
+        with ImageBuffer.coerce(image, name=name) as buffer:
+            result = remover.remove_handwriting_buffer(buffer)
+        return result.data, result.name
+    
+    # 共享内存中的数组：直接原地处理
+    extension = _output_extension(Path(name).suffix)
+    cleaned = remover.clean_array(image, in_place=True)
+    return _encode_image(cleaned, extension), f"cleaned_{Path(name).stem}{extension}"
@@ -4,6 +4,8 @@
 
 from .doubao import DoubaoOCR
 from .processor import ImageProcessor
+from .models import QuestionAnalysis, RecognitionResult
+from .cache import OCRResultCache
 
-__all__ = ["DoubaoOCR", "ImageProcessor"]
+__all__ = ["DoubaoOCR", "ImageProcessor", "QuestionAnalysis", "RecognitionResult", "OCRResultCache"]
 
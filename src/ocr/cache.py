@@ -0,0 +1,150 @@
+"""
+识别/分析结果缓存
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Optional, Dict, Any
+
+
+class OCRResultCache:
+    """
+    按"图片内容哈希 + 模型 + 提示词版本"缓存模型返回结果的持久化缓存（SQLite）
+
+    条目超过有效期后失效，总数超过上限时淘汰最久未使用的条目
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 5000, ttl: float = 30 * 24 * 3600):
+        """
+        初始化缓存
+
+        Args:
+            db_path: SQLite文件路径（Vercel上应位于/tmp下）
+            max_entries: 最多保留的条目数
+            ttl: 条目有效期（秒）
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # 缓存丢失最近几次写入可以接受，换取每次命中更新访问时间时不必等待落盘
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ocr_results (
+                    cache_key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ocr_results_accessed ON ocr_results (accessed_at)"
+            )
+
+    @staticmethod
+    def make_key(content_hash: str, model: str, prompt_version: str, encoding: Optional[str] = None) -> str:
+        """
+        生成缓存键
+
+        Args:
+            content_hash: 图片内容哈希
+            model: 模型名称
+            prompt_version: 提示词版本（修改提示词时更新版本号，旧结果自然失效）
+            encoding: 图片发送前的编码参数（缩放上限、格式、质量），参数不同时模型看到的图片不同
+        """
+        key = f"{content_hash}:{model}:{prompt_version}"
+        return f"{key}:{encoding}" if encoding else key
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存结果
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存的结果，未命中或已过期时返回None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM ocr_results WHERE cache_key = ?", (key,)
+            ).fetchone()
+
+            if row is None or row[1] + self.ttl < now:
+                if row is not None:
+                    with self._conn:
+                        self._conn.execute("DELETE FROM ocr_results WHERE cache_key = ?", (key,))
+                self.misses += 1
+                return None
+
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE ocr_results SET accessed_at = ? WHERE cache_key = ?", (now, key)
+                )
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """
+        写入结果
+
+        Args:
+            key: 缓存键
+            result: 可JSON序列化的结果
+        """
+        now = time.time()
+        payload = json.dumps(result, ensure_ascii=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_results (cache_key, payload, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, payload, now, now)
+            )
+            # 超过上限时按最久未使用淘汰
+            self._conn.execute(
+                "DELETE FROM ocr_results WHERE cache_key IN ("
+                "SELECT cache_key FROM ocr_results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM ocr_results")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            {hits: 命中次数, misses: 未命中次数, hit_rate: 命中率, entries: 当前条目数}
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM ocr_results").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": entries
+            }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -2,56 +2,293 @@
 豆包API图片识别集成
 """
 
+import re
+import json
+import hashlib
+import mimetypes
 import requests
 import base64
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple, Union, Iterator
 from pathlib import Path
 
+from pydantic import ValidationError
+
+from .models import RecognitionResult
+from .processor import ImageProcessor, MODEL_IMAGE_MAX_EDGE
+from .cache import OCRResultCache
+from ..utils.image_buffer import ImageBuffer
+from ..utils.streaming import stream_chat_completion
+
+
+# 题目分析使用的文本模型
+ANALYZE_MODEL = "doubao-pro-4k"
+
+# 提示词版本，作为结果缓存键的一部分。修改对应提示词时需要同步更新
+RECOGNIZE_PROMPT_VERSION = "recognize-v1"
+ANALYZE_PROMPT_VERSION = "analyze-v1"
+RECOGNIZE_AND_ANALYZE_PROMPT_VERSION = "recognize-analyze-v1"
+
+
+# 识别与分析合并为一次调用时的提示词
+RECOGNIZE_AND_ANALYZE_PROMPT = """请识别这张图片中的题目内容，并分析题目。如果是数学题，请保留所有数学符号和公式。
+
+只返回一个JSON对象，不要包含其他内容，格式如下：
+{
+    "question_text": "完整的题目文本",
+    "analysis": {
+        "subject": "科目（数学/语文/英语/物理/化学/生物/历史/地理/政治）",
+        "grade": "年级（一年级/二年级/.../高三）",
+        "knowledge_points": ["知识点1", "知识点2"],
+        "question_type": "题目类型（选择题/填空题/解答题等）",
+        "difficulty": "难度等级（简单/中等/困难）"
+    }
+}"""
+
 
 class DoubaoOCR:
     """豆包OCR识别类"""
     
-    def __init__(self, api_key: str, api_url: Optional[str] = None):
+    def __init__(self, api_key: str, api_url: Optional[str] = None,
+                 max_image_edge: int = MODEL_IMAGE_MAX_EDGE, image_format: str = "JPEG",
+                 image_quality: int = 85, cache: Optional[OCRResultCache] = None):
         """
         初始化豆包OCR
         
         Args:
             api_key: 豆包API密钥
             api_url: API地址（可选）
+            max_image_edge: 上传前图片长边的上限（像素），为0时上传原图
+            image_format: 上传前重新编码的格式：JPEG/WEBP
+            image_quality: 重新编码的质量（1-95）
+            cache: 识别/分析结果缓存（可选），相同图片和提示词不再重复调用模型
         """
         self.api_key = api_key
+        self.max_image_edge = max_image_edge
+        self.image_format = image_format
+        self.image_quality = image_quality
+        self.cache = cache
         self.api_url = api_url or "https://ark.cn-beijing.volces.com/api/v3"
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
     
-    def _encode_image(self, image_path: str) -> str:
+    def _encode_image(self, image_path: Union[str, bytes, ImageBuffer]) -> Tuple[str, str]:
+        """
+        将图片缩放、压缩后编码为base64
+        
+        Args:
+            image_path: 图片路径、图片内容或ImageBuffer
+            
+        Returns:
+            (base64编码的图片字符串, MIME类型)
+        """
+        buffer = ImageBuffer.coerce(image_path)
+        if self.max_image_edge:
+            content, mime_type = ImageProcessor.encode_for_model(
+                buffer, max_edge=self.max_image_edge,
+                image_format=self.image_format, quality=self.image_quality
+            )
+        else:
+            content = buffer.tobytes()
+            guess_name = buffer.path or f"image{buffer.extension}"
+            mime_type = mimetypes.guess_type(guess_name)[0] or "image/jpeg"
+        return base64.b64encode(content).decode('utf-8'), mime_type
+    
+    def _image_data_url(self, image_path: Union[str, bytes, ImageBuffer]) -> str:
+        """生成请求中使用的data URL"""
+        image_base64, mime_type = self._encode_image(image_path)
+        return f"data:{mime_type};base64,{image_base64}"
+    
+    def _image_cache_key(self, image_path: Union[str, bytes, ImageBuffer], model: str,
+                         prompt_version: str) -> Optional[str]:
+        """按图片内容和编码参数生成缓存键，未配置缓存时返回None"""
+        if self.cache is None:
+            return None
+        if self.max_image_edge:
+            encoding = f"{self.image_format.upper()}-{self.max_image_edge}-q{self.image_quality}"
+        else:
+            encoding = "original"
+        return OCRResultCache.make_key(ImageBuffer.coerce(image_path).sha256, model, prompt_version, encoding)
+    
+    def _text_cache_key(self, text: str, model: str, prompt_version: str) -> Optional[str]:
+        """按文本内容生成缓存键（题目分析的输入是题目文本），未配置缓存时返回None"""
+        if self.cache is None:
+            return None
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return OCRResultCache.make_key(content_hash, model, prompt_version)
+    
+    def _cached_result(self, key: Optional[str], use_cache: bool) -> Optional[Dict[str, Any]]:
+        """读取缓存结果，未命中时返回None"""
+        if key is None or not use_cache:
+            return None
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        return {"success": True, **cached, "cached": True, "raw_response": None}
+    
+    def _store_result(self, key: Optional[str], result: Dict[str, Any]):
+        """写入缓存（缓存写入失败不影响识别结果）"""
+        if key is None:
+            return
+        try:
+            self.cache.put(key, result)
+        except Exception:
+            pass
+    
+    @staticmethod
+    def _extract_json(text: str) -> Any:
+        """
+        从模型回复中解析JSON（兼容```json代码块包裹和前后多余文字）
+        
+        Args:
+            text: 模型回复内容
+            
+        Returns:
+            解析后的对象
+        """
+        match = re.search(r"```(?:json)?\s*(.*?)```", text, re.S)
+        if match:
+            text = match.group(1)
+        start, end = text.find("{"), text.rfind("}")
+        if start != -1 and end > start:
+            text = text[start:end + 1]
+        return json.loads(text)
+    
+    def recognize_and_analyze(self, image_path: Union[str, bytes, ImageBuffer], model: str = "doubao-vision-128k",
+                              use_cache: bool = True) -> Dict[str, Any]:
         """
-        将图片编码为base64
+        一次调用视觉模型，同时完成题目识别和分析
+        
+        模型按约定返回JSON，经RecognitionResult校验后使用。校验不通过时退回到
+        recognize_question + analyze_question两次调用（合并结果中题目文本可用时只补做分析）。
         
         Args:
-            image_path: 图片路径
+            image_path: 图片路径、图片内容或ImageBuffer
+            model: 使用的视觉模型名称
+            use_cache: 是否读取结果缓存（为False时本次强制调用模型，并用新结果刷新缓存）
             
         Returns:
-            base64编码的图片字符串
+            识别结果，包含：
+            - success: 是否成功
+            - question_text: 题目文本
+            - analysis: 分析结果（科目、年级、知识点等），分析失败时为空字典
+            - mode: combined（一次调用完成）/fallback（退回两次调用）
+            - cached: 是否来自缓存
         """
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+        # 退回两次调用时复用同一份图片内容和编码结果
+        image_path = ImageBuffer.coerce(image_path)
+        cache_key = self._image_cache_key(image_path, model, RECOGNIZE_AND_ANALYZE_PROMPT_VERSION)
+        cached = self._cached_result(cache_key, use_cache)
+        if cached is not None:
+            return cached
+        
+        image_url = self._image_data_url(image_path)
+        url = f"{self.api_url}/chat/completions"
+        
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_url
+                        }
+                    },
+                    {
+                        "type": "text",
+                        "text": RECOGNIZE_AND_ANALYZE_PROMPT
+                    }
+                ]
+            }
+        ]
+        
+        data = {
+            "model": model,
+            "messages": messages,
+            "temperature": 0.1
+        }
+        
+        question_text = None
+        raw_response = None
+        try:
+            response = requests.post(url, json=data, headers=self.headers, timeout=30)
+            response.raise_for_status()
+            raw_response = response.json()
+            content = raw_response["choices"][0]["message"]["content"]
+            
+            payload = self._extract_json(content)
+            if isinstance(payload, dict) and isinstance(payload.get("question_text"), str):
+                question_text = payload["question_text"].strip() or None
+            
+            result = RecognitionResult.model_validate(payload)
+            output = {
+                "question_text": result.question_text,
+                "analysis": result.analysis.model_dump(),
+                "mode": "combined"
+            }
+            self._store_result(cache_key, output)
+            return {"success": True, **output, "raw_response": raw_response}
+        except (KeyError, IndexError, TypeError, ValueError, ValidationError):
+            # 返回格式不符合约定，退回两次调用
+            pass
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "raw_response": raw_response
+            }
+        
+        result = self._recognize_and_analyze_fallback(image_path, model, question_text, use_cache)
+        if result["success"] and result["analysis"]:
+            self._store_result(cache_key, {key: result[key] for key in ("question_text", "analysis", "mode")})
+        return result
+    
+    def _recognize_and_analyze_fallback(self, image_path: Union[str, bytes, ImageBuffer], model: str,
+                                        question_text: Optional[str] = None,
+                                        use_cache: bool = True) -> Dict[str, Any]:
+        """分两次调用完成识别和分析（已有题目文本时跳过识别）"""
+        if not question_text:
+            recognize_result = self.recognize_question(image_path, model=model, use_cache=use_cache)
+            if not recognize_result["success"]:
+                return recognize_result
+            question_text = recognize_result["question_text"]
+        
+        analysis_result = self.analyze_question(image_path, question_text, use_cache=use_cache)
+        return {
+            "success": True,
+            "question_text": question_text,
+            "analysis": analysis_result["analysis"] if analysis_result["success"] else {},
+            "analysis_error": None if analysis_result["success"] else analysis_result.get("error"),
+            "mode": "fallback",
+            "raw_response": analysis_result.get("raw_response")
+        }
     
-    def recognize_question(self, image_path: str, model: str = "doubao-vision-128k") -> Dict[str, Any]:
+    def recognize_question(self, image_path: Union[str, bytes, ImageBuffer], model: str = "doubao-vision-128k",
+                           use_cache: bool = True,
+                           stream: bool = False) -> Union[Dict[str, Any], Iterator[str]]:
         """
         识别题目内容
         
         Args:
-            image_path: 图片路径
+            image_path: 图片路径、图片内容或ImageBuffer
             model: 使用的模型名称
+            use_cache: 是否读取结果缓存（为False时本次强制调用模型，并用新结果刷新缓存）
+            stream: 是否流式返回题目文本
             
         Returns:
-            识别结果，包含题目文本等信息
+            识别结果，包含题目文本等信息；stream=True时返回题目文本片段的迭代器
+            （命中缓存时一次产出完整文本，请求失败时抛出异常）
         """
+        image_path = ImageBuffer.coerce(image_path)
+        cache_key = self._image_cache_key(image_path, model, RECOGNIZE_PROMPT_VERSION)
+        cached = self._cached_result(cache_key, use_cache)
+        if cached is not None:
+            return iter([cached["question_text"]]) if stream else cached
+        
         # 编码图片
-        image_base64 = self._encode_image(image_path)
+        image_url = self._image_data_url(image_path)
         
         # 构建请求
         url = f"{self.api_url}/chat/completions"
@@ -64,7 +301,7 @@ class DoubaoOCR:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_base64}"
+                            "url": image_url
                         }
                     },
                     {
@@ -81,6 +318,9 @@ class DoubaoOCR:
             "temperature": 0.1
         }
         
+        if stream:
+            return self._stream_recognize(url, data, cache_key)
+        
         try:
             response = requests.post(url, json=data, headers=self.headers, timeout=30)
             response.raise_for_status()
@@ -89,6 +329,7 @@ class DoubaoOCR:
             # 提取识别结果
             if "choices" in result and len(result["choices"]) > 0:
                 question_text = result["choices"][0]["message"]["content"]
+                self._store_result(cache_key, {"question_text": question_text})
                 
                 return {
                     "success": True,
@@ -109,24 +350,45 @@ class DoubaoOCR:
                 "raw_response": None
             }
     
-    def analyze_question(self, image_path: str, question_text: Optional[str] = None) -> Dict[str, Any]:
+    def _stream_recognize(self, url: str, data: Dict[str, Any], cache_key: Optional[str]) -> Iterator[str]:
+        """流式识别题目，全部接收完后写入缓存"""
+        parts = []
+        try:
+            for chunk in stream_chat_completion(url, data, self.headers, timeout=30):
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            raise Exception(f"识别题目失败: {e}")
+        
+        if not parts:
+            raise Exception("识别题目失败: 未获取到识别结果")
+        self._store_result(cache_key, {"question_text": "".join(parts)})
+    
+    def analyze_question(self, image_path: Union[str, bytes, ImageBuffer], question_text: Optional[str] = None,
+                         use_cache: bool = True) -> Dict[str, Any]:
         """
         分析题目，提取科目、知识点等信息
         
         Args:
-            image_path: 图片路径
+            image_path: 图片路径、图片内容或ImageBuffer
             question_text: 题目文本（如果已识别）
+            use_cache: 是否读取结果缓存（为False时本次强制调用模型，并用新结果刷新缓存）
             
         Returns:
             分析结果，包含科目、知识点、难度等
         """
         if not question_text:
             # 先识别题目
-            recognize_result = self.recognize_question(image_path)
+            recognize_result = self.recognize_question(image_path, use_cache=use_cache)
             if not recognize_result["success"]:
                 return recognize_result
             question_text = recognize_result["question_text"]
         
+        cache_key = self._text_cache_key(question_text, ANALYZE_MODEL, ANALYZE_PROMPT_VERSION)
+        cached = self._cached_result(cache_key, use_cache)
+        if cached is not None:
+            return cached
+        
         # 分析题目
         url = f"{self.api_url}/chat/completions"
         
@@ -155,7 +417,7 @@ class DoubaoOCR:
         ]
         
         data = {
-            "model": "doubao-pro-4k",
+            "model": ANALYZE_MODEL,
             "messages": messages,
             "temperature": 0.1,
             "response_format": {"type": "json_object"}
@@ -168,8 +430,8 @@ class DoubaoOCR:
             
             if "choices" in result and len(result["choices"]) > 0:
                 analysis_text = result["choices"][0]["message"]["content"]
-                import json
                 analysis = json.loads(analysis_text)
+                self._store_result(cache_key, {"analysis": analysis})
                 
                 return {
                     "success": True,
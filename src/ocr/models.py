@@ -0,0 +1,23 @@
+"""
+图片识别结果模型
+"""
+
+from typing import Optional, List
+from pydantic import BaseModel, Field
+
+
+class QuestionAnalysis(BaseModel):
+    """题目分析结果"""
+
+    subject: str = Field(..., min_length=1, description="科目：数学/语文/英语等")
+    grade: Optional[str] = Field(None, description="年级")
+    knowledge_points: List[str] = Field(default_factory=list, description="主要知识点（2-5个）")
+    question_type: Optional[str] = Field(None, description="题目类型：选择题/填空题/解答题等")
+    difficulty: Optional[str] = Field(None, description="难度等级：简单/中等/困难")
+
+
+class RecognitionResult(BaseModel):
+    """识别与分析合并返回的结果"""
+
+    question_text: str = Field(..., min_length=1, description="完整的题目文本")
+    analysis: QuestionAnalysis = Field(..., description="题目分析结果")
@@ -2,10 +2,17 @@
 图片处理工具
 """
 
-from PIL import Image
-from typing import Tuple, Optional
+import io
+import functools
+import mimetypes
+from PIL import Image, ImageOps
+from typing import Tuple, Optional, List, Union, Iterable, Iterator
 from pathlib import Path
 
+from ..utils.image_buffer import ImageBuffer
+from ..utils.tiling import process_in_strips, STRIP_PIXELS
+from ..utils.batch import run_batch, BatchResult
+
 # 尝试导入opencv，如果失败则只使用Pillow
 try:
     import cv2
@@ -15,42 +22,56 @@ except ImportError:
     HAS_OPENCV = False
 
 
+# 视觉模型输入图片的默认长边上限（像素）。模型端会把更大的图片缩放到这个量级，
+# 传更大的图只会增加上传时间，不会提高识别效果
+MODEL_IMAGE_MAX_EDGE = 1600
+
+# 预处理参数：CLAHE对比度增强、非局部均值降噪
+CLAHE_CLIP_LIMIT = 2.0
+CLAHE_GRID = (8, 8)
+DENOISE_STRENGTH = 10
+DENOISE_TEMPLATE_WINDOW = 7
+DENOISE_SEARCH_WINDOW = 21
+
+# 重新编码支持的格式及对应的MIME类型
+ENCODE_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+
 class ImageProcessor:
     """图片处理类"""
     
     @staticmethod
-    def preprocess_image(image_path: str, output_path: Optional[str] = None) -> str:
+    def preprocess_image(image_path: str, output_path: Optional[str] = None,
+                         max_strip_pixels: Optional[int] = STRIP_PIXELS) -> str:
         """
         预处理图片（调整大小、增强对比度等）
         
         Args:
             image_path: 输入图片路径
             output_path: 输出图片路径（可选）
+            max_strip_pixels: 超过该像素数的图片分条处理，内存占用不随图片增大；None或0表示始终整图处理
             
         Returns:
             处理后的图片路径
         """
         if HAS_OPENCV:
-            return ImageProcessor._preprocess_opencv(image_path, output_path)
+            return ImageProcessor._preprocess_opencv(image_path, output_path, max_strip_pixels)
         else:
-            return ImageProcessor._preprocess_pillow(image_path, output_path)
+            return ImageProcessor._preprocess_pillow(image_path, output_path, max_strip_pixels)
     
     @staticmethod
-    def _preprocess_opencv(image_path: str, output_path: Optional[str] = None) -> str:
+    def _preprocess_opencv(image_path: str, output_path: Optional[str] = None,
+                           max_strip_pixels: Optional[int] = STRIP_PIXELS) -> str:
         """使用OpenCV预处理"""
-        img = cv2.imread(image_path)
-        if img is None:
+        # 直接解码为灰度图（不分配彩色图）
+        gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
             raise ValueError(f"无法读取图片: {image_path}")
         
-        # 转换为灰度图
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # 增强对比度
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(gray)
-        
-        # 降噪
-        denoised = cv2.fastNlMeansDenoising(enhanced, None, 10, 7, 21)
+        denoised = ImageProcessor._preprocess_gray(gray, max_strip_pixels)
         
         # 保存
         if output_path is None:
@@ -60,25 +81,165 @@ class ImageProcessor:
         return output_path
     
     @staticmethod
-    def _preprocess_pillow(image_path: str, output_path: Optional[str] = None) -> str:
+    def _preprocess_gray(gray: "np.ndarray", max_strip_pixels: Optional[int] = STRIP_PIXELS) -> "np.ndarray":
+        """灰度图的对比度增强和降噪（分条处理时结果直接写回gray）"""
+        if max_strip_pixels and gray.size > max_strip_pixels:
+            # 大图分条：先按整图的网格统计CLAHE查找表，再逐条映射、降噪，结果写回gray
+            luts, tile_size = _clahe_luts(gray, CLAHE_CLIP_LIMIT, CLAHE_GRID, max_strip_pixels)
+            halo = DENOISE_SEARCH_WINDOW // 2 + DENOISE_TEMPLATE_WINDOW // 2
+            denoised = process_in_strips(
+                gray,
+                lambda strip, top: cv2.fastNlMeansDenoising(
+                    _clahe_apply(strip, top, luts, tile_size), None,
+                    DENOISE_STRENGTH, DENOISE_TEMPLATE_WINDOW, DENOISE_SEARCH_WINDOW),
+                halo=-(-halo // 8) * 8, max_pixels=max_strip_pixels
+            )
+        else:
+            # 增强对比度
+            clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=CLAHE_GRID)
+            enhanced = clahe.apply(gray)
+            
+            # 降噪
+            denoised = cv2.fastNlMeansDenoising(enhanced, None, DENOISE_STRENGTH,
+                                                DENOISE_TEMPLATE_WINDOW, DENOISE_SEARCH_WINDOW)
+        return denoised
+    
+    @staticmethod
+    def _preprocess_pillow(image_path: str, output_path: Optional[str] = None,
+                           max_strip_pixels: Optional[int] = STRIP_PIXELS) -> str:
         """使用Pillow预处理（Vercel部署时使用）"""
         img = Image.open(image_path)
+        # JPEG直接解码为灰度图
+        img.draft('L', img.size)
+        img = ImageProcessor._preprocess_pillow_image(img, max_strip_pixels)
+        
+        # 保存
+        if output_path is None:
+            output_path = str(Path(image_path).parent / f"processed_{Path(image_path).name}")
         
+        img.save(output_path)
+        return output_path
+    
+    @staticmethod
+    def _preprocess_pillow_image(img: Image.Image, max_strip_pixels: Optional[int] = STRIP_PIXELS) -> Image.Image:
+        """Pillow的灰度转换和对比度增强（分条处理时结果直接写回灰度图）"""
         # 转换为灰度图
         if img.mode != 'L':
             img = img.convert('L')
         
         # 增强对比度
-        from PIL import ImageEnhance
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(1.3)
+        if max_strip_pixels and img.width * img.height > max_strip_pixels:
+            # 大图分条：与ImageEnhance.Contrast相同，以整图均值为中心拉伸，结果写回img
+            from PIL import ImageStat
+            mean = int(ImageStat.Stat(img).mean[0] + 0.5)
+            img = process_in_strips(
+                img, lambda strip, top: Image.blend(Image.new('L', strip.size, mean), strip, 1.3),
+                max_pixels=max_strip_pixels
+            )
+        else:
+            from PIL import ImageEnhance
+            enhancer = ImageEnhance.Contrast(img)
+            img = enhancer.enhance(1.3)
+        return img
+    
+    @staticmethod
+    def preprocess_batch(images: Iterable[Union[str, bytes, ImageBuffer, "np.ndarray"]],
+                         workers: Optional[int] = None,
+                         max_strip_pixels: Optional[int] = STRIP_PIXELS) -> Iterator[BatchResult]:
+        """
+        在进程池中批量预处理，按完成顺序返回结果
         
-        # 保存
-        if output_path is None:
-            output_path = str(Path(image_path).parent / f"processed_{Path(image_path).name}")
+        已解码的图片通过共享内存传给子进程；单张图片出错不影响其他图片
         
-        img.save(output_path)
-        return output_path
+        Args:
+            images: 图片路径、图片内容、ImageBuffer或BGR数组
+            workers: 进程数，默认为CPU核数（为1时在当前进程逐张处理）
+            max_strip_pixels: 见preprocess_image
+        
+        Yields:
+            BatchResult：index为图片在images中的序号；成功时result为预处理后的图片
+            （ImageBuffer，文件名为processed_原文件名），失败时error为错误信息
+        """
+        task = functools.partial(_preprocess_batch_item, max_strip_pixels)
+        for item in run_batch(images, task, workers):
+            if item.ok:
+                content, name = item.result
+                item = item._replace(result=ImageBuffer(content, name=name))
+            yield item
+    
+    @staticmethod
+    def encode_for_model(image_path: Union[str, bytes, ImageBuffer], max_edge: int = MODEL_IMAGE_MAX_EDGE,
+                         image_format: str = "JPEG", quality: int = 85) -> Tuple[bytes, str]:
+        """
+        把图片编码为适合上传给视觉模型的大小和格式
+        
+        按EXIF方向摆正，长边缩放到max_edge以内，再按指定格式和质量重新编码。
+        图片本身已经是目标格式、无需旋转和缩放时直接使用原内容，避免二次压缩。
+        无法解码的文件原样返回，并按文件头推断MIME类型。
+        传入ImageBuffer时复用已解码的图片，编码结果缓存在ImageBuffer中。
+        
+        Args:
+            image_path: 图片路径、图片内容或ImageBuffer
+            max_edge: 长边上限（像素）
+            image_format: 输出格式：JPEG/WEBP
+            quality: 编码质量（1-95）
+            
+        Returns:
+            (图片字节, MIME类型)
+        """
+        image_format = image_format.upper()
+        if image_format not in ENCODE_MIME_TYPES:
+            raise ValueError(f"不支持的编码格式: {image_format}")
+        
+        buffer = ImageBuffer.coerce(image_path)
+        return buffer.encoding(
+            ("model", image_format, max_edge, quality),
+            lambda b: ImageProcessor._encode_for_model(b, max_edge, image_format, quality)
+        )
+    
+    @staticmethod
+    def _encode_for_model(buffer: ImageBuffer, max_edge: int, image_format: str, quality: int) -> Tuple[bytes, str]:
+        try:
+            source_format, size, orientation = buffer.header()
+            needs_resize = max(size) > max_edge
+            if source_format == image_format and orientation == 1 and not needs_resize:
+                return buffer.tobytes(), ENCODE_MIME_TYPES[image_format]
+            
+            if buffer.decoded:
+                # 已经解码过（例如去手写也要用到）时直接缩放，不再解码
+                img = buffer.image()
+                if needs_resize:
+                    img = ImageOps.contain(img, (max_edge, max_edge), Image.LANCZOS)
+            else:
+                img = buffer.open()
+                # JPEG可以在解码时直接按1/2、1/4、1/8缩小，大图解码更快、占用内存更少
+                if source_format == "JPEG" and needs_resize:
+                    img.draft("RGB", (max_edge, max_edge))
+                img = ImageOps.exif_transpose(img)
+                if needs_resize:
+                    img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            if buffer.path is not None:
+                mime_type = mimetypes.guess_type(buffer.path)[0]
+            else:
+                mime_type = mimetypes.guess_type(f"image{buffer.extension}")[0]
+            return buffer.tobytes(), mime_type or "image/jpeg"
+        
+        # JPEG不支持透明通道，透明部分铺白底（试卷背景为白色）
+        if image_format == "JPEG" and img.mode != "RGB":
+            if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+                img = img.convert("RGBA")
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel("A"))
+                img = background
+            else:
+                img = img.convert("RGB")
+        elif image_format == "WEBP" and img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+        
+        output = io.BytesIO()
+        img.save(output, format=image_format, quality=quality, optimize=image_format == "JPEG")
+        return output.getvalue(), ENCODE_MIME_TYPES[image_format]
     
     @staticmethod
     def detect_text_regions(image_path: str) -> list:
@@ -134,4 +295,241 @@ class ImageProcessor:
         
         cv2.imwrite(output_path, cropped)
         return output_path
+    
+    @staticmethod
+    def segment_questions(image_path: Union[str, bytes, ImageBuffer], ink_threshold: int = 160,
+                          min_gap_ratio: float = 0.015, padding: int = 12) -> List[Tuple[int, int, int, int]]:
+        """
+        把整页试卷切分为逐题的区域
+        
+        在缩小的灰度图上做水平投影：先找出有墨迹的文本行，再把行距较小的相邻行合并为
+        一道题，行间空白明显大于正常行距处即为题目分界。detect_text_regions返回的是
+        逐个字块的轮廓，不适合直接当作题目区域。
+        
+        Args:
+            image_path: 图片路径、图片内容或ImageBuffer
+            ink_threshold: 灰度低于该值视为墨迹
+            min_gap_ratio: 题目之间的最小空白（占页面高度的比例）
+            padding: 区域四周留白（原图像素）
+            
+        Returns:
+            题目区域列表 [(x, y, w, h), ...]（摆正后的原图坐标，从上到下排列）；
+            只检测到一块时返回整页
+        """
+        buffer = ImageBuffer.coerce(image_path)
+        full_width, full_height = _oriented_size(buffer)
+        if buffer.decoded:
+            img = buffer.image()
+            if max(img.size) > 1000:
+                img = ImageOps.contain(img, (1000, 1000))
+            img = img.convert("L")
+        else:
+            with buffer.open() as img:
+                # 只为投影解码，JPEG按缩小比例解码即可
+                img.draft("L", (1000, 1000))
+                img = ImageOps.exif_transpose(img).convert("L")
+            img.thumbnail((1000, 1000))
+        width, height = img.size
+        scale_x, scale_y = full_width / width, full_height / height
+        ink = img.point(lambda value: 255 if value < ink_threshold else 0)
+        
+        # 每行的平均墨迹浓度（BOX缩放到1像素宽即为行均值）
+        profile = list(ink.resize((1, height), Image.BOX).getdata())
+        lines = []
+        start = None
+        for row, value in enumerate(profile + [0]):
+            if value > 1 and start is None:
+                start = row
+            elif value <= 1 and start is not None:
+                lines.append((start, row))
+                start = None
+        
+        if not lines:
+            return [(0, 0, full_width, full_height)]
+        
+        # 行距超过正常行距两倍、且不小于min_gap_ratio时分题
+        gaps = sorted(lines[i + 1][0] - lines[i][1] for i in range(len(lines) - 1))
+        typical_gap = gaps[len(gaps) // 2] if gaps else 0
+        split_gap = max(typical_gap * 2, int(height * min_gap_ratio), 1)
+        
+        blocks = [list(lines[0])]
+        for top, bottom in lines[1:]:
+            if top - blocks[-1][1] >= split_gap:
+                blocks.append([top, bottom])
+            else:
+                blocks[-1][1] = bottom
+        
+        if len(blocks) < 2:
+            return [(0, 0, full_width, full_height)]
+        
+        regions = []
+        for top, bottom in blocks:
+            box = ink.crop((0, top, width, bottom)).getbbox()
+            if box is None:
+                continue
+            left, right = box[0], box[2]
+            x0 = max(int(left * scale_x) - padding, 0)
+            y0 = max(int(top * scale_y) - padding, 0)
+            x1 = min(int(right * scale_x) + padding, full_width)
+            y1 = min(int(bottom * scale_y) + padding, full_height)
+            regions.append((x0, y0, x1 - x0, y1 - y0))
+        return regions
+    
+    @staticmethod
+    def crop_regions(image_path: Union[str, bytes, ImageBuffer], regions: List[Tuple[int, int, int, int]],
+                     image_format: str = "JPEG", quality: int = 92) -> List[bytes]:
+        """
+        在内存中裁剪多个区域（整页只解码一次，不写临时文件）
+        
+        Args:
+            image_path: 图片路径、图片内容或ImageBuffer
+            regions: 区域列表 [(x, y, w, h), ...]（摆正后的原图坐标）
+            image_format: 输出格式：JPEG/PNG/WEBP
+            quality: 编码质量（JPEG/WEBP）
+            
+        Returns:
+            各区域编码后的图片字节
+        """
+        img = ImageBuffer.coerce(image_path).image()
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        
+        crops = []
+        for x, y, w, h in regions:
+            output = io.BytesIO()
+            img.crop((x, y, x + w, y + h)).save(output, format=image_format, quality=quality)
+            crops.append(output.getvalue())
+        return crops
+
+
+def _preprocess_batch_item(max_strip_pixels: Optional[int], image, name: str) -> Tuple[bytes, str]:
+    """
+    批量预处理中的单张处理（在子进程中执行）
+    
+    Returns:
+        (处理后的图片内容, 文件名)
+    """
+    extension = Path(name).suffix.lower()
+    extension = ".jpg" if extension in (".jpg", ".jpeg") else ".png"
+    output_name = f"processed_{Path(name).stem}{extension}"
+    
+    if HAS_OPENCV:
+        if isinstance(image, str):
+            gray = cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+        elif isinstance(image, bytes):
+            gray = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_GRAYSCALE)
+        else:
+            gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if gray is None:
+            raise ValueError(f"无法读取图片: {name}")
+        ok, encoded = cv2.imencode(extension, ImageProcessor._preprocess_gray(gray, max_strip_pixels))
+        if not ok:
+            raise ValueError("图片编码失败")
+        return encoded.tobytes(), output_name
+    
+    if isinstance(image, (str, bytes)):
+        img = Image.open(image if isinstance(image, str) else io.BytesIO(image))
+        img.draft('L', img.size)
+    else:
+        img = Image.fromarray(image if image.ndim == 2 else image[:, :, ::-1])
+    output = io.BytesIO()
+    ImageProcessor._preprocess_pillow_image(img, max_strip_pixels).save(
+        output, format="JPEG" if extension == ".jpg" else "PNG")
+    return output.getvalue(), output_name
+
+
+def _clahe_luts(gray: "np.ndarray", clip_limit: float, grid: Tuple[int, int],
+                max_pixels: int = STRIP_PIXELS) -> Tuple["np.ndarray", Tuple[int, int]]:
+    """
+    按cv2.createCLAHE(clip_limit, grid)的规则计算整图各网格的查找表
+
+    逐段统计直方图，每段不超过max_pixels像素，不复制整图。与_clahe_apply配合，
+    结果与clahe.apply(gray)完全一致
+
+    Returns:
+        (查找表[网格行, 网格列, 256], (网格高, 网格宽))
+    """
+    tiles_x, tiles_y = grid
+    height, width = gray.shape
+    # 与OpenCV一致：尺寸不能被网格整除时，右侧和下方按BORDER_REFLECT_101补齐后再划分网格
+    if width % tiles_x == 0 and height % tiles_y == 0:
+        pad_x = pad_y = 0
+    else:
+        pad_x, pad_y = tiles_x - width % tiles_x, tiles_y - height % tiles_y
+    tile_height, tile_width = (height + pad_y) // tiles_y, (width + pad_x) // tiles_x
+    # 每列所属网格在直方图中的偏移，一次bincount统计一行网格
+    column_offset = np.arange(width + pad_x) // tile_width * 256
+    chunk_rows = max(max_pixels // (width + pad_x), 1)
+    
+    hist = np.zeros((tiles_y, tiles_x * 256), np.int64)
+    for tile_row in range(tiles_y):
+        tile_bottom = (tile_row + 1) * tile_height
+        for start in range(tile_row * tile_height, tile_bottom, chunk_rows):
+            stop = min(start + chunk_rows, tile_bottom)
+            if stop <= height:
+                block = gray[start:stop]
+            else:
+                rows = np.arange(start, stop)
+                block = gray[np.where(rows < height, rows, 2 * (height - 1) - rows)]
+            if pad_x:
+                block = np.pad(block, ((0, 0), (0, pad_x)), mode="reflect")
+            hist[tile_row] += np.bincount((block + column_offset).ravel(), minlength=tiles_x * 256)
+    hist = hist.reshape(tiles_y, tiles_x, 256)
+    
+    # 裁剪直方图，超出部分平均分配，余数按固定步长分配
+    total = tile_height * tile_width
+    if clip_limit > 0:
+        limit = max(int(clip_limit * total / 256), 1)
+        clipped = np.maximum(hist - limit, 0).sum(axis=-1)
+        hist = np.minimum(hist, limit) + (clipped // 256)[..., None]
+        for (tile_row, tile_col), residual in np.ndenumerate(clipped % 256):
+            if residual:
+                hist[tile_row, tile_col, ::max(256 // residual, 1)][:residual] += 1
+    
+    cdf = np.cumsum(hist, axis=-1).astype(np.float32)
+    luts = np.clip(np.rint(cdf * (np.float32(255) / np.float32(total))), 0, 255).astype(np.uint8)
+    return luts, (tile_height, tile_width)
+
+
+def _clahe_apply(strip: "np.ndarray", top: int, luts: "np.ndarray", tile_size: Tuple[int, int]) -> "np.ndarray":
+    """
+    用_clahe_luts的结果对一条灰度图做CLAHE映射（相邻4个网格的查找表双线性插值）
+
+    Args:
+        strip: 灰度图的一条
+        top: 该条首行在整图中的行号
+        luts: 查找表
+        tile_size: (网格高, 网格宽)
+    """
+    tiles_y, tiles_x = luts.shape[:2]
+    tile_height, tile_width = tile_size
+    height, width = strip.shape
+    
+    def neighbours(positions, tile, tiles):
+        offset = positions.astype(np.float32) * np.float32(1.0 / tile) - np.float32(0.5)
+        first = np.floor(offset).astype(np.intp)
+        weight = (offset - first).astype(np.float32)
+        return np.maximum(first, 0), np.minimum(first + 1, tiles - 1), weight
+    
+    x1, x2, xa = neighbours(np.arange(width), tile_width, tiles_x)
+    y1, y2, ya = neighbours(np.arange(top, top + height), tile_height, tiles_y)
+    xa1, ya = 1 - xa, ya[:, None]
+    y1, y2 = y1[:, None], y2[:, None]
+    lut = luts.astype(np.float32)
+    
+    # (上左*xa1 + 上右*xa)*ya1 + (下左*xa1 + 下右*xa)*ya，与OpenCV的计算顺序一致
+    result = lut[y1, x1, strip] * xa1
+    result += lut[y1, x2, strip] * xa
+    result *= 1 - ya
+    lower = lut[y2, x1, strip] * xa1
+    lower += lut[y2, x2, strip] * xa
+    lower *= ya
+    result += lower
+    return np.clip(np.rint(result), 0, 255).astype(np.uint8)
+
 
+def _oriented_size(buffer: ImageBuffer) -> Tuple[int, int]:
+    """不解码像素获取按EXIF方向摆正后的尺寸"""
+    _, (width, height), orientation = buffer.header()
+    # EXIF方向为5-8时摆正后宽高互换
+    return (height, width) if orientation in (5, 6, 7, 8) else (width, height)
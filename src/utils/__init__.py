@@ -2,7 +2,17 @@
 工具函数模块
 """
 
-from .helpers import format_datetime, validate_image, create_upload_dir
+from .helpers import (format_datetime, validate_image, create_upload_dir, file_sha256,
+                      content_sha256, image_extension, read_image_bytes)
 from .logger import setup_logger
+from .image_buffer import ImageBuffer
+from .image_hash import dhash, hamming_distance, ImageHashIndex
+from .streaming import stream_chat_completion, iter_complete_lines, iter_json_array_items, JsonArrayItemParser
+from .tiling import process_in_strips, strip_rows
+from .batch import run_batch, BatchResult
 
-__all__ = ["format_datetime", "validate_image", "create_upload_dir", "setup_logger"]
+__all__ = ["format_datetime", "validate_image", "create_upload_dir", "file_sha256", "setup_logger",
+           "content_sha256", "image_extension", "read_image_bytes", "ImageBuffer",
+           "dhash", "hamming_distance", "ImageHashIndex",
+           "stream_chat_completion", "iter_complete_lines", "iter_json_array_items", "JsonArrayItemParser",
+           "process_in_strips", "strip_rows", "run_batch", "BatchResult"]
@@ -0,0 +1,244 @@
+"""
+进程池批量处理图片
+
+去手写、预处理都是CPU密集型操作，在请求线程里逐张处理只能用到一个核。这里把一批图片
+分发到进程池：
+- 图片路径直接发给子进程，由子进程读取、解码
+- 已解码的图片（NumPy数组、已解码的ImageBuffer）和较大的图片内容放入共享内存，
+  子进程直接映射使用，不经过pickle复制
+- 结果按完成顺序逐个返回；单张图片出错只影响该图片。子进程异常退出（如内存不足被杀）
+  时重建进程池，当时正在处理的图片逐张重试一次，只有导致退出的图片报错
+- 同时提交的图片数有上限，共享内存占用不随批量大小增长
+"""
+
+import os
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from .image_buffer import ImageBuffer, image_extension, HAS_NUMPY
+
+
+# 超过该大小的图片内容通过共享内存传给子进程
+SHARED_MEMORY_THRESHOLD = 1024 * 1024
+
+# 子进程异常退出时，正在处理的图片最多尝试的次数
+MAX_ATTEMPTS = 2
+
+
+class BatchResult(NamedTuple):
+    """批量处理中一张图片的结果"""
+    index: int                # 在输入中的序号
+    name: str                 # 图片名
+    result: Any = None        # 处理结果（出错时为None）
+    error: Optional[str] = None  # 错误信息（成功时为None）
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def run_batch(sources: Iterable[Any], task: Callable[[Any, str], Any],
+              workers: Optional[int] = None) -> Iterator[BatchResult]:
+    """
+    在进程池中批量处理图片，按完成顺序返回结果
+
+    Args:
+        sources: 图片路径、图片内容、ImageBuffer或BGR数组
+        task: 处理函数task(image, name)，在子进程中执行，须为模块级函数（或其functools.partial）。
+              image为图片路径（str）、图片内容（bytes）或数组（可以原地修改）；返回值须可pickle
+        workers: 进程数，默认为CPU核数；为1或无法创建进程池时（如Vercel等没有/dev/shm的环境）在当前进程逐张处理
+
+    Yields:
+        BatchResult
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers > 1:
+        try:
+            if os.name == "posix":
+                # 先启动共享内存的跟踪进程，fork出的子进程与主进程共用，
+                # 否则子进程各自启动跟踪进程，退出时会重复清理主进程已释放的共享内存
+                resource_tracker.ensure_running()
+            executor = ProcessPoolExecutor(max_workers=workers)
+        except (OSError, NotImplementedError) as e:
+            warnings.warn(f"无法创建进程池，改为逐张处理: {e}")
+            workers = 1
+    if workers <= 1:
+        yield from _run_inline(sources, task)
+        return
+
+    items = enumerate(sources)
+    retry = deque()
+    attempts = {}
+    in_flight = {}  # future -> (序号, 原始输入, 图片名, 共享内存)
+    try:
+        while True:
+            # 补充提交，进行中的任务数不超过进程数的2倍；
+            # 重试时逐张提交，重试的图片再次导致进程退出时可以确定就是它
+            retrying = retry or any(attempts.get(index) for index, _, _, _ in in_flight.values())
+            while len(in_flight) < (1 if retrying else workers * 2):
+                if retry:
+                    index, source = retry.popleft()
+                else:
+                    index, source = next(items, (None, None))
+                    if index is None:
+                        break
+                try:
+                    payload, name, shm = _prepare(source, shared=True)
+                except Exception as e:
+                    yield BatchResult(index, _source_name(source), error=f"读取图片失败: {e}")
+                    continue
+                future = executor.submit(_run_item, task, payload, name)
+                in_flight[future] = (index, source, name, shm)
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+                # 进程池已损坏，其余进行中的任务也会失败：全部收集后重建进程池
+                done, _ = wait(in_flight)
+                executor.shutdown(wait=True)
+                executor = ProcessPoolExecutor(max_workers=workers)
+
+            for future in done:
+                index, source, name, shm = in_flight.pop(future)
+                _release(shm)
+                error = future.exception()
+                if isinstance(error, BrokenProcessPool):
+                    attempts[index] = attempts.get(index, 0) + 1
+                    if attempts[index] < MAX_ATTEMPTS:
+                        retry.append((index, source))
+                        continue
+                    yield BatchResult(index, name, error="处理进程异常退出")
+                elif error is not None:
+                    yield BatchResult(index, name, error=f"{type(error).__name__}: {error}")
+                else:
+                    yield _to_result(index, name, future.result())
+    finally:
+        for future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
+        for _, _, _, shm in in_flight.values():
+            _release(shm)
+
+
+def _run_inline(sources: Iterable[Any], task: Callable[[Any, str], Any]) -> Iterator[BatchResult]:
+    """在当前进程逐张处理（错误同样按图片隔离）"""
+    for index, source in enumerate(sources):
+        try:
+            payload, name, _ = _prepare(source, shared=False)
+        except Exception as e:
+            yield BatchResult(index, _source_name(source), error=f"读取图片失败: {e}")
+            continue
+        yield _to_result(index, name, _run_item(task, payload, name))
+
+
+def _to_result(index: int, name: str, outcome: Tuple[str, Any]) -> BatchResult:
+    status, value = outcome
+    if status == "ok":
+        return BatchResult(index, name, result=value)
+    return BatchResult(index, name, error=value)
+
+
+def _source_name(source: Any) -> str:
+    if isinstance(source, str):
+        return os.path.basename(source)
+    if isinstance(source, ImageBuffer):
+        return source.name
+    return "image"
+
+
+def _prepare(source: Any, shared: bool) -> Tuple[tuple, str, Optional[shared_memory.SharedMemory]]:
+    """
+    把输入转换为发给子进程的参数
+
+    Returns:
+        (参数, 图片名, 需要在处理完成后释放的共享内存)
+    """
+    if isinstance(source, str):
+        return ("value", source), os.path.basename(source), None
+
+    if isinstance(source, ImageBuffer):
+        name = source.name
+        if source.decoded and HAS_NUMPY:
+            # 已解码：直接传数组，子进程不再解码
+            source = source.array()
+        elif source.path is not None:
+            return ("value", source.path), name, None
+        else:
+            source = source.data
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        name = f"image{image_extension(bytes(source[:16]))}"
+    else:
+        name = "image.png"
+
+    if hasattr(source, "__array_interface__"):
+        if not shared:
+            return ("value", source.copy()), name, None
+        payload, shm = _share_array(source)
+        return payload, name, shm
+
+    data = source
+    if shared and len(data) >= SHARED_MEMORY_THRESHOLD:
+        shm = shared_memory.SharedMemory(create=True, size=len(data))
+        shm.buf[:len(data)] = data
+        return ("shm", shm.name, len(data), None), name, shm
+    return ("value", bytes(data)), name, None
+
+
+def _share_array(array) -> Tuple[tuple, shared_memory.SharedMemory]:
+    """把数组复制到新建的共享内存中"""
+    import numpy as np
+
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return ("shm", shm.name, array.shape, array.dtype.str), shm
+
+
+def _run_item(task: Callable[[Any, str], Any], payload: tuple, name: str) -> Tuple[str, Any]:
+    """
+    子进程中处理一张图片
+
+    Returns:
+        ("ok", 结果)或("error", 错误信息)：异常在这里转换为文字，不依赖异常对象能否pickle
+    """
+    if payload[0] == "value":
+        try:
+            return "ok", task(payload[1], name)
+        except Exception as e:
+            return "error", f"{type(e).__name__}: {e}"
+
+    _, shm_name, shape, dtype = payload
+    shm = shared_memory.SharedMemory(name=shm_name)
+    image = None
+    try:
+        if dtype is None:
+            image = bytes(shm.buf[:shape])
+        else:
+            import numpy as np
+            image = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        return "ok", task(image, name)
+    except Exception as e:
+        return "error", f"{type(e).__name__}: {e}"
+    finally:
+        del image
+        try:
+            shm.close()
+        except BufferError:
+            # 结果仍引用共享内存（不应出现），留给进程退出时释放
+            pass
+
+
+def _release(shm: Optional[shared_memory.SharedMemory]):
+    """释放主进程创建的共享内存"""
+    if shm is None:
+        return
+    try:
+        shm.close()
+        shm.unlink()
+    except FileNotFoundError:
+        pass
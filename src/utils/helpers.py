@@ -3,38 +3,46 @@
 """
 
 import os
+import hashlib
 from datetime import datetime
 from pathlib import Path
+from typing import Union
 from PIL import Image
 
+from .image_buffer import ImageBuffer, image_extension
+
 
 def format_datetime(dt: datetime) -> str:
     """格式化日期时间"""
     return dt.strftime("%Y-%m-%d %H:%M:%S")
 
 
-def validate_image(image_path: str, max_size_mb: int = 10) -> tuple:
+def validate_image(image_path: Union[str, ImageBuffer], max_size_mb: int = 10) -> tuple:
     """
     验证图片文件
     
     Args:
-        image_path: 图片路径
+        image_path: 图片路径或ImageBuffer
         max_size_mb: 最大文件大小（MB）
         
     Returns:
         (是否有效, 错误信息)
     """
-    if not os.path.exists(image_path):
+    if isinstance(image_path, ImageBuffer):
+        size = len(image_path)
+    elif not os.path.exists(image_path):
         return False, "文件不存在"
+    else:
+        size = os.path.getsize(image_path)
     
     # 检查文件大小
-    file_size = os.path.getsize(image_path) / (1024 * 1024)  # MB
+    file_size = size / (1024 * 1024)  # MB
     if file_size > max_size_mb:
         return False, f"文件大小超过{max_size_mb}MB"
     
-    # 检查是否为有效图片
+    # 检查是否为有效图片（只校验文件结构，不解码像素）
     try:
-        with Image.open(image_path) as img:
+        with (image_path.open() if isinstance(image_path, ImageBuffer) else Image.open(image_path)) as img:
             img.verify()
         return True, ""
     except Exception as e:
@@ -61,3 +69,52 @@ def create_upload_dir(base_dir: str = "uploads") -> str:
     
     return str(date_dir)
 
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    计算文件内容的SHA-256
+    
+    Args:
+        file_path: 文件路径
+        chunk_size: 每次读取的字节数
+        
+    Returns:
+        十六进制哈希字符串
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_sha256(content: bytes) -> str:
+    """
+    计算内存中图片内容的SHA-256（与file_sha256对同一内容的结果一致）
+    
+    Args:
+        content: 文件内容
+        
+    Returns:
+        十六进制哈希字符串
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
+def read_image_bytes(image: Union[str, bytes, ImageBuffer]) -> bytes:
+    """
+    读取图片内容（已经是字节时原样返回）
+    
+    Args:
+        image: 图片路径、图片内容或ImageBuffer
+        
+    Returns:
+        图片字节
+    """
+    if isinstance(image, bytes):
+        return image
+    if isinstance(image, ImageBuffer):
+        return image.tobytes()
+    with open(image, "rb") as f:
+        return f.read()
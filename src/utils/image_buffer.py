@@ -0,0 +1,272 @@
+"""
+内存中的图片缓冲
+
+一张图片在入库流程中会经过校验、哈希、识别、去手写、上传多个环节。ImageBuffer只读取一次
+文件内容（大文件使用内存映射），按需解码一次，并缓存各环节生成的编码结果，
+各环节直接传递同一个对象，不再各自读文件、解码。
+"""
+
+import io
+import os
+import mmap
+import hashlib
+import threading
+import importlib.util
+from typing import Optional, Union, Callable, Any, Dict, Tuple
+
+from PIL import Image, ImageOps
+
+# numpy为可选依赖（Vercel部署时未安装），只有需要数组形式时才加载
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+# 超过该大小的文件使用内存映射，不复制到进程内存中
+MMAP_THRESHOLD = 4 * 1024 * 1024
+
+# 常见图片格式的文件头及对应扩展名
+_IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF8", ".gif"),
+    (b"BM", ".bmp"),
+)
+
+
+class ImageBuffer:
+    """
+    只读取、解码一次的图片缓冲
+
+    - data：原始文件内容（bytes或内存映射）
+    - image()：按EXIF方向摆正后的PIL图片，首次调用时解码，之后复用
+    - array()：BGR顺序的NumPy数组（与cv2.imread一致），由image()转换得到
+    - encoding()：缓存派生的编码结果（如上传给视觉模型的压缩图）
+    """
+
+    def __init__(self, data: Union[bytes, mmap.mmap], name: str = "image", path: Optional[str] = None):
+        """
+        Args:
+            data: 图片内容
+            name: 文件名（上传附件时使用）
+            path: 来源文件路径（从内存创建时为None）
+        """
+        self.data = data
+        self.name = name
+        self.path = path
+        self._lock = threading.Lock()
+        self._sha256: Optional[str] = None
+        self._header: Optional[Tuple[Optional[str], Tuple[int, int], int]] = None
+        self._image: Optional[Image.Image] = None
+        self._array = None
+        self._encodings: Dict[Any, Any] = {}
+        self._file = None
+
+    @classmethod
+    def from_path(cls, path: str, mmap_threshold: int = MMAP_THRESHOLD) -> "ImageBuffer":
+        """
+        从文件创建（超过mmap_threshold的文件使用内存映射）
+
+        Args:
+            path: 图片路径
+            mmap_threshold: 使用内存映射的最小文件大小（字节）
+        """
+        name = os.path.basename(path)
+        size = os.path.getsize(path)
+        if size == 0 or size < mmap_threshold:
+            with open(path, "rb") as f:
+                return cls(f.read(), name=name, path=path)
+
+        f = open(path, "rb")
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            f.close()
+            raise
+        buffer = cls(mapped, name=name, path=path)
+        buffer._file = f
+        return buffer
+
+    @classmethod
+    def coerce(cls, source: Union[str, bytes, "ImageBuffer"], name: Optional[str] = None) -> "ImageBuffer":
+        """
+        把图片路径、图片内容或ImageBuffer统一转换为ImageBuffer
+
+        Args:
+            source: 图片来源
+            name: 从内存创建时使用的文件名（默认按内容推断扩展名）
+        """
+        if isinstance(source, ImageBuffer):
+            return source
+        if isinstance(source, bytes):
+            return cls(source, name=name or f"image{image_extension(source)}")
+        return cls.from_path(source)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def sha256(self) -> str:
+        """内容的SHA-256（与file_sha256对同一内容的结果一致）"""
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.data).hexdigest()
+        return self._sha256
+
+    @property
+    def extension(self) -> str:
+        """根据文件头判断的扩展名（如".jpg"），无法识别时为空字符串"""
+        return image_extension(self.data[:16])
+
+    def tobytes(self) -> bytes:
+        """图片内容的bytes形式（已经是bytes时不复制）"""
+        return self.data if isinstance(self.data, bytes) else bytes(self.data)
+
+    def open(self) -> Image.Image:
+        """
+        打开一个未解码的PIL图片（只读取文件头，适合draft缩小解码等用途）
+
+        每次调用都返回新的对象，由调用方负责关闭
+        """
+        if isinstance(self.data, bytes):
+            return Image.open(io.BytesIO(self.data))
+        # 内存映射直接按视图读取，不复制内容，也不重新打开文件
+        return Image.open(_ViewReader(self.data))
+
+    def header(self) -> Tuple[Optional[str], Tuple[int, int], int]:
+        """
+        不解码像素读取图片基本信息
+
+        Returns:
+            (格式, 原始尺寸, EXIF方向)
+        """
+        if self._header is None:
+            with self.open() as img:
+                self._header = (img.format, img.size, img.getexif().get(0x0112, 1))
+        return self._header
+
+    @property
+    def decoded(self) -> bool:
+        """是否已经解码"""
+        return self._image is not None
+
+    def image(self) -> Image.Image:
+        """
+        解码后的PIL图片（已按EXIF方向摆正），只解码一次
+
+        返回的是共享对象，调用方不应原地修改
+        """
+        if self._image is None:
+            with self._lock:
+                if self._image is None:
+                    with self.open() as img:
+                        img = ImageOps.exif_transpose(img)
+                        img.load()
+                    self._image = img
+        return self._image
+
+    def array(self):
+        """
+        BGR顺序的NumPy数组（与cv2.imread读取的结果一致），只转换一次
+
+        返回的是共享对象，调用方不应原地修改
+        """
+        if not HAS_NUMPY:
+            raise ImportError("需要安装numpy才能获取数组形式的图片")
+        if self._array is None:
+            import numpy as np
+            img = self.image()
+            with self._lock:
+                if self._array is None:
+                    if img.mode != "RGB":
+                        img = img.convert("RGB")
+                    self._array = np.ascontiguousarray(np.asarray(img)[:, :, ::-1])
+        return self._array
+
+    def encoding(self, key: Any, factory: Callable[["ImageBuffer"], Any]) -> Any:
+        """
+        获取派生编码结果，不存在时调用factory生成并缓存
+
+        Args:
+            key: 缓存键（如("JPEG", 1600, 85)）
+            factory: 生成函数，参数为当前ImageBuffer
+        """
+        if key not in self._encodings:
+            value = factory(self)
+            with self._lock:
+                self._encodings.setdefault(key, value)
+        return self._encodings[key]
+
+    def close(self):
+        """释放内存映射和已解码的图片"""
+        if isinstance(self.data, mmap.mmap):
+            try:
+                self.data.close()
+            except BufferError:
+                # 仍有未关闭的PIL图片在读取映射，最后一个引用释放时自动解除映射
+                pass
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._image = None
+        self._array = None
+        self._encodings.clear()
+
+    def __enter__(self) -> "ImageBuffer":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _ViewReader(io.RawIOBase):
+    """在内存映射上按独立的读取位置提供只读文件接口（多个PIL图片可以同时读取同一映射）"""
+
+    def __init__(self, data: Union[bytes, mmap.mmap]):
+        self._view = memoryview(data)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError(f"无效的读取位置: {offset}")
+        self._pos = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+def image_extension(content: bytes) -> str:
+    """
+    根据文件头判断图片扩展名
+
+    Args:
+        content: 图片内容（至少包含前12个字节）
+
+    Returns:
+        扩展名（如".jpg"），无法识别时返回空字符串
+    """
+    if content[:4] == b"RIFF" and content[8:12] == b"WEBP":
+        return ".webp"
+    for signature, extension in _IMAGE_SIGNATURES:
+        if content.startswith(signature):
+            return extension
+    return ""
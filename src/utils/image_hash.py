@@ -0,0 +1,288 @@
+"""
+图片感知哈希与近似重复检测
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import itertools
+from typing import Optional, List, Dict, Tuple, Union
+
+from PIL import Image, ImageOps
+
+from .image_buffer import ImageBuffer
+
+
+# 感知哈希的位数
+HASH_BITS = 64
+
+# 统计二进制中1的个数（Python 3.10起int自带bit_count）
+_popcount = int.bit_count if hasattr(int, "bit_count") else (lambda value: bin(value).count("1"))
+
+
+def dhash(image_path: Union[str, bytes, ImageBuffer], hash_size: int = 8) -> int:
+    """
+    计算图片的差值哈希（dHash）
+
+    缩小为(hash_size+1)×hash_size的灰度图，逐行比较相邻像素的明暗。
+    对缩放、轻微角度和亮度变化不敏感，同一道题拍两次得到的哈希通常只差几位。
+
+    Args:
+        image_path: 图片路径、图片内容或ImageBuffer
+        hash_size: 哈希边长，默认8（64位）
+
+    Returns:
+        哈希值（无符号整数）
+    """
+    buffer = ImageBuffer.coerce(image_path)
+    if buffer.decoded:
+        # 其他环节已经解码过时直接复用，先按整数倍缩小再精确缩放
+        img = buffer.image().resize((hash_size + 1, hash_size), Image.LANCZOS, reducing_gap=2.0).convert("L")
+    else:
+        with buffer.open() as img:
+            # JPEG按缩小比例解码，避免为了一个64位哈希解码整张大图
+            img.draft("L", (hash_size * 8, hash_size * 8))
+            img = ImageOps.exif_transpose(img).convert("L")
+            img = img.resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(img.getdata())
+
+    value = 0
+    width = hash_size + 1
+    for row in range(hash_size):
+        offset = row * width
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个哈希值的汉明距离"""
+    return _popcount(a ^ b)
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """比较题目文字前去掉全部空白（识别结果的换行和空格并不稳定）"""
+    return "".join((text or "").split())
+
+
+def _to_signed(value: int) -> int:
+    # SQLite的INTEGER是有符号64位
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+class ImageHashIndex:
+    """
+    感知哈希的近似查询索引（多索引哈希）
+
+    把64位哈希切成若干段，每段各建一个内存桶。根据抽屉原理，汉明距离不超过d的
+    两个哈希至少有一段的距离不超过d // 段数，因此查询时只需在每段枚举这个半径内的
+    取值、取出桶里的候选项再精确比较，不必遍历全部哈希。哈希持久化在SQLite中，
+    启动时载入内存。
+
+    64位dHash只看明暗轮廓，版式相同的两道题（白底黑字、只差几个数字）也可能只差几位，
+    因此哈希接近只作为候选：find_duplicate还要求内容的SHA-256相同或识别出的题目文字一致。
+    """
+
+    def __init__(self, db_path: str, max_distance: int = 6, segments: int = 4):
+        """
+        初始化索引
+
+        Args:
+            db_path: SQLite文件路径（Vercel上应位于/tmp下）
+            max_distance: 默认的最大汉明距离
+            segments: 分段数（64位分4段时每段16位，10万张图片时每个桶平均不到2项）
+        """
+        self.db_path = db_path
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+
+        self._layout: List[Tuple[int, int]] = []
+        shift = 0
+        for i in range(segments):
+            bits = HASH_BITS // segments + (1 if i < HASH_BITS % segments else 0)
+            self._layout.append((shift, bits))
+            shift += bits
+        # 每段在各个半径内需要枚举的翻转掩码，按需生成
+        self._flip_masks: Dict[Tuple[int, int], List[int]] = {}
+
+        self._hashes: List[int] = []
+        self._record_ids: List[Optional[str]] = []
+        self._texts: List[str] = []
+        self._content_hashes: Dict[str, int] = {}
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in self._layout]
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS image_hashes (
+                    image_hash INTEGER NOT NULL,
+                    record_id TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    content_hash TEXT,
+                    question_text TEXT
+                )
+                """
+            )
+            # 旧版本的索引没有内容哈希和题目文字，这些条目不会再被判定为重复
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(image_hashes)")}
+            for column in ("content_hash", "question_text"):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE image_hashes ADD COLUMN {column} TEXT")
+
+        rows = self._conn.execute("SELECT image_hash, record_id, content_hash, question_text FROM image_hashes")
+        for image_hash, record_id, content_hash, question_text in rows:
+            self._insert(_to_unsigned(image_hash), record_id, content_hash, question_text or "")
+
+    def _segments(self, image_hash: int) -> List[int]:
+        return [(image_hash >> shift) & ((1 << bits) - 1) for shift, bits in self._layout]
+
+    def _masks(self, bits: int, radius: int) -> List[int]:
+        """长度为bits的段内，汉明距离不超过radius的全部翻转掩码"""
+        key = (bits, radius)
+        masks = self._flip_masks.get(key)
+        if masks is None:
+            masks = [
+                sum(1 << position for position in positions)
+                for r in range(radius + 1)
+                for positions in itertools.combinations(range(bits), r)
+            ]
+            self._flip_masks[key] = masks
+        return masks
+
+    def _insert(self, image_hash: int, record_id: str, content_hash: Optional[str], question_text: str):
+        position = len(self._hashes)
+        self._hashes.append(image_hash)
+        self._record_ids.append(record_id)
+        self._texts.append(question_text)
+        if content_hash:
+            self._content_hashes[content_hash] = position
+        for bucket, segment in zip(self._buckets, self._segments(image_hash)):
+            bucket.setdefault(segment, []).append(position)
+
+    def find(self, image_hash: int, max_distance: Optional[int] = None) -> Optional[Tuple[str, int]]:
+        """
+        查找哈希最接近的已入库图片（只比较哈希，结果只能作为候选）
+
+        Args:
+            image_hash: 查询的哈希值
+            max_distance: 允许的最大汉明距离，默认为索引的max_distance
+
+        Returns:
+            (记录ID, 汉明距离)，没有足够接近的图片时返回None
+        """
+        with self._lock:
+            candidates = self._candidates(image_hash, max_distance)
+        if not candidates:
+            return None
+        distance, position = candidates[0]
+        return self._record_ids[position], distance
+
+    def find_exact(self, content_hash: str) -> Optional[str]:
+        """
+        按内容的SHA-256查找完全相同的已入库图片
+
+        Args:
+            content_hash: 图片内容的SHA-256
+
+        Returns:
+            记录ID，没有时返回None
+        """
+        with self._lock:
+            position = self._content_hashes.get(content_hash)
+            return None if position is None else self._record_ids[position]
+
+    def find_duplicate(self, image_hash: int, question_text: str,
+                       max_distance: Optional[int] = None) -> Optional[Tuple[str, int]]:
+        """
+        查找同一道题的已入库图片：哈希足够接近，且识别出的题目文字一致
+
+        Args:
+            image_hash: 查询的哈希值
+            question_text: 识别出的题目文字（为空时不判定为重复）
+            max_distance: 允许的最大汉明距离，默认为索引的max_distance
+
+        Returns:
+            (记录ID, 汉明距离)，没有确认重复的图片时返回None
+        """
+        text = normalize_text(question_text)
+        if not text:
+            return None
+        with self._lock:
+            for distance, position in self._candidates(image_hash, max_distance):
+                if self._texts[position] == text:
+                    return self._record_ids[position], distance
+        return None
+
+    def _candidates(self, image_hash: int, max_distance: Optional[int]) -> List[Tuple[int, int]]:
+        """哈希距离在范围内的全部候选项，返回按距离排序的(汉明距离, 位置)（调用方持有锁）"""
+        limit = self.max_distance if max_distance is None else max_distance
+        radius = limit // len(self._layout)
+        found: Dict[int, int] = {}
+
+        hashes, record_ids = self._hashes, self._record_ids
+        for bucket, segment, (_, bits) in zip(self._buckets, self._segments(image_hash), self._layout):
+            for mask in self._masks(bits, radius):
+                positions = bucket.get(segment ^ mask)
+                if not positions:
+                    continue
+                for position in positions:
+                    if position in found or record_ids[position] is None:
+                        continue
+                    distance = _popcount(image_hash ^ hashes[position])
+                    if distance <= limit:
+                        found[position] = distance
+        return sorted((distance, position) for position, distance in found.items())
+
+    def add(self, image_hash: int, record_id: str, content_hash: Optional[str] = None,
+            question_text: Optional[str] = None):
+        """
+        记录一张已入库的图片
+
+        Args:
+            image_hash: 图片哈希
+            record_id: 对应的记录ID
+            content_hash: 图片内容的SHA-256
+            question_text: 识别出的题目文字
+        """
+        text = normalize_text(question_text)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO image_hashes (image_hash, record_id, created_at, content_hash, question_text) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (_to_signed(image_hash), record_id, time.time(), content_hash, text)
+                )
+            self._insert(image_hash, record_id, content_hash, text)
+
+    def remove(self, record_id: str):
+        """删除记录对应的全部哈希（例如记录已被删除）"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM image_hashes WHERE record_id = ?", (record_id,))
+            # 内存中只做标记，桶里的位置在下次启动载入时自然消失
+            for position, current in enumerate(self._record_ids):
+                if current == record_id:
+                    self._record_ids[position] = None
+            self._content_hashes = {
+                content_hash: position for content_hash, position in self._content_hashes.items()
+                if self._record_ids[position] is not None
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(1 for record_id in self._record_ids if record_id is not None)
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,205 @@
+"""
+流式（SSE）响应解析
+
+用于OpenAI兼容的chat/completions接口在stream=True时返回的text/event-stream
+"""
+
+import json
+import requests
+from typing import Iterator, Iterable, Dict, Any, Optional
+
+
+def iter_sse_data(response: requests.Response) -> Iterator[str]:
+    """
+    逐条产出SSE事件的data内容
+
+    多行data按规范用换行拼接；注释行和其他字段忽略；收到[DONE]时结束
+
+    Args:
+        response: 以stream=True发出的请求的响应
+
+    Returns:
+        data字符串迭代器
+    """
+    data_lines = []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            # 空行表示一个事件结束
+            if data_lines:
+                data = "\n".join(data_lines)
+                data_lines = []
+                if data.strip() == "[DONE]":
+                    return
+                yield data
+            continue
+        if line.startswith(":"):
+            continue
+        if line.startswith("data:"):
+            # 冒号后的一个空格不属于数据
+            value = line[5:]
+            data_lines.append(value[1:] if value.startswith(" ") else value)
+
+    if data_lines:
+        data = "\n".join(data_lines)
+        if data.strip() != "[DONE]":
+            yield data
+
+
+def stream_chat_completion(url: str, data: Dict[str, Any], headers: Dict[str, str],
+                           timeout: float = 30) -> Iterator[str]:
+    """
+    以流式方式调用chat/completions，逐段产出模型生成的文本
+
+    Args:
+        url: 接口地址
+        data: 请求体（会自动加上stream=True）
+        headers: 请求头
+        timeout: 连接和两段数据之间的最长等待时间（秒）
+
+    Returns:
+        文本片段迭代器
+    """
+    data = dict(data, stream=True)
+    with requests.post(url, json=data, headers=headers, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        # SSE规定为UTF-8，服务端未声明charset时requests会按ISO-8859-1解码
+        response.encoding = "utf-8"
+        for event in iter_sse_data(response):
+            chunk = json.loads(event)
+            choices = chunk.get("choices") or []
+            if not choices:
+                continue
+            content = (choices[0].get("delta") or {}).get("content")
+            if content:
+                yield content
+
+
+def iter_complete_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    把文本片段重新组合成完整的行，每凑齐一行就产出
+
+    Args:
+        chunks: 文本片段
+
+    Returns:
+        行迭代器（不含换行符，最后一行没有换行时也会产出）
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        while "\n" in buffer:
+            line, buffer = buffer.split("\n", 1)
+            yield line
+    if buffer:
+        yield buffer
+
+
+class JsonArrayItemParser:
+    """
+    增量解析JSON中某个数组的元素（元素为对象、数组或字符串）
+
+    模型逐段返回 {"questions": [{...}, {...}]} 时，每个元素对象一闭合就能取出，
+    不必等整个JSON结束
+    """
+
+    def __init__(self, key: Optional[str] = None):
+        """
+        Args:
+            key: 数组所在的键名；为None时解析遇到的第一个数组
+        """
+        self.key = key
+        self._buffer = ""
+        self._position = 0
+        self._in_array = False
+        self._item_start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._finished = False
+
+    def _find_array(self) -> bool:
+        """定位数组开头的[，找到后从其后开始逐字符扫描"""
+        if self.key is None:
+            start = self._buffer.find("[")
+        else:
+            marker = self._buffer.find(json.dumps(self.key, ensure_ascii=False))
+            if marker == -1:
+                marker = self._buffer.find(json.dumps(self.key))
+            if marker == -1:
+                return False
+            start = self._buffer.find("[", marker)
+        if start == -1:
+            return False
+        self._in_array = True
+        self._position = start + 1
+        return True
+
+    def feed(self, chunk: str) -> Iterator[Any]:
+        """
+        输入一段文本，产出其中新闭合的数组元素
+
+        Args:
+            chunk: 模型返回的文本片段
+
+        Returns:
+            解析出的元素迭代器
+        """
+        if self._finished:
+            return
+        self._buffer += chunk
+        if not self._in_array and not self._find_array():
+            return
+
+        buffer = self._buffer
+        while self._position < len(buffer):
+            position = self._position
+            char = buffer[position]
+            self._position += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 0:
+                        yield self._take_item(position)
+            elif char == '"':
+                self._in_string = True
+                if self._depth == 0:
+                    self._item_start = position
+            elif char in "{[":
+                if self._depth == 0:
+                    self._item_start = position
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # 数组结束
+                    self._finished = True
+                    return
+                self._depth -= 1
+                if self._depth == 0:
+                    yield self._take_item(position)
+
+    def _take_item(self, end: int) -> Any:
+        item = json.loads(self._buffer[self._item_start:end + 1])
+        self._item_start = None
+        return item
+
+
+def iter_json_array_items(chunks: Iterable[str], key: Optional[str] = None) -> Iterator[Any]:
+    """
+    从流式返回的JSON文本中逐个产出数组元素
+
+    Args:
+        chunks: 文本片段
+        key: 数组所在的键名；为None时解析遇到的第一个数组
+
+    Returns:
+        元素迭代器
+    """
+    parser = JsonArrayItemParser(key)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
@@ -0,0 +1,102 @@
+"""
+大图分条处理
+
+整图处理时，灰度图、掩码、背景、结果等中间数据都和原图一样大，4800万像素的照片或
+大幅扫描件在1024MB的Vercel函数里很容易内存不足。这里把图片按行切成若干条，
+每条带上下halo行的重叠区域单独处理，只把中间部分写回原图：
+- 处理结果逐条直接覆盖原图，不再分配整图大小的输出
+- 下一条上方的重叠区域已被覆盖，使用上一条保存的原始内容
+- 每条的像素数不超过max_pixels，额外内存只有一条的工作集，与图片大小无关
+
+只要halo不小于处理函数的影响范围，结果与整图处理一致（边缘填充方式相同的前提下）。
+"""
+
+from typing import Callable, TypeVar
+
+from PIL import Image
+
+
+# 每条（含重叠区域）的默认像素上限
+STRIP_PIXELS = 8_000_000
+
+Strip = TypeVar("Strip")
+
+
+def strip_rows(width: int, halo: int = 0, max_pixels: int = STRIP_PIXELS, align: int = 8) -> int:
+    """
+    计算每条的行数（不含重叠区域）
+
+    Args:
+        width: 图片宽度
+        halo: 上下重叠行数
+        max_pixels: 每条（含重叠区域）的像素上限
+        align: 行数按该值对齐（配合按倍数缩小的处理，保证各条的缩小网格与整图一致）
+
+    Returns:
+        每条的行数（至少为align）
+    """
+    rows = max_pixels // max(width, 1) - 2 * halo
+    return max(rows // align * align, align)
+
+
+def process_in_strips(image: Strip, func: Callable[[Strip, int], Strip], halo: int = 0,
+                      max_pixels: int = STRIP_PIXELS, align: int = 8) -> Strip:
+    """
+    分条处理图片，结果原地写回
+
+    Args:
+        image: NumPy数组（H×W或H×W×C）或PIL图片
+        func: 处理函数func(strip, top)：strip是带重叠区域的一条（与image同类型，不应原地修改），
+              top是其首行在原图中的行号；返回与strip同尺寸、同通道数的结果
+        halo: 上下重叠行数，不小于func的影响范围；应为align的倍数
+        max_pixels: 每条（含重叠区域）的像素上限
+        align: 每条行数的对齐值
+
+    Returns:
+        image（已被处理结果覆盖）
+    """
+    if isinstance(image, Image.Image):
+        width, height = image.size
+        take = lambda top, bottom: image.crop((0, top, width, bottom))
+        rows_of = lambda strip, top, bottom: strip.crop((0, top, width, bottom))
+        put = lambda top, strip: image.paste(strip, (0, top))
+        stack = _stack_images
+    else:
+        height, width = image.shape[:2]
+        take = lambda top, bottom: image[top:bottom].copy()
+        rows_of = lambda strip, top, bottom: strip[top:bottom]
+        stack = _stack_arrays
+
+        def put(top, strip):
+            image[top:top + strip.shape[0]] = strip
+
+    step = strip_rows(width, halo, max_pixels, align)
+    carry = None  # 上一条保存的原始内容：本条上方重叠区域中已被覆盖的行
+    for core_top in range(0, height, step):
+        core_bottom = min(core_top + step, height)
+        top = max(core_top - halo, 0)
+        bottom = min(core_bottom + halo, height)
+
+        fresh = take(core_top, bottom)
+        strip = stack(carry, fresh) if top < core_top else fresh
+        result = func(strip, top)
+
+        # 写回前保存下一条需要的原始行
+        next_top = max(core_bottom - halo, 0)
+        if next_top < core_bottom < height:
+            carry = rows_of(strip, next_top - top, core_bottom - top)
+        put(core_top, rows_of(result, core_top - top, core_bottom - top))
+
+    return image
+
+
+def _stack_arrays(upper, lower):
+    import numpy as np
+    return np.concatenate((upper, lower), axis=0)
+
+
+def _stack_images(upper: Image.Image, lower: Image.Image) -> Image.Image:
+    stacked = Image.new(lower.mode, (lower.width, upper.height + lower.height))
+    stacked.paste(upper, (0, 0))
+    stacked.paste(lower, (0, upper.height))
+    return stacked
@@ -12,8 +12,13 @@ sys.path.insert(0, str(Path(__file__).parent))
 try:
     import config
 except ImportError:
-    print("❌ 错误：请先复制 config.example.py 为 config.py 并配置相关参数")
-    sys.exit(1)
+    config = None
+
+if "pytest" in sys.modules and getattr(config, "__file__", None) is None:
+    # 各项检查需要真实配置和网络；没有config.py（包括main.py按环境变量生成的配置）时
+    # 被pytest收集也跳过，不能直接退出解释器
+    import pytest
+    pytest.skip("未找到config.py，跳过基础功能测试", allow_module_level=True)
 
 from src.utils import setup_logger
 from src.ocr import DoubaoOCR
@@ -181,6 +186,10 @@ def test_feishu_connection():
 
 def main():
     """运行所有测试"""
+    if config is None:
+        print("❌ 错误：请先复制 config.example.py 为 config.py 并配置相关参数")
+        return False
+    
     print("="*50)
     print("错题思维应用 - 基础功能测试")
     print("="*50)
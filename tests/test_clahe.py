@@ -0,0 +1,41 @@
+"""
+分条CLAHE测试：_clahe_luts/_clahe_apply与cv2.createCLAHE的结果完全一致
+"""
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+from src.ocr.processor import ImageProcessor, _clahe_apply, _clahe_luts
+
+
+def make_gray(height, width, seed=0):
+    """带渐变、噪声和大片纯色区域的灰度图（纯色区域会触发直方图裁剪）"""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    gray = 60 + 120 * (xx / width) + rng.normal(0, 12, (height, width))
+    gray[height // 3:height // 2, width // 4:] = 230
+    return np.clip(gray, 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize("shape", [(256, 320), (203, 317), (97, 1001)])
+@pytest.mark.parametrize("clip_limit, grid", [(2.0, (8, 8)), (40.0, (3, 5)), (0.0, (4, 4))])
+def test_clahe_matches_opencv(shape, clip_limit, grid):
+    gray = make_gray(*shape)
+    expected = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=grid).apply(gray)
+
+    # 每次只统计几十行的直方图
+    luts, tile_size = _clahe_luts(gray, clip_limit, grid, max_pixels=shape[1] * 24)
+    assert np.array_equal(_clahe_apply(gray, 0, luts, tile_size), expected)
+
+    # 逐条映射后拼接
+    strips = [_clahe_apply(gray[top:top + 40], top, luts, tile_size) for top in range(0, shape[0], 40)]
+    assert np.array_equal(np.vstack(strips), expected)
+
+
+def test_preprocess_gray_tiled_matches_whole_image():
+    gray = make_gray(400, 300)
+    expected = ImageProcessor._preprocess_gray(gray.copy(), max_strip_pixels=None)
+    tiled = ImageProcessor._preprocess_gray(gray.copy(), max_strip_pixels=300 * 80)
+    assert np.array_equal(tiled, expected)
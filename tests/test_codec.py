@@ -0,0 +1,94 @@
+"""
+记录编解码测试：按表结构编译、编码与解码往返
+"""
+
+from datetime import datetime
+
+from src.feishu import ErrorRecord, FeedbackQuestion
+from src.feishu.codec import ERROR_RECORD_CODEC, FEEDBACK_QUESTION_CODEC, SINGLE_SELECT, TEXT
+from src.feishu.schema import TableSchema
+
+
+def make_schema(types):
+    return TableSchema([{"field_name": name, "type": field_type} for name, field_type in types.items()])
+
+
+ERROR_TABLE = {
+    "错题原题": 17, "去手写": 17, "学科": 3, "知识点": 4, "不会/做错": 3,
+    "不会/做错的原因": 1, "引导问题": 1, "思考过程": 1, "解题思路": 1, "解题清单": 1,
+    "记忆口诀": 1, "是否母题": 3, "掌握程度": 3, "创建时间": 5, "最后复习时间": 5, "复习次数": 2,
+}
+
+
+def test_error_record_round_trip():
+    record = ErrorRecord(
+        subject="数学", knowledge_points=["分数", "通分"], error_type="做错",
+        error_reason="通分时漏乘", guide_questions="1. 分母是多少？", is_master_question="是",
+        mastery_level="掌握中", created_at=datetime(2024, 3, 1, 8, 30),
+        last_review_time=datetime(2024, 3, 2, 20, 0), review_count=3,
+    )
+
+    fields = ERROR_RECORD_CODEC.encode(record)
+    decoded = ERROR_RECORD_CODEC.decode({"record_id": "rec1", "fields": fields})
+
+    assert decoded.record_id == "rec1"
+    for attr in ("subject", "knowledge_points", "error_type", "error_reason", "guide_questions",
+                 "is_master_question", "mastery_level", "created_at", "last_review_time", "review_count"):
+        assert getattr(decoded, attr) == getattr(record, attr), attr
+
+
+def test_feedback_question_round_trip():
+    question = FeedbackQuestion(
+        master_question_id="rec_master", question_content="1/2 + 1/3 = ?", difficulty="进阶",
+        standard_answer="5/6", created_at=datetime(2024, 3, 1, 9, 0),
+    )
+
+    fields = FEEDBACK_QUESTION_CODEC.encode(question)
+    assert fields["母题ID"] == ["rec_master"]
+
+    # 飞书返回的关联字段为{"link_record_ids": [...]}
+    fields["母题ID"] = {"link_record_ids": ["rec_master"]}
+    decoded = FEEDBACK_QUESTION_CODEC.decode({"record_id": "rec2", "fields": fields})
+    assert decoded.model_dump() == {**question.model_dump(), "record_id": "rec2"}
+
+
+def test_decode_feishu_value_formats():
+    decoded = ERROR_RECORD_CODEC.decode({"record_id": "rec3", "fields": {
+        "引导问题": [{"type": "text", "text": "第一问"}, {"type": "text", "text": "，第二问"}],
+        "错题原题": [{"file_token": "ft1", "url": "https://example.com/ft1"}],
+        "去手写": [{"file_token": "ft2"}],
+        "复习次数": 2.0,
+    }})
+
+    assert decoded.guide_questions == "第一问，第二问"
+    assert decoded.original_image == "https://example.com/ft1"
+    assert decoded.cleaned_image == "ft2"
+    assert decoded.review_count == 2 and isinstance(decoded.review_count, int)
+    assert decoded.subject is None
+
+
+def test_compile_uses_schema_field_types():
+    schema = make_schema({"母题ID": 18, "题目内容": 1, "难度": 1, "答案": 1})
+    codec = FEEDBACK_QUESTION_CODEC.compile(schema)
+
+    kinds = {spec.field_name: spec.kind for spec in codec.specs}
+    assert kinds["难度"] == TEXT
+    # 表结构中没有的字段沿用默认种类
+    assert kinds["是否正确"] == SINGLE_SELECT
+    # 同一个表结构只编译一次
+    assert FEEDBACK_QUESTION_CODEC.compile(schema) is codec
+    assert FEEDBACK_QUESTION_CODEC.compile(None) is FEEDBACK_QUESTION_CODEC
+
+
+def test_compile_skips_read_only_created_time():
+    schema = make_schema({**ERROR_TABLE, "创建时间": 1001})
+    codec = ERROR_RECORD_CODEC.compile(schema)
+    created_at = datetime(2024, 3, 1, 8, 30)
+
+    fields = codec.encode(ErrorRecord(subject="数学", created_at=created_at))
+
+    assert fields == {"学科": "数学"}
+    assert schema.check(fields) == []
+    # 只读字段仍然参与解码
+    decoded = codec.decode({"record_id": "rec4", "fields": {"创建时间": int(created_at.timestamp() * 1000)}})
+    assert decoded.created_at == created_at
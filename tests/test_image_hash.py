@@ -0,0 +1,149 @@
+"""
+重复检测测试：多索引哈希的近似查询，以及哈希接近只是候选，版式相同的不同题目都要入库
+"""
+
+import io
+import logging
+import random
+
+from PIL import Image, ImageDraw
+
+from src.utils import ImageBuffer, ImageHashIndex, dhash, hamming_distance
+
+
+def question_image(text):
+    """白底黑字的题目截图，版式相同时dHash几乎一样"""
+    img = Image.new("RGB", (800, 200), "white")
+    ImageDraw.Draw(img).text((20, 80), text, fill="black")
+    output = io.BytesIO()
+    img.save(output, "JPEG")
+    return output.getvalue()
+
+
+class FakeOCR:
+    def recognize_and_analyze(self, image):
+        return {"success": True, "question_text": image.name, "analysis": {"subject": "数学"}, "mode": "fake"}
+
+
+class FakeRemover:
+    def remove_handwriting_buffer(self, image):
+        return image
+
+
+class FakeFeishuClient:
+    def __init__(self):
+        self.records = []
+
+    def create_error_record(self, record):
+        self.records.append(record)
+        return f"rec{len(self.records)}"
+
+
+def make_app(tmp_path):
+    from main import ErrorQuestionApp
+
+    app = ErrorQuestionApp.__new__(ErrorQuestionApp)
+    app.logger = logging.getLogger(__name__)
+    app.outbox = None
+    app.image_index = ImageHashIndex(str(tmp_path / "image_hashes.db"))
+    app.ocr = FakeOCR()
+    app.handwriting_remover = FakeRemover()
+    app.feishu_client = FakeFeishuClient()
+    return app
+
+
+def test_similar_layout_is_only_a_candidate(tmp_path):
+    first, second = question_image("1. 12 + 35 = ?"), question_image("1. 17 + 36 = ?")
+    image_hash = dhash(first)
+    assert hamming_distance(image_hash, dhash(second)) <= 6
+
+    index = ImageHashIndex(str(tmp_path / "image_hashes.db"))
+    index.add(image_hash, "rec1", ImageBuffer(first).sha256, "1. 12 + 35 = ?")
+
+    assert index.find(dhash(second)) == ("rec1", hamming_distance(image_hash, dhash(second)))
+    assert index.find_exact(ImageBuffer(second).sha256) is None
+    assert index.find_duplicate(dhash(second), "1. 17 + 36 = ?") is None
+    # 题目文字只忽略空白差异
+    assert index.find_duplicate(dhash(second), "1.12+35=?\n")[0] == "rec1"
+    assert index.find_duplicate(dhash(second), "") is None
+    index.close()
+
+
+def test_distinct_questions_are_both_ingested(tmp_path):
+    app = make_app(tmp_path)
+    first = ImageBuffer(question_image("1. 12 + 35 = ?"), name="1. 12 + 35 = ?")
+    second = ImageBuffer(question_image("1. 17 + 36 = ?"), name="1. 17 + 36 = ?")
+
+    assert app._process_image(first, "不会", False) == "rec1"
+    assert app._process_image(second, "不会", False) == "rec2"
+    assert len(app.feishu_client.records) == 2
+
+    # 同一道题再次提交时复用已有记录
+    assert app._process_image(ImageBuffer(first.tobytes(), name="retake"), "不会", False) == "rec1"
+    assert app._process_image(ImageBuffer(question_image("1. 12 + 35 = ?"), name="1. 12 + 35 = ?"),
+                              "不会", False) == "rec1"
+    assert len(app.feishu_client.records) == 2
+    app.image_index.close()
+
+
+def flip(value, *bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_find_within_max_distance(tmp_path):
+    index = ImageHashIndex(str(tmp_path / "image_hashes.db"), max_distance=6)
+    base = 0xF0F0_1234_ABCD_8765
+    index.add(base, "rec1")
+
+    assert index.find(base) == ("rec1", 0)
+    # 6位翻转集中在一段或分散在各段都能找到：至少有一段的距离不超过6 // 4
+    assert index.find(flip(base, 0, 1, 2, 3, 4, 5)) == ("rec1", 6)
+    assert index.find(flip(base, 0, 16, 32, 48, 63, 17)) == ("rec1", 6)
+    assert index.find(flip(base, 0, 1, 2, 3, 4, 5, 6)) is None
+    assert index.find(flip(base, 0, 1, 2, 3, 4, 5, 6), max_distance=7) == ("rec1", 7)
+    index.close()
+
+
+def test_find_matches_brute_force(tmp_path):
+    rng = random.Random(0)
+    index = ImageHashIndex(str(tmp_path / "image_hashes.db"), max_distance=10)
+    hashes = {}
+    for i in range(300):
+        image_hash = rng.getrandbits(64)
+        hashes[f"rec{i}"] = image_hash
+        index.add(image_hash, f"rec{i}")
+
+    for _ in range(200):
+        base = rng.choice(list(hashes.values()))
+        query = flip(base, *rng.sample(range(64), rng.randint(0, 12)))
+        best = min(hamming_distance(query, image_hash) for image_hash in hashes.values())
+        found = index.find(query)
+        if best <= 10:
+            assert found is not None and found[1] == best
+            assert hamming_distance(query, hashes[found[0]]) == best
+        else:
+            assert found is None
+    index.close()
+
+
+def test_remove_and_reload(tmp_path):
+    db_path = str(tmp_path / "image_hashes.db")
+    index = ImageHashIndex(db_path)
+    # 最高位为1的哈希在SQLite中以负数保存
+    index.add(1 << 63 | 5, "rec1", "sha1", "题目一")
+    index.add(flip(1 << 63 | 5, 10), "rec2", "sha2", "题目二")
+
+    index.remove("rec1")
+    assert len(index) == 1
+    assert index.find(1 << 63 | 5) == ("rec2", 1)
+    assert index.find_exact("sha1") is None
+    index.close()
+
+    index = ImageHashIndex(db_path)
+    assert len(index) == 1
+    assert index.find(1 << 63 | 5) == ("rec2", 1)
+    assert index.find_exact("sha2") == "rec2"
+    assert index.find_duplicate(1 << 63 | 5, "题目二") == ("rec2", 1)
+    index.close()
@@ -0,0 +1,118 @@
+"""
+发件箱测试：批量创建的幂等重发、永久失败、附件去重和已完成条目清理
+"""
+
+import os
+import time
+
+from src.feishu import FeishuClient, FeishuOutbox, ErrorRecord
+from src.feishu.schema import TableSchema
+
+
+JPEG = b"\xff\xd8\xff" + b"x" * 256
+
+
+class FakeClient(FeishuClient):
+    """不发网络请求的客户端：附件上传和批量创建都在本地记录"""
+
+    def __init__(self):
+        super().__init__("app", "secret", "app_token", "tbl")
+        self.schema = TableSchema([
+            {"field_name": "学科", "type": 3},
+            {"field_name": "错题原题", "type": 17},
+            {"field_name": "去手写", "type": 17},
+            {"field_name": "创建时间", "type": 5},
+        ])
+        self.uploads = []
+        self.client_tokens = []
+
+    def get_table_schema(self, table_id=None, refresh=False):
+        return self.schema
+
+    def _upload_content(self, content, file_name, content_hash=None):
+        self.uploads.append(file_name)
+        return f"ft{len(self.uploads)}"
+
+    def _upload_file(self, file_path):
+        self.uploads.append(file_path)
+        return f"ft{len(self.uploads)}"
+
+    def _batch_create_records(self, table_id, fields_list, client_token=None):
+        self.client_tokens.append(client_token)
+        return {
+            "success": True,
+            "record_ids": [f"rec_{client_token[:8]}_{i}" for i in range(len(fields_list))],
+            "failed": []
+        }
+
+
+def make_outbox(tmp_path, **kwargs):
+    client = FakeClient()
+    return client, FeishuOutbox(client, str(tmp_path / "outbox.db"), **kwargs)
+
+
+def test_resend_after_crash_reuses_client_token(tmp_path):
+    client, outbox = make_outbox(tmp_path, lease_seconds=0.05)
+    provisional_id = outbox.enqueue_error_record(ErrorRecord(subject="数学", original_image=JPEG))
+
+    # 批量创建成功后、标记完成前进程退出
+    def crash(row, record_id):
+        raise KeyboardInterrupt
+    outbox._mark_done = crash
+    try:
+        outbox.flush()
+    except KeyboardInterrupt:
+        pass
+    del outbox._mark_done
+
+    time.sleep(0.1)
+    outbox.flush()
+
+    assert len(client.client_tokens) == 2
+    assert client.client_tokens[0] == client.client_tokens[1]
+    # 重发使用保存的字段，不会重新上传附件
+    assert len(client.uploads) == 1
+    assert outbox.resolve(provisional_id).startswith(f"rec_{client.client_tokens[0][:8]}")
+    outbox.close()
+
+
+def test_field_validation_error_fails_without_retry(tmp_path):
+    client, outbox = make_outbox(tmp_path)
+    provisional_id = outbox.enqueue_error_record(ErrorRecord(subject="数学", knowledge_points=["分数"]))
+
+    outbox.flush()
+
+    assert outbox.status(provisional_id) == "failed"
+    assert client.client_tokens == []
+    outbox.close()
+
+
+def test_identical_attachments_are_spooled_and_uploaded_once(tmp_path):
+    client, outbox = make_outbox(tmp_path)
+    outbox.enqueue_error_record(ErrorRecord(subject="数学", original_image=JPEG, cleaned_image=JPEG))
+
+    assert len(os.listdir(outbox.spool_dir)) == 1
+    outbox.flush()
+    assert len(client.uploads) == 1
+    assert os.listdir(outbox.spool_dir) == []
+    outbox.close()
+
+
+def test_purge_removes_done_entries(tmp_path):
+    client, outbox = make_outbox(tmp_path, retention_seconds=3600)
+    provisional_id = outbox.enqueue_error_record(ErrorRecord(subject="数学"))
+    outbox.flush()
+    assert outbox.status(provisional_id) == "done"
+
+    # 还有更新以它为目标时保留
+    outbox.enqueue_update(provisional_id, {"学科": "语文"})
+    outbox.retention_seconds = 0
+    assert outbox.purge() == 0
+
+    outbox.client._batch_update_records = lambda table_id, updates: {
+        "success": True, "record_ids": [record_id for record_id, _ in updates], "failed": []
+    }
+    outbox.flush()
+    assert outbox.purge() == 2
+    assert outbox.status(provisional_id) is None
+    outbox.close()
@@ -0,0 +1,71 @@
+"""
+批量更新规划测试：同一记录的多次更新合并、与缓存快照比较
+"""
+
+from src.feishu.cache import RecordCache
+from src.feishu.planning import apply_to_snapshot, diff_with_snapshot, merge_updates, plan_updates
+
+
+def make_cache(snapshots):
+    cache = RecordCache()
+    for record_id, fields in snapshots.items():
+        cache.put(record_id, {"record_id": record_id, "fields": fields})
+    return cache
+
+
+def test_merge_updates_later_fields_win():
+    merged = merge_updates([
+        (0, "rec1", {"学科": "数学", "复习次数": 1}),
+        (1, "rec2", {"学科": "语文"}),
+        (2, "rec1", {"复习次数": 2, "掌握程度": "掌握中"}),
+    ])
+
+    assert merged == [
+        ("rec1", {"学科": "数学", "复习次数": 2, "掌握程度": "掌握中"}, [0, 2]),
+        ("rec2", {"学科": "语文"}, [1]),
+    ]
+
+
+def test_diff_with_snapshot():
+    cache = make_cache({"rec1": {
+        "学科": "数学",
+        "引导问题": [{"type": "text", "text": "第一问"}],
+        "错题原题": [{"file_token": "ft1", "name": "a.jpg"}],
+    }})
+
+    # 没有快照时原样返回
+    assert diff_with_snapshot(cache, "rec_other", {"学科": "数学"}) == {"学科": "数学"}
+    # 飞书返回格式与写入格式按规范化后的值比较
+    assert diff_with_snapshot(cache, "rec1", {
+        "学科": "数学", "引导问题": "第一问", "错题原题": [{"file_token": "ft1"}], "复习次数": 1,
+    }) == {"复习次数": 1}
+    assert diff_with_snapshot(cache, "rec1", {"引导问题": "第二问"}) == {"引导问题": "第二问"}
+
+
+def test_plan_updates_skips_unchanged_records():
+    cache = make_cache({"rec1": {"学科": "数学", "复习次数": 2}, "rec2": {"学科": "语文"}})
+    record_ids = [None] * 4
+
+    skipped, pending, pending_indices = plan_updates(cache, [
+        (0, "rec1", {"复习次数": 1}),
+        (1, "rec2", {"学科": "语文"}),
+        (2, "rec1", {"复习次数": 2}),
+        (3, "rec3", {"学科": "英语"}),
+    ], record_ids)
+
+    # rec1合并后与快照相同，两条输入都视为成功
+    assert skipped == [0, 1, 2]
+    assert record_ids == ["rec1", "rec2", "rec1", None]
+    assert pending == [("rec3", {"学科": "英语"})]
+    assert pending_indices == [[3]]
+
+
+def test_apply_to_snapshot():
+    cache = make_cache({"rec1": {"学科": "数学"}, "rec2": {"学科": "语文"}})
+
+    apply_to_snapshot(cache, "rec1", {"复习次数": 3})
+    assert cache.get("rec1")["fields"] == {"学科": "数学", "复习次数": 3}
+
+    # 写入附件后快照失效
+    apply_to_snapshot(cache, "rec2", {"去手写": [{"file_token": "ft2"}]})
+    assert cache.get("rec2") is None
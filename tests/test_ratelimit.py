@@ -0,0 +1,63 @@
+"""
+令牌桶测试：突发容量、排队等待、限流后降速与恢复
+"""
+
+import pytest
+
+from src.feishu import ratelimit
+from src.feishu.ratelimit import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock)
+    return clock
+
+
+def test_burst_then_queue(clock):
+    bucket = TokenBucket(rate=5, capacity=2)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    # 容量用完后按预订顺序排队
+    assert bucket.reserve() == pytest.approx(0.2)
+    assert bucket.reserve() == pytest.approx(0.4)
+
+    # 令牌按速率补充，但不超过容量
+    clock.now += 10
+    assert bucket.reserve() == 0.0
+    assert bucket.tokens == pytest.approx(1.0)
+
+
+def test_penalize_halves_rate_and_pauses(clock):
+    bucket = TokenBucket(rate=4, min_rate=1.5)
+
+    bucket.penalize(retry_after=2.0)
+    assert bucket.rate == 2.0
+    assert bucket.reserve() == pytest.approx(2.0)
+
+    # 速率不低于下限
+    bucket.penalize()
+    assert bucket.rate == 1.5
+    assert bucket.blocked_until == pytest.approx(clock.now + 2.0)
+
+
+def test_reward_restores_rate_gradually(clock):
+    bucket = TokenBucket(rate=10)
+    bucket.penalize(retry_after=0)
+    assert bucket.rate == 5.0
+
+    bucket.reward()
+    assert bucket.rate == pytest.approx(5.5)
+    for _ in range(20):
+        bucket.reward()
+    assert bucket.rate == 10
@@ -0,0 +1,95 @@
+"""
+流式响应解析测试：SSE事件、按行重组、JSON数组元素的增量解析，以及流式生成的错误处理
+"""
+
+import pytest
+
+from src.ai import generator as generator_module
+from src.ai import guide as guide_module
+from src.utils.streaming import JsonArrayItemParser, iter_complete_lines, iter_json_array_items, iter_sse_data
+
+
+class FakeResponse:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+
+def test_iter_sse_data_joins_multi_line_data():
+    response = FakeResponse([
+        ": keep-alive",
+        "data: first",
+        "data:second",
+        "",
+        "event: message",
+        "id: 2",
+        "data: {\"a\": 1}",
+        "",
+        "",
+    ])
+    assert list(iter_sse_data(response)) == ["first\nsecond", "{\"a\": 1}"]
+
+
+def test_iter_sse_data_stops_at_done():
+    response = FakeResponse(["data: one", "", "data: [DONE]", "", "data: after", ""])
+    assert list(iter_sse_data(response)) == ["one"]
+
+
+def test_iter_sse_data_flushes_last_event_without_blank_line():
+    assert list(iter_sse_data(FakeResponse(["data: tail"]))) == ["tail"]
+    assert list(iter_sse_data(FakeResponse(["data: [DONE]"]))) == []
+
+
+def test_iter_complete_lines():
+    chunks = ["1. 第一", "问\n2. 第二问\n\n3.", " 第三问"]
+    assert list(iter_complete_lines(chunks)) == ["1. 第一问", "2. 第二问", "", "3. 第三问"]
+    assert list(iter_complete_lines(["a\n"])) == ["a"]
+    assert list(iter_complete_lines([])) == []
+
+
+def test_json_array_items_split_across_chunks():
+    text = '{"note": "[不是数组]", "questions": [{"q": "a"}, {"q": "b", "tags": [1, [2]]}, "c"], "x": [9]}'
+    # 逐字符输入，每个元素都跨越多个片段
+    assert list(iter_json_array_items(text, key="questions")) == [{"q": "a"}, {"q": "b", "tags": [1, [2]]}, "c"]
+
+
+def test_json_array_items_escaped_quotes_and_brackets():
+    parser = JsonArrayItemParser("questions")
+    items = list(parser.feed('{"questions": [{"q": "他说\\"}]{\\" 了"}, '))
+    assert items == [{"q": '他说"}]{" 了'}]
+    assert list(parser.feed('{"q": "反斜杠\\\\"}]}')) == [{"q": "反斜杠\\"}]
+    # 数组结束后不再产出
+    assert list(parser.feed(', {"q": "多余"}]')) == []
+
+
+def test_json_array_items_first_array_without_key():
+    assert list(iter_json_array_items(['[[1, 2], ', '[3]]'])) == [[1, 2], [3]]
+
+
+def failing_stream(*chunks):
+    def stream_chat_completion(url, data, headers, timeout=30):
+        yield from chunks
+        raise ConnectionError("连接中断")
+    return stream_chat_completion
+
+
+def test_stream_guide_questions_raises_after_partial_output(monkeypatch):
+    monkeypatch.setattr(guide_module, "stream_chat_completion", failing_stream("1. 已知什么？\n2. 求"))
+    guide = guide_module.SocraticGuide(api_key="key", api_url="https://example.com/v1")
+
+    questions = guide.generate_guide_questions("题目", "数学", "不会", stream=True)
+    assert next(questions) == "已知什么？"
+    with pytest.raises(Exception, match="生成引导问题失败: 连接中断"):
+        next(questions)
+
+
+def test_stream_feedback_questions_raises(monkeypatch):
+    monkeypatch.setattr(generator_module, "stream_chat_completion", failing_stream('{"questions": [{"q": "a"}, '))
+    generator = generator_module.QuestionGenerator(api_key="key", api_url="https://example.com/v1")
+
+    questions = generator.generate_feedback_questions("题目", "数学", [], "做错", stream=True)
+    assert next(questions) == {"q": "a"}
+    with pytest.raises(Exception, match="生成反馈题失败: 连接中断"):
+        next(questions)